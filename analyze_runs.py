@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Summarise many runlogs sessions in parallel.
+
+    python3 analyze_runs.py runlogs/                      # every session below runlogs/
+    python3 analyze_runs.py runlogs/2025-10-15 --near-cm 30 --while F
+    python3 analyze_runs.py runlogs/ --json > summary.json
+
+Sessions are spread over a process pool (one per core by default). Each
+worker streams its session's event segments line by line - only tx,
+ultrasonic and heartbeat lines are JSON-decoded - or reads the column
+store when the session has one, then does the maths on NumPy arrays.
+
+Per session and overall:
+  - command mix (count per code)
+  - drive time per code (time each drive state was held)
+  - ultrasonic L/C/R distribution (no-echo share, percentiles)
+  - heartbeat gaps (max gap, gaps longer than --hb-gap-s)
+  - samples with C under --near-cm while --while was the active drive code
+"""
+import argparse, json, os, sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+import colstore
+from logrotate import event_files, open_segment
+
+DRIVE = set("FBLRSXYGT")
+BINS = np.arange(0, 605, 5)          # 5 cm histogram bins, last bin = 600+
+_WANT = (b'"kind": "tx"', b'"kind": "ultrasonic"', b'"kind": "heartbeat"')
+
+def find_sessions(roots):
+    out = []
+    for root in roots:
+        root = Path(root)
+        if (root / "session.json").exists() or (root / "events.jsonl").exists():
+            out.append(root); continue
+        out += sorted({p.parent for pat in ("session.json", "events.jsonl") for p in root.rglob(pat)})
+    return out
+
+# ---------- per-session loading ----------
+def _load(run):
+    cmd_t, cmd_c, us_t, us, hb_t = [], [], [], [], []
+    first = last = None
+    for path in event_files(run):
+        with open_segment(path) as f:
+            for raw in f:
+                if not any(w in raw for w in _WANT):
+                    # cheap path: only pull uptime_s out for the session's time span
+                    i = raw.find(b'"uptime_s": ')
+                    up = _uptime(raw, i) if i >= 0 else None
+                    if up is not None:
+                        first = up if first is None else first
+                        last = up
+                    continue
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    continue
+                up = rec.get("uptime_s")
+                if up is None:
+                    continue
+                first = up if first is None else first
+                last = up
+                k = rec["kind"]
+                if k == "tx":
+                    cmd_t.append(up); cmd_c.append(ord(rec["command"][0]))
+                elif k == "ultrasonic":
+                    d = rec.get("data") or {}
+                    us_t.append(rec.get("rx_uptime_s", up))
+                    us.append([colstore.fit("h", d.get(c)) for c in "LCR"])     # garbled values -> -1
+                else:
+                    hb_t.append(up)
+    cmds = (np.array(cmd_t), np.array(cmd_c, dtype=np.uint8))
+    ultra = (np.array(us_t), np.array(us, dtype=np.int16).reshape(-1, 3))
+    if colstore.has_columns(run):
+        c = colstore.load(run, "commands", mmap=False)
+        u = colstore.load(run, "ultrasonic", mmap=False)
+        if len(c["uptime"]):
+            cmds = (c["uptime"], c["code"])
+        if len(u["uptime"]):
+            ultra = (u["uptime"], np.stack([u["L"], u["C"], u["R"]], axis=1))
+    ends = [x for x in (last, cmds[0][-1] if len(cmds[0]) else None,
+                        ultra[0][-1] if len(ultra[0]) else None) if x is not None]
+    return cmds, ultra, np.array(hb_t), (first or 0.0), (max(ends) if ends else 0.0)
+
+def _uptime(raw, i):
+    try:
+        return float(raw[i + 12:].split(b",", 1)[0].split(b"}", 1)[0])
+    except ValueError:
+        return None
+
+# ---------- per-session summary (runs in a worker process) ----------
+def summarize(run, near_cm=30, while_code="F", hb_gap_s=7.5):
+    (ct, cc), (ut, uv), hb, t0, t1 = _load(run)
+    meta = {}
+    try:
+        meta = json.loads((Path(run) / "session.json").read_text())
+    except (OSError, ValueError):
+        pass
+
+    codes, counts = np.unique(cc, return_counts=True)
+    mix = {chr(c): int(n) for c, n in zip(codes, counts)}
+
+    # drive time: each drive code holds until the next drive code (or session end)
+    is_drive = np.isin(cc, np.frombuffer("".join(sorted(DRIVE)).encode(), np.uint8))
+    dt_, dc = ct[is_drive], cc[is_drive]
+    held = np.diff(np.append(dt_, max(t1, dt_[-1]) if len(dt_) else t1))
+    drive_s = {}
+    for c in np.unique(dc):
+        drive_s[chr(c)] = round(float(held[dc == c].sum()), 3)
+
+    # ultrasonic: histograms merge cheaply across sessions
+    hist = {}
+    dist = {}
+    for j, name in enumerate("LCR"):
+        col = uv[:, j] if len(uv) else np.zeros(0, np.int16)
+        ok = col[col > 0]
+        hist[name] = np.histogram(np.minimum(ok, BINS[-1]), BINS)[0].tolist()
+        dist[name] = _dist(ok, len(col))
+
+    # C under near_cm while `while_code` was the active drive state
+    near = {"samples": 0, "episodes": 0}
+    if len(ut) and len(dt_):
+        k = np.searchsorted(dt_, ut, side="right") - 1
+        active = np.where(k >= 0, dc[np.maximum(k, 0)], ord("S"))
+        c = uv[:, 1]
+        hit = (active == ord(while_code)) & (c > 0) & (c < near_cm)
+        near["samples"] = int(hit.sum())
+        near["episodes"] = int(np.count_nonzero(hit[1:] & ~hit[:-1]) + (1 if len(hit) and hit[0] else 0))
+
+    gaps = np.diff(hb) if len(hb) > 1 else np.zeros(0)
+    return {
+        "run": str(run),
+        "session": meta.get("session", Path(run).name),
+        "hostname": meta.get("hostname"),
+        "start_ts": meta.get("start_ts"),
+        "duration_s": round(t1 - t0, 3),
+        "command_mix": mix,
+        "drive_s": drive_s,
+        "ultrasonic": dist,
+        "ultrasonic_hist": hist,
+        f"C<{near_cm}cm_while_{while_code}": near,
+        "heartbeat": {"count": int(len(hb)),
+                      "max_gap_s": round(float(gaps.max()), 3) if len(gaps) else None,
+                      "gaps_over": int((gaps > hb_gap_s).sum())},
+    }
+
+def _dist(ok, n_all):
+    if not n_all:
+        return {"n": 0}
+    d = {"n": int(n_all), "no_echo_pct": round(100.0 * (n_all - len(ok)) / n_all, 1)}
+    if len(ok):
+        p = np.percentile(ok, [10, 50, 90])
+        d.update(min=int(ok.min()), p10=float(p[0]), p50=float(p[1]), p90=float(p[2]), max=int(ok.max()))
+    return d
+
+def _hist_pct(h, q):
+    h = np.asarray(h)
+    if not h.sum():
+        return None
+    cum = np.cumsum(h) / h.sum()
+    return float(BINS[np.searchsorted(cum, q)])
+
+def merge(summaries, near_key):
+    tot = {"sessions": len(summaries), "duration_s": 0.0, "command_mix": {}, "drive_s": {},
+           near_key: {"samples": 0, "episodes": 0}, "heartbeat_gaps_over": 0, "ultrasonic": {}}
+    hist = {c: np.zeros(len(BINS) - 1, np.int64) for c in "LCR"}
+    for s in summaries:
+        tot["duration_s"] += s["duration_s"]
+        for k, v in s["command_mix"].items():
+            tot["command_mix"][k] = tot["command_mix"].get(k, 0) + v
+        for k, v in s["drive_s"].items():
+            tot["drive_s"][k] = round(tot["drive_s"].get(k, 0.0) + v, 3)
+        for k in ("samples", "episodes"):
+            tot[near_key][k] += s[near_key][k]
+        tot["heartbeat_gaps_over"] += s["heartbeat"]["gaps_over"]
+        for c in "LCR":
+            hist[c] += np.asarray(s["ultrasonic_hist"][c])
+    for c in "LCR":
+        tot["ultrasonic"][c] = {"n_echo": int(hist[c].sum()),
+                                "p10~": _hist_pct(hist[c], 0.1), "p50~": _hist_pct(hist[c], 0.5),
+                                "p90~": _hist_pct(hist[c], 0.9)}
+    tot["duration_s"] = round(tot["duration_s"], 3)
+    return tot
+
+# ---------- CLI ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("roots", nargs="+", help="runlogs/ or any date/session directories below it")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count())
+    ap.add_argument("--near-cm", type=int, default=30)
+    ap.add_argument("--while", dest="while_code", default="F")
+    ap.add_argument("--hb-gap-s", type=float, default=7.5, help="heartbeat gap worth reporting (beats are 5 s)")
+    ap.add_argument("--json", action="store_true", help="print the full per-session + overall JSON")
+    a = ap.parse_args(argv)
+
+    runs = find_sessions(a.roots)
+    if not runs:
+        sys.exit("no sessions found")
+    near_key = f"C<{a.near_cm}cm_while_{a.while_code}"
+    out, failed = [], []
+    with ProcessPoolExecutor(max_workers=a.jobs) as pool:
+        futs = {pool.submit(summarize, r, a.near_cm, a.while_code, a.hb_gap_s): r for r in runs}
+        for fut in as_completed(futs):
+            try:
+                s = fut.result()
+            except Exception as e:
+                failed.append({"run": str(futs[fut]), "error": str(e)}); continue
+            out.append(s)
+            if not a.json:
+                mix = " ".join(f"{k}:{v}" for k, v in sorted(s["command_mix"].items()))
+                print(f"{s['session']:<14} {s['duration_s']:9.1f}s  cmds[{mix}]  "
+                      f"{near_key}={s[near_key]['episodes']}x/{s[near_key]['samples']} samples  "
+                      f"hb_max_gap={s['heartbeat']['max_gap_s']}", flush=True)
+    out.sort(key=lambda s: (s.get("start_ts") or 0, s["run"]))
+    total = merge(out, near_key)
+    if a.json:
+        json.dump({"sessions": out, "overall": total, "failed": failed}, sys.stdout, indent=1)
+        print()
+    else:
+        print("\noverall:", json.dumps(total, indent=1))
+        for f in failed:
+            print("FAILED", f["run"], f["error"], file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
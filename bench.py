@@ -0,0 +1,785 @@
+#!/usr/bin/env python3
+"""Benchmarks / load tests for the robot control servers.
+
+    python3 bench.py load --url http://raspberrypi.local:8000
+    python3 bench.py suite --compare bench_results/<earlier>.json     # no robot needed (fwsim.py)
+
+Each sub-command prints a short report; run with -h for options.
+"""
+import argparse, base64, http.client, os, socket, sys, threading, time
+from urllib.parse import urlsplit
+import wsctl
+
+# ---------- helpers ----------
+def pct(samples, p):
+    if not samples:
+        return float("nan")
+    s = sorted(samples)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+def summary(name, samples_s):
+    ms = [x * 1000 for x in samples_s]
+    print(f"{name:<24} n={len(ms):<6} p50={pct(ms,50):7.2f} ms  p99={pct(ms,99):7.2f} ms  max={max(ms or [0]):7.2f} ms")
+
+def host_port(url):
+    u = urlsplit(url)
+    return u.hostname or "127.0.0.1", u.port or 80
+
+def one_request(host, port, method, path, body=None, timeout=10):
+    """Fresh connection per request, like the control page's fetch()."""
+    c = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        c.request(method, path, body=body,
+                  headers={"Content-Type": "application/json"} if body else {})
+        r = c.getresponse()
+        r.read()
+        return r.status
+    finally:
+        c.close()
+
+# ---------- load: drive latency under background traffic ----------
+def cmd_load(a):
+    host, port = host_port(a.url)
+    stop = threading.Event()
+    counts = {"metrics": 0, "ingest": 0, "errors": 0}
+    lat = []
+
+    def metrics_client():
+        while not stop.is_set():
+            try:
+                one_request(host, port, "GET", "/metrics.json"); counts["metrics"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    payload = ('{"blob":"' + "x" * a.ingest_bytes + '"}').encode()
+    def ingest_client():
+        while not stop.is_set():
+            try:
+                one_request(host, port, "POST", f"/ingest/{a.ingest_topic}", body=payload); counts["ingest"] += 1
+            except Exception:
+                counts["errors"] += 1
+
+    def stalled_client():
+        # Opens a connection, sends half a request line and goes quiet,
+        # like a phone that dropped off Wi-Fi mid-request.
+        while not stop.is_set():
+            try:
+                s = socket.create_connection((host, port), timeout=5)
+                s.sendall(b"GET /metrics.json HT")
+                stop.wait(a.stall_s)
+                s.close()
+            except Exception:
+                counts["errors"] += 1
+                stop.wait(0.5)
+
+    threads = ([threading.Thread(target=metrics_client) for _ in range(a.metrics_clients)] +
+               [threading.Thread(target=ingest_client) for _ in range(a.ingest_clients)] +
+               [threading.Thread(target=stalled_client) for _ in range(a.stall_clients)])
+    for t in threads:
+        t.daemon = True
+        t.start()
+    time.sleep(0.5)  # let background load ramp up
+
+    end = time.monotonic() + a.duration
+    while time.monotonic() < end:
+        for code in ("/F", "/S"):
+            t0 = time.perf_counter()
+            try:
+                one_request(host, port, "GET", code, timeout=a.timeout)
+                lat.append(time.perf_counter() - t0)
+            except Exception:
+                counts["errors"] += 1
+        time.sleep(a.gap)
+    stop.set()
+
+    print(f"load: {a.metrics_clients} metrics, {a.ingest_clients} ingest "
+          f"({a.ingest_bytes} B), {a.stall_clients} stalled clients, {a.duration}s")
+    summary("/F -> /S drive", lat)
+    print(f"background: metrics={counts['metrics']} ingest={counts['ingest']} errors={counts['errors']}")
+
+# ---------- keepalive: per-command latency, fresh vs persistent connection ----------
+def cmd_keepalive(a):
+    host, port = host_port(a.url)
+    codes = ["/F", "/S"] * (a.n // 2)
+
+    fresh = []
+    for code in codes:
+        t0 = time.perf_counter()
+        one_request(host, port, "GET", code)
+        fresh.append(time.perf_counter() - t0)
+        time.sleep(a.gap)
+
+    kept, reconnects = [], 0
+    c = http.client.HTTPConnection(host, port, timeout=10)
+    for code in codes:
+        t0 = time.perf_counter()
+        try:
+            c.request("GET", code); r = c.getresponse(); r.read()
+        except (http.client.HTTPException, OSError):
+            reconnects += 1
+            c.close(); c = http.client.HTTPConnection(host, port, timeout=10)
+            c.request("GET", code); r = c.getresponse(); r.read()
+        if r.will_close:   # server answered HTTP/1.0 or closed: no keep-alive to measure
+            reconnects += 1
+        kept.append(time.perf_counter() - t0)
+        time.sleep(a.gap)
+    c.close()
+
+    print(f"keepalive: {len(codes)} drive commands against {a.url}")
+    summary("new connection each", fresh)
+    summary("persistent HTTP/1.1", kept)
+    if reconnects:
+        print(f"  ({reconnects} persistent requests had to reconnect - is HTTP_KEEPALIVE_S=0?)")
+
+# ---------- ws: WebSocket drive channel vs per-command GET ----------
+def ws_connect(host, port, timeout=10):
+    s = socket.create_connection((host, port), timeout=timeout)
+    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    key = base64.b64encode(os.urandom(16)).decode()
+    s.sendall((f"GET /ws HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\n"
+               f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+               "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    resp = b""
+    while b"\r\n\r\n" not in resp:
+        chunk = s.recv(1024)
+        if not chunk:
+            raise ConnectionError("closed during handshake")
+        resp += chunk
+    head, _, rest = resp.partition(b"\r\n\r\n")
+    if b" 101 " not in head.split(b"\r\n")[0]:
+        raise ConnectionError(head.split(b"\r\n")[0].decode())
+    return s, wsctl.FrameParser(), rest
+
+def ws_wait_ack(s, parser, pending, want):
+    msgs = parser.feed(pending) if pending else []
+    while True:
+        for op, payload in msgs:
+            if op == wsctl.OP_TEXT and payload.startswith(b"ack:") and int(payload[4:]) >= want:
+                return
+        msgs = parser.feed(s.recv(4096))
+
+def cmd_ws(a):
+    host, port = host_port(a.url)
+    codes = ["F", "S"] * (a.n // 2)
+
+    http_lat = []
+    for code in codes:
+        t0 = time.perf_counter()
+        one_request(host, port, "GET", "/" + code)
+        http_lat.append(time.perf_counter() - t0)
+        time.sleep(a.gap)
+
+    s, parser, rest = ws_connect(host, port)
+    ws_lat, seq = [], 0
+    for code in codes:
+        seq += 1
+        t0 = time.perf_counter()
+        s.sendall(wsctl.encode_frame(f"{seq}:{code}", mask=True))
+        ws_wait_ack(s, parser, rest, seq); rest = b""
+        ws_lat.append(time.perf_counter() - t0)
+        time.sleep(a.gap)
+
+    # Burst: a finger-drumming sequence sent back to back; the server
+    # should apply far fewer than it received and always end on "S".
+    burst = (["F", "X", "F", "Y"] * (a.burst // 4)) + ["S"]
+    frames = b"".join(wsctl.encode_frame(f"{seq + i + 1}:{c}", mask=True) for i, c in enumerate(burst))
+    t0 = time.perf_counter()
+    s.sendall(frames)
+    ws_wait_ack(s, parser, b"", seq + len(burst))
+    burst_s = time.perf_counter() - t0
+    s.sendall(wsctl.encode_frame(b"", wsctl.OP_CLOSE, mask=True))
+    s.close()
+
+    print(f"ws: {len(codes)} commands against {a.url} (latency = request until tx() has taken the command)")
+    summary("GET per command", http_lat)
+    summary("WebSocket + ack", ws_lat)
+    print(f"burst of {len(burst)} frames acked in {burst_s*1000:.2f} ms; "
+          "see the ws_close event for applied/coalesced counts")
+
+# ---------- lease: drive latency with page keepalives running ----------
+def cmd_lease(a):
+    host, port = host_port(a.url)
+    stop = threading.Event()
+    sent = {"http": 0, "ws": 0, "errors": 0}
+
+    def http_keeper(i):
+        c = http.client.HTTPConnection(host, port, timeout=10)
+        while not stop.is_set():
+            try:
+                c.request("GET", f"/k?l=bench{i}"); c.getresponse().read(); sent["http"] += 1
+            except (http.client.HTTPException, OSError):
+                sent["errors"] += 1
+                c.close(); c = http.client.HTTPConnection(host, port, timeout=10)
+            stop.wait(1.0 / a.hz)
+        c.close()
+
+    def ws_keeper(i):
+        s = ws_connect(host, port)[0]
+        while not stop.is_set():
+            s.sendall(wsctl.encode_frame("k", mask=True)); sent["ws"] += 1
+            stop.wait(1.0 / a.hz)
+        s.close()
+
+    def drive(n):
+        # drive commands carry their own lease id, as the page's do
+        c = http.client.HTTPConnection(host, port, timeout=10)
+        lat = []
+        for code in ["F", "S"] * (n // 2):
+            t0 = time.perf_counter()
+            c.request("GET", f"/{code}?l=benchdrive"); c.getresponse().read()
+            lat.append(time.perf_counter() - t0)
+            time.sleep(a.gap)
+        c.close()
+        return lat
+
+    print(f"lease: {a.n} drive commands against {a.url}, keepalives from {a.clients} clients at {a.hz:g} Hz")
+    summary("no keepalives", drive(a.n))
+    for name, fn in (("HTTP /k keepalives", http_keeper), ("WebSocket k frames", ws_keeper)):
+        stop.clear()
+        ts = [threading.Thread(target=fn, args=(i,), daemon=True) for i in range(a.clients)]
+        for t in ts: t.start()
+        time.sleep(0.5)
+        summary(name, drive(a.n))
+        stop.set()
+        for t in ts: t.join(2)
+    print(f"  keepalives sent: {sent}")
+
+# ---------- reader: serial line reader vs the old poll loop, over a pty ----------
+def _pty_serial(baud=115200):
+    import pty, serial
+    master, slave = pty.openpty()
+    os.set_blocking(master, False)
+    ser = serial.Serial(os.ttyname(slave), baud, timeout=0.2)
+    return master, slave, ser
+
+def _blast(master, stop, sent, baud):
+    # Firmware-shaped lines paced to the wire rate: 10 bits per byte at `baud`.
+    bps = baud / 10.0
+    seq, t_next = 0, time.perf_counter()
+    while not stop.is_set():
+        seq += 1
+        line = f"L: {seq % 400} cm  C: {seq} cm  R: 77 cm\r\n".encode()
+        t_next += len(line) / bps
+        d = t_next - time.perf_counter()
+        if d > 0:
+            time.sleep(d)
+        try:
+            os.write(master, line)
+            sent[seq] = time.perf_counter()
+        except BlockingIOError:     # pty buffer full: the reader has fallen behind
+            sent.setdefault("blocked", 0)
+            sent["blocked"] += 1
+
+def _legacy_poll(ser, on_line, stop):
+    # tank_jsn.py's loop before serial_reader.py
+    while not stop.is_set():
+        if ser.in_waiting:
+            on_line(ser.readline().decode(errors="ignore").strip(), None)
+        time.sleep(0.05)
+
+def _check_stream(n, seed=1):
+    # Mixed firmware output with known content: text and binary ultrasonic, heading frames
+    # (some with no echo) and other text lines -> (bytes, records RecordReader must report)
+    import random
+    import telemetry_codec as tc
+    rnd = random.Random(seed)
+    data, want = bytearray(), []
+    for i in range(n):
+        k = rnd.randrange(4)
+        if k == 0:
+            v = tuple(rnd.randrange(2, 450) for _ in "LCR")
+            data += tc.format_ultrasonic_text(*v)
+            want.append(("ultrasonic", dict(zip("LCR", v))))
+        elif k == 1:
+            v = tuple(None if rnd.random() < 0.1 else rnd.randrange(2, 450) for _ in "LCR")
+            data += tc.encode_ultrasonic(*v)
+            want.append(("ultrasonic", dict(zip("LCR", v))))
+        elif k == 2:
+            tenths = rnd.randrange(-1800, 1800)
+            data += tc.encode_heading(tenths / 10)
+            want.append(("heading", {"deg": tenths / 10}))
+        else:
+            line = f"dbg {i} free={rnd.randrange(1 << 16)}"
+            data += (line + "\r\n").encode()
+            want.append(("text", line))
+    return bytes(data), want
+
+def _check_reader(baud, n):
+    """Pass/fail: RecordReader over a pty must return exactly the records written."""
+    from serial_reader import RecordReader
+    import random
+    data, want = _check_stream(n)
+    master, slave, ser = _pty_serial(baud)
+    got = []
+    rd = RecordReader(ser, lambda kind, rec, t: got.append((kind, rec)))
+    stop = threading.Event()
+    reader = threading.Thread(target=rd.run, args=(stop,), daemon=True)
+    reader.start()
+    rnd, i = random.Random(2), 0
+    while i < len(data):                 # odd-sized writes so records straddle reads
+        j = min(len(data), i + rnd.randrange(1, 97))
+        try:
+            i += os.write(master, data[i:j])
+        except BlockingIOError:
+            time.sleep(0.001)
+    deadline = time.monotonic() + 5
+    while len(got) < len(want) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set(); reader.join(2)
+    ser.close(); os.close(master)
+    st = rd.stats()
+    bad = next((k for k, (g, w) in enumerate(zip(got, want)) if g != w), None)
+    ok = bad is None and len(got) == len(want) and st["crc_errors"] == 0 and st["skipped_bytes"] == 0
+    print(f"reader --check: {len(data)} B, {len(want)} records sent, {len(got)} decoded, "
+          f"crc errors {st['crc_errors']}, skipped {st['skipped_bytes']} B: {'OK' if ok else 'MISMATCH'}")
+    if bad is not None:
+        print(f"  first difference at record {bad}: sent {want[bad]!r}, decoded {got[bad]!r}")
+    return ok
+
+def cmd_reader(a):
+    from serial_reader import LineReader
+    if a.check:
+        sys.exit(0 if _check_reader(a.baud, a.n) else 1)
+    for name in ("legacy poll", "LineReader"):
+        master, slave, ser = _pty_serial(a.baud)
+        sent, lat = {}, []
+        def on_line(line, t_rx):
+            t = time.perf_counter()
+            try:
+                seq = int(line.split("C:")[1].split()[0])
+            except (IndexError, ValueError):
+                return
+            if seq in sent:
+                lat.append(t - sent[seq])
+        stop = threading.Event()
+        if name == "LineReader":
+            rd = LineReader(ser, on_line)
+            reader = threading.Thread(target=rd.run, args=(stop,), daemon=True)
+        else:
+            reader = threading.Thread(target=_legacy_poll, args=(ser, on_line, stop), daemon=True)
+        writer = threading.Thread(target=_blast, args=(master, stop, sent, a.baud), daemon=True)
+        reader.start(); writer.start()
+        time.sleep(a.duration)
+        backlog = ser.in_waiting
+        stop.set(); writer.join(); reader.join(2)
+        ser.close(); os.close(master)
+        blocked = sent.pop("blocked", 0)
+        print(f"{name:<12} sent {len(sent)/a.duration:7.1f} lines/s  got {len(lat)/a.duration:7.1f} lines/s  "
+              f"kernel backlog at end {backlog} B  writes refused {blocked}")
+        summary("  line age at parse", lat)
+
+# ---------- decode: text vs binary telemetry decoder throughput ----------
+def cmd_decode(a):
+    import random
+    import telemetry_codec as tc
+    rnd = random.Random(1)
+    vals = [(rnd.randrange(20, 450), rnd.randrange(20, 450), rnd.randrange(20, 450)) for _ in range(a.n)]
+    streams = {
+        "text lines": b"".join(tc.format_ultrasonic_text(*v) for v in vals),
+        "binary frames": b"".join(tc.encode_ultrasonic(*v) for v in vals),
+    }
+    print(f"decode: {a.n} ultrasonic records, fed in {a.chunk}-byte reads")
+    for name, data in streams.items():
+        best = float("inf")
+        for _ in range(a.repeat):
+            d = tc.StreamDecoder()
+            got = 0
+            t0 = time.perf_counter()
+            for i in range(0, len(data), a.chunk):
+                got += len(d.feed(data[i:i + a.chunk]))
+            best = min(best, time.perf_counter() - t0)
+        assert got == a.n, (name, got)
+        wire_s = len(data) * 10 / 115200
+        print(f"  {name:<14} {len(data)/a.n:5.1f} B/record  {a.n/best:10.0f} records/s  "
+              f"{best/a.n*1e6:6.2f} us/record  ({wire_s/a.n*1e3:.2f} ms/record on the wire at 115200)")
+
+# ---------- nmea: nmea.py vs pynmea2 on a captured file ----------
+def _synth_nmea(n):
+    # GGA/GSA/RMC/VTG/GSV epochs like a u-blox at 10 Hz, for when no capture is at hand
+    from functools import reduce
+    from operator import xor
+    def s(body):
+        return f"${body}*{reduce(xor, body.encode(), 0):02X}"
+    out = []
+    for i in range(n // 5):
+        t = f"{12 + i // 36000:02d}{(i // 600) % 60:02d}{(i // 10) % 60:02d}.{i % 10}0"
+        lat = f"4807.{38 + i % 50:03d}"
+        out += [s(f"GNGGA,{t},{lat},N,01131.000,E,1,12,0.8,545.4,M,46.9,M,,"),
+                s("GNGSA,A,3,04,05,09,12,24,25,29,31,,,,,1.6,0.8,1.4,1"),
+                s(f"GNRMC,{t},A,{lat},N,01131.000,E,1.{i % 10},84.4,230394,,,A"),
+                s(f"GNVTG,84.4,T,,M,1.{i % 10},N,2.{i % 10},K,A"),
+                s("GPGSV,3,1,12,04,77,046,45,05,38,289,42,09,17,091,38,12,63,237,44")]
+    return out
+
+def cmd_nmea(a):
+    import nmea
+    if a.file:
+        with open(a.file, encoding="ascii", errors="replace") as f:
+            lines = [l.strip() for l in f if l.startswith("$")]
+        src = a.file
+    else:
+        lines = _synth_nmea(a.synth)
+        src = f"{len(lines)} synthetic sentences (use --file for a capture)"
+    types = {}
+    for l in lines:
+        types[l[3:6]] = types.get(l[3:6], 0) + 1
+    print(f"nmea: {src}  mix {dict(sorted(types.items()))}")
+
+    ours = [l for l in lines if l[3:6] in nmea.PARSERS]
+    runs = [("nmea.py (GGA/RMC/VTG/GSA)", lambda l: nmea.parse(l), ours)]
+    if nmea.pynmea2 is not None:
+        import pynmea2
+        runs.append(("pynmea2 same sentences", lambda l: pynmea2.parse(l, check=True), ours))
+        runs.append(("pynmea2 GGA only (old)", lambda l: pynmea2.parse(l), [l for l in lines if l[3:6] == "GGA"]))
+    else:
+        print("  (pynmea2 not installed: only nmea.py timed)")
+    for name, fn, sample in runs:
+        best, bad = float("inf"), 0
+        for _ in range(a.repeat):
+            bad = 0
+            t0 = time.perf_counter()
+            for l in sample:
+                try:
+                    fn(l)
+                except ValueError:
+                    bad += 1
+            best = min(best, time.perf_counter() - t0)
+        n = max(1, len(sample))
+        print(f"  {name:<28} {len(sample):7d} sentences  {best/n*1e6:7.2f} us/sentence  "
+              f"{n/best:10.0f} /s  rejected {bad}")
+
+# ---------- usfilter: per-reading cost of the ultrasonic filter stage ----------
+def cmd_usfilter(a):
+    import random, tracemalloc
+    from usfilter import UltrasonicFilter
+    rnd = random.Random(1)
+    # approach/retreat ramps with noise, ~5% no-echo zeros and ~3% spikes
+    vals, d = [], 200.0
+    for i in range(a.n):
+        d = 30 + (d - 30 + rnd.gauss(-0.5 if (i // 400) % 2 else 0.5, 2)) % 400
+        def one():
+            r = rnd.random()
+            return 0 if r < 0.05 else int(d + (rnd.choice((-1, 1)) * rnd.randrange(80, 200) if r < 0.08 else rnd.gauss(0, 2)))
+        vals.append({"L": one(), "C": one(), "R": one()})
+    print(f"usfilter: {a.n} L/C/R readings (sensor sends ~{a.sensor_hz:g}/s)")
+    for name, kw in (("median", {}), ("median+kalman", {"kalman": True})):
+        best = float("inf")
+        for _ in range(a.repeat):
+            f = UltrasonicFilter(**kw)
+            t0 = time.perf_counter()
+            for i, v in enumerate(vals):
+                f.update(v, i * 0.12)
+            best = min(best, time.perf_counter() - t0)
+        # net allocations once warm: the window and state are reused, nothing accumulates
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i, v in enumerate(vals[:10000]):
+            f.update(v, (a.n + i) * 0.12)
+        grown = sum(st.size_diff for st in tracemalloc.take_snapshot().compare_to(before, "filename")
+                    if st.traceback[0].filename.endswith("usfilter.py"))
+        tracemalloc.stop()
+        per = best / a.n
+        st = f.stats()["C"]
+        print(f"  {name:<14} {per*1e6:6.2f} us/reading (3 channels)  {1/per:10.0f} readings/s  "
+              f"= {1/per/a.sensor_hz:6.0f}x sensor rate  retained after 10k: {grown} B  C: {st}")
+
+# ---------- suite: all of the above against fwsim + a spawned server, saved as JSON ----------
+def _ms(samples_s):
+    ms = [x * 1000 for x in samples_s]
+    if not ms:
+        return {"n": 0}
+    return {"n": len(ms), "p50": round(pct(ms, 50), 3), "p90": round(pct(ms, 90), 3),
+            "p99": round(pct(ms, 99), 3), "max": round(max(ms), 3)}
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _slope_per_min(points):
+    # least-squares kB per minute over (t_s, kb) samples
+    if len(points) < 2:
+        return None
+    n = len(points)
+    mt = sum(t for t, _ in points) / n
+    mk = sum(k for _, k in points) / n
+    den = sum((t - mt) ** 2 for t, _ in points)
+    return round(60.0 * sum((t - mt) * (k - mk) for t, k in points) / den, 1) if den else None
+
+def suite_wire(port, arrivals, n, gap):
+    """GET /F|/S on a kept-alive connection -> response time and time until the byte reaches the device."""
+    c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    http_lat, wire_lat, lost = [], [], 0
+    for i in range(n):
+        code = "FS"[i % 2]
+        seen = len(arrivals)
+        t0 = time.perf_counter()
+        c.request("GET", "/" + code); c.getresponse().read()
+        http_lat.append(time.perf_counter() - t0)
+        deadline = t0 + 1.0
+        while time.perf_counter() < deadline:
+            hit = next((t for ch, t in arrivals[seen:] if ch == code), None)
+            if hit is not None:
+                wire_lat.append(hit - t0); break
+            time.sleep(0.0002)
+        else:
+            lost += 1
+        time.sleep(gap)
+    c.close()
+    return {"http_ms": _ms(http_lat), "wire_ms": _ms(wire_lat), "lost": lost}
+
+def suite_log(n):
+    """Raw LogWriter throughput with log_event-shaped records: a burst into the
+    servers' default 10000-slot queue, and a queue big enough to see the writer's drain rate."""
+    import shutil, tempfile
+    from logwriter import LogWriter
+    out = {}
+    for name, maxsize in (("default_queue", 10000), ("no_drops", n + 1)):
+        d = tempfile.mkdtemp(prefix="bench_log_")
+        w = LogWriter(os.path.join(d, "events.jsonl"), os.path.join(d, "commands.csv"),
+                      maxsize=maxsize, index_dir=os.path.join(d, "index"))
+        t0 = time.perf_counter()
+        for i in range(n):
+            w.event({"ts": "2025-01-01T00:00:00.000Z", "uptime_s": round(time.perf_counter() - t0, 3),
+                     "session": "bench", "kind": "http_get", "path": "/F", "client": "127.0.0.1", "i": i})
+        t_put = time.perf_counter() - t0
+        w.close(timeout=120)
+        t_all = time.perf_counter() - t0
+        st = w.stats()
+        out[name] = {"records": n, "put_per_s": round(n / t_put), "written_per_s": round(st["written"] / t_all),
+                     "dropped": st["dropped"]}
+        shutil.rmtree(d, ignore_errors=True)
+    return out
+
+def suite_listener(duration, baud):
+    """RecordReader lines/s on a pty: at `baud` wire pacing and unpaced."""
+    from serial_reader import RecordReader
+    out = {}
+    for name, rate in (("wire_rate", baud), ("unpaced", 10 ** 9)):
+        master, slave, ser = _pty_serial(baud)
+        got = [0]
+        rd = RecordReader(ser, lambda kind, data, t: got.__setitem__(0, got[0] + 1))
+        stop, sent = threading.Event(), {}
+        reader = threading.Thread(target=rd.run, args=(stop,), daemon=True)
+        writer = threading.Thread(target=_blast, args=(master, stop, sent, rate), daemon=True)
+        reader.start(); writer.start()
+        time.sleep(duration)
+        stop.set(); writer.join(); reader.join(2)
+        ser.close(); os.close(master)
+        blocked = sent.pop("blocked", 0)
+        out[name] = {"sent_per_s": round(len(sent) / duration, 1), "parsed_per_s": round(got[0] / duration, 1),
+                     "writes_refused": blocked}
+    return out
+
+def suite_ingest(port, clients, duration, size):
+    body = ('{"blob":"' + "x" * size + '"}').encode()
+    stop, lat, errors = threading.Event(), [], [0]
+    def client():
+        c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                c.request("POST", "/ingest/bench", body=body, headers={"Content-Type": "application/json"})
+                c.getresponse().read()
+                lat.append(time.perf_counter() - t0)
+            except (http.client.HTTPException, OSError):
+                errors[0] += 1
+                c.close(); c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        c.close()
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(clients)]
+    for t in threads: t.start()
+    time.sleep(duration); stop.set()
+    for t in threads: t.join(5)
+    return {"clients": clients, "bytes": len(body), "per_s": round(len(lat) / duration, 1),
+            "latency_ms": _ms(lat), "errors": errors[0]}
+
+def suite_soak(port, pid, duration, sample_s=1.0):
+    """Drive + ingest + metrics traffic for `duration`; server RSS sampled every second."""
+    stop, done = threading.Event(), {"requests": 0}
+    def traffic():
+        c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        i = 0
+        while not stop.is_set():
+            path = ("/F", "/S", "/metrics.json")[i % 3]
+            i += 1
+            try:
+                if i % 5 == 0:
+                    c.request("POST", "/ingest/soak", body=b'{"v":1}', headers={"Content-Type": "application/json"})
+                else:
+                    c.request("GET", path)
+                c.getresponse().read(); done["requests"] += 1
+            except (http.client.HTTPException, OSError):
+                c.close(); c = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            stop.wait(0.01)
+        c.close()
+    th = threading.Thread(target=traffic, daemon=True); th.start()
+    t0 = time.monotonic()
+    pts = []
+    while time.monotonic() - t0 < duration:
+        kb = _rss_kb(pid)
+        if kb is not None:
+            pts.append((time.monotonic() - t0, kb))
+        time.sleep(sample_s)
+    stop.set(); th.join(5)
+    kbs = [k for _, k in pts]
+    return {"duration_s": duration, "requests": done["requests"],
+            "rss_kb": {"start": kbs[0], "end": kbs[-1], "max": max(kbs)} if kbs else None,
+            "rss_growth_kb_per_min": _slope_per_min(pts[len(pts) // 5:])}   # skip warm-up
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+def cmd_suite(a):
+    import json, shutil, subprocess, tempfile
+    from fwsim import Simulator
+    from replay import spawn_server, stop_server
+    arrivals = []
+    sim = Simulator(a.fw, a.baud, seed=1, on_command=lambda ch, t: arrivals.append((ch, t)),
+                    **({"ping_ms": a.ping_ms} if a.fw == "tank_jsn" else {})).start()
+    work = tempfile.mkdtemp(prefix="bench_suite_")
+    server = a.server or f"{a.fw}.py"
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        rev = ""
+    res = {"meta": {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": rev, "python": sys.version.split()[0],
+                    "host": socket.gethostname(), "server": server, "fw": a.fw, "baud": a.baud,
+                    "http_mode": os.environ.get("HTTP_MODE", "threaded"),
+                    "log_fsync": os.environ.get("LOG_FSYNC", "none")}}
+    proc = spawn_server(server, sim.path, a.port, work, env={"INGEST_TOPICS": "bench,soak"})
+    try:
+        print(f"suite: {server} on :{a.port}, {a.fw} simulator on {sim.path}", flush=True)
+        res["wire"] = suite_wire(a.port, arrivals, a.n, a.gap)
+        print("  wire done", flush=True)
+        res["ingest"] = suite_ingest(a.port, a.ingest_clients, a.ingest_s, a.ingest_bytes)
+        print("  ingest done", flush=True)
+        if a.soak_s > 0:
+            res["soak"] = suite_soak(a.port, proc.pid, a.soak_s)
+            print("  soak done", flush=True)
+    finally:
+        stop_server(proc)
+        sim.stop()
+    res["simulator"] = sim.stats()
+    res["log_event"] = suite_log(a.log_n)
+    res["listener"] = suite_listener(a.listener_s, a.baud)
+    if not a.keep:
+        shutil.rmtree(work, ignore_errors=True)
+
+    out = a.out or os.path.join("bench_results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=1)
+    print(json.dumps({k: v for k, v in res.items() if k != "meta"}, indent=1))
+    print(f"saved {out}")
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f:
+            old = _flatten({k: v for k, v in json.load(f).items() if k != "meta"})
+        new = _flatten({k: v for k, v in res.items() if k != "meta"})
+        print(f"\n{'metric':<40} {'before':>12} {'after':>12} {'change':>8}")
+        for k in sorted(set(old) & set(new)):
+            ch = f"{(new[k] - old[k]) / old[k] * 100:+.0f}%" if old[k] else ""
+            print(f"{k:<40} {old[k]:>12} {new[k]:>12} {ch:>8}")
+
+# ---------- main ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("load", help="drive-command latency while other clients hammer the server")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("--duration", type=float, default=10.0)
+    p.add_argument("--metrics-clients", type=int, default=4)
+    p.add_argument("--ingest-clients", type=int, default=2)
+    p.add_argument("--ingest-bytes", type=int, default=64 * 1024)
+    p.add_argument("--ingest-topic", default="bench", help="must be in the server's INGEST_TOPICS")
+    p.add_argument("--stall-clients", type=int, default=1)
+    p.add_argument("--stall-s", type=float, default=3.0)
+    p.add_argument("--gap", type=float, default=0.02, help="pause between /F,/S pairs")
+    p.add_argument("--timeout", type=float, default=10.0)
+    p.set_defaults(fn=cmd_load)
+
+    p = sub.add_parser("keepalive", help="per-command latency with and without HTTP keep-alive")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("-n", type=int, default=400)
+    p.add_argument("--gap", type=float, default=0.005)
+    p.set_defaults(fn=cmd_keepalive)
+
+    p = sub.add_parser("ws", help="input-to-serial latency over the WebSocket channel vs GET")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("-n", type=int, default=400)
+    p.add_argument("--burst", type=int, default=200)
+    p.add_argument("--gap", type=float, default=0.005)
+    p.set_defaults(fn=cmd_ws)
+
+    p = sub.add_parser("lease", help="drive-command latency while pages send lease keepalives")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    p.add_argument("-n", type=int, default=400)
+    p.add_argument("--clients", type=int, default=4)
+    p.add_argument("--hz", type=float, default=20.0, help="keepalives per second per client")
+    p.add_argument("--gap", type=float, default=0.02)
+    p.set_defaults(fn=cmd_lease)
+
+    p = sub.add_parser("reader", help="serial line reader throughput/latency on a pty at wire rate")
+    p.add_argument("--baud", type=int, default=115200)
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--check", action="store_true",
+                   help="instead: write known text lines and frames, exit 1 unless every record decodes back")
+    p.add_argument("-n", type=int, default=5000, help="records for --check")
+    p.set_defaults(fn=cmd_reader)
+
+    p = sub.add_parser("decode", help="text vs binary telemetry decoder throughput")
+    p.add_argument("-n", type=int, default=100000)
+    p.add_argument("--chunk", type=int, default=64)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(fn=cmd_decode)
+
+    p = sub.add_parser("nmea", help="nmea.py vs pynmea2 parse cost on a captured NMEA file")
+    p.add_argument("--file", help="raw sentences, e.g. from: python3 nmea.py capture /dev/serial0 gps.nmea")
+    p.add_argument("--synth", type=int, default=50000, help="synthetic sentences when no --file")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(fn=cmd_nmea)
+
+    p = sub.add_parser("usfilter", help="per-reading cost of the ultrasonic median/Kalman filter stage")
+    p.add_argument("-n", type=int, default=100000)
+    p.add_argument("--sensor-hz", type=float, default=8.3, help="L/C/R readings per second (sketch pings every 120 ms)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(fn=cmd_usfilter)
+
+    p = sub.add_parser("suite", help="full benchmark set against fwsim + a spawned server, saved as JSON")
+    p.add_argument("--fw", choices=("tank_jsn", "grid_autopilot"), default="tank_jsn")
+    p.add_argument("--server", help="server script (default: <fw>.py)")
+    p.add_argument("--port", type=int, default=8766)
+    p.add_argument("--baud", type=int, default=115200)
+    p.add_argument("--ping-ms", type=int, default=20, help="simulator ping interval (tank_jsn)")
+    p.add_argument("-n", type=int, default=400, help="drive commands for the wire-latency test")
+    p.add_argument("--gap", type=float, default=0.02)
+    p.add_argument("--ingest-clients", type=int, default=4)
+    p.add_argument("--ingest-s", type=float, default=5.0)
+    p.add_argument("--ingest-bytes", type=int, default=256)
+    p.add_argument("--log-n", type=int, default=200000)
+    p.add_argument("--listener-s", type=float, default=3.0)
+    p.add_argument("--soak-s", type=float, default=60.0, help="memory-growth run (0 = skip)")
+    p.add_argument("--out", help="JSON path (default bench_results/<timestamp>.json)")
+    p.add_argument("--compare", help="earlier results JSON to diff against")
+    p.add_argument("--keep", action="store_true", help="keep the server's runlogs working dir")
+    p.set_defaults(fn=cmd_suite)
+
+    a = ap.parse_args(argv)
+    a.fn(a)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""SQLite catalog of runlogs sessions.
+
+The servers add a row when a session starts (_write_session_meta) and fill
+in end time, counts, per-kind time ranges and drive time per code on
+_shutdown. Sessions from before the catalog (or from a crash) are picked up
+by a rebuild scan. Default location: runlogs/catalog.sqlite.
+
+    python3 catalog.py rebuild runlogs/
+    python3 catalog.py find --since 7d --code F --min-s 600     # >10 min of F in the last week
+    python3 catalog.py sql "select session, end_ts - start_ts from sessions order by start_ts desc limit 5"
+"""
+import argparse, json, os, re, sqlite3, sys, time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+DEFAULT_PATH = Path("runlogs") / "catalog.sqlite"
+DRIVE = "FBLRSXYGT"
+COLUMN_PREFIX = "col:"      # colstore tables are kinds "col:ultrasonic", "col:commands" (rows, not events)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session   TEXT PRIMARY KEY,
+    run_dir   TEXT,
+    start_ts  REAL,
+    end_ts    REAL,
+    host      TEXT,
+    ser_dev   TEXT,
+    baud      INTEGER,
+    events    INTEGER,
+    commands  INTEGER,
+    complete  INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS kind_ranges (
+    session TEXT, kind TEXT, count INTEGER, first_uptime REAL, last_uptime REAL,
+    PRIMARY KEY (session, kind)
+);
+CREATE TABLE IF NOT EXISTS drive_time (
+    session TEXT, code TEXT, seconds REAL,
+    PRIMARY KEY (session, code)
+);
+CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start_ts);
+CREATE INDEX IF NOT EXISTS kind_ranges_kind ON kind_ranges(kind, count);
+CREATE INDEX IF NOT EXISTS drive_time_code ON drive_time(code, seconds);
+"""
+
+class DriveTimer:
+    """Accumulates how long each drive code was held (fed from the serial writer)."""
+    def __init__(self):
+        self.totals = {}
+        self.code = None
+        self.since = None
+
+    def mark(self, code, t):
+        if code not in DRIVE:
+            return
+        if self.code is not None:
+            self.totals[self.code] = self.totals.get(self.code, 0.0) + (t - self.since)
+        self.code, self.since = code, t
+
+    def snapshot(self, t_end):
+        out = dict(self.totals)
+        if self.code is not None:
+            out[self.code] = out.get(self.code, 0.0) + max(0.0, t_end - self.since)
+        return {k: round(v, 3) for k, v in out.items()}
+
+
+class Catalog:
+    def __init__(self, path=DEFAULT_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=5.0)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def session_started(self, meta):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO sessions(session, run_dir, start_ts, host, ser_dev, baud) VALUES (?,?,?,?,?,?) "
+                "ON CONFLICT(session) DO UPDATE SET run_dir=excluded.run_dir, start_ts=excluded.start_ts, "
+                "host=excluded.host, ser_dev=excluded.ser_dev, baud=excluded.baud",
+                (meta["session"], meta.get("run_dir"), meta.get("start_ts"), meta.get("hostname"),
+                 meta.get("ser_dev"), meta.get("baud")))
+
+    def session_ended(self, session, end_ts, events, commands, kinds, drive_s):
+        """kinds: {kind: (count, first_uptime, last_uptime)}; drive_s: {code: seconds}."""
+        with self.db:
+            self.db.execute("UPDATE sessions SET end_ts=?, events=?, commands=?, complete=1 WHERE session=?",
+                            (end_ts, events, commands, session))
+            self.db.execute("DELETE FROM kind_ranges WHERE session=?", (session,))
+            self.db.executemany("INSERT INTO kind_ranges VALUES (?,?,?,?,?)",
+                                [(session, k, c, f, l) for k, (c, f, l) in kinds.items()])
+            self.db.execute("DELETE FROM drive_time WHERE session=?", (session,))
+            self.db.executemany("INSERT INTO drive_time VALUES (?,?,?)",
+                                [(session, k, v) for k, v in drive_s.items()])
+
+    def find(self, since_ts=None, code=None, min_s=0.0, kind=None):
+        sql = "SELECT s.session, s.run_dir, s.start_ts, s.end_ts, s.host"
+        args = []
+        if code:
+            sql += ", d.seconds FROM sessions s JOIN drive_time d ON d.session = s.session AND d.code = ? AND d.seconds >= ?"
+            args += [code, min_s]
+        else:
+            sql += " FROM sessions s"
+        if kind:
+            sql += " JOIN kind_ranges k ON k.session = s.session AND k.kind = ?"
+            args.append(kind)
+        if since_ts is not None:
+            sql += " WHERE s.start_ts >= ?"
+            args.append(since_ts)
+        sql += " ORDER BY s.start_ts"
+        return self.db.execute(sql, args).fetchall()
+
+    def log_ended(self, session, end_ts, log_kinds, drive_s):
+        """session_ended() from LogWriter.kinds (event kinds + column tables)."""
+        kinds = {k: tuple(v) for k, v in log_kinds.items() if k is not None}
+        events = sum(v[0] for k, v in kinds.items() if not k.startswith(COLUMN_PREFIX))
+        commands = kinds.get(COLUMN_PREFIX + "commands", kinds.get("tx", (0,)))[0]
+        self.session_ended(session, end_ts, events, commands, kinds, drive_s)
+
+    # ---------- rebuild ----------
+    def rebuild(self, roots, jobs=None):
+        from analyze_runs import find_sessions
+        runs = find_sessions(roots)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for meta, end in pool.map(scan_run, runs, chunksize=4):
+                self.session_started(meta)
+                self.session_ended(meta["session"], *end)
+        return len(runs)
+
+
+_KIND = re.compile(rb'"kind": "([^"]*)"')
+_UP = re.compile(rb'"uptime_s": ([-0-9.eE]+)')
+_CMD = re.compile(rb'"command": "([^"]*)"')
+
+def scan_run(run):
+    """One pass over a session's files -> (meta, (end_ts, events, commands, kinds, drive_s))."""
+    from logrotate import event_files, open_segment
+    run = Path(run)
+    try:
+        meta = json.loads((run / "session.json").read_text())
+    except (OSError, ValueError):
+        meta = {}
+    meta.setdefault("session", run.name.split("_", 1)[-1])
+    meta.setdefault("run_dir", str(run))
+    if meta.get("start_ts") is None:
+        try:
+            meta["start_ts"] = float(run.name.split("_", 1)[0])
+        except ValueError:
+            meta["start_ts"] = None
+
+    kinds, cmds, events, last = {}, [], 0, 0.0
+    for path in event_files(run):
+        with open_segment(path) as f:
+            for raw in f:
+                events += 1
+                m, u = _KIND.search(raw), _UP.search(raw)
+                if not m or not u:
+                    continue
+                k, up = m.group(1).decode(), float(u.group(1))
+                c = kinds.get(k)
+                kinds[k] = (1, up, up) if c is None else (c[0] + 1, c[1], up)
+                last = max(last, up)
+                if k == "tx":
+                    cm = _CMD.search(raw)
+                    if cm:
+                        cmds.append((up, cm.group(1).decode()[:1]))
+
+    col = run / "columns"
+    if (col / "schema.json").exists():
+        ut = _read_col(col / "ultrasonic.uptime.f8", "d")
+        if ut:
+            kinds[COLUMN_PREFIX + "ultrasonic"] = (len(ut), ut[0], ut[-1]); last = max(last, ut[-1])
+        ct, cc = _read_col(col / "commands.uptime.f8", "d"), _read_col(col / "commands.code.u1", "B")
+        if ct:
+            kinds[COLUMN_PREFIX + "commands"] = (len(ct), ct[0], ct[-1])
+            cmds = [(t, chr(c)) for t, c in zip(ct, cc)]
+            last = max(last, ct[-1])
+    dt = DriveTimer()
+    for t, c in cmds:
+        dt.mark(c, t)
+    end_ts = (meta["start_ts"] + last) if meta.get("start_ts") is not None else None
+    return meta, (end_ts, events, len(cmds), kinds, dt.snapshot(last))
+
+def _read_col(path, typecode):
+    a = array(typecode)
+    try:
+        with open(path, "rb") as f:
+            n = os.path.getsize(path) // a.itemsize
+            a.fromfile(f, n)
+    except (OSError, EOFError):
+        pass
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+
+# ---------- CLI ----------
+def _since(s):
+    if s is None:
+        return None
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    if s[-1] in units:
+        return time.time() - float(s[:-1]) * units[s[-1]]
+    return float(s)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db", default=str(DEFAULT_PATH))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("rebuild"); p.add_argument("roots", nargs="+"); p.add_argument("-j", "--jobs", type=int)
+    p = sub.add_parser("find")
+    p.add_argument("--since", help="epoch seconds or 30m/12h/7d/2w ago")
+    p.add_argument("--code"); p.add_argument("--min-s", type=float, default=0.0); p.add_argument("--kind")
+    p = sub.add_parser("sql"); p.add_argument("query")
+    a = ap.parse_args(argv)
+
+    cat = Catalog(a.db)
+    if a.cmd == "rebuild":
+        print(f"catalogued {cat.rebuild(a.roots, a.jobs)} sessions into {a.db}")
+    elif a.cmd == "find":
+        for row in cat.find(_since(a.since), a.code, a.min_s, a.kind):
+            print("\t".join("" if v is None else str(v) for v in row))
+    else:
+        for row in cat.db.execute(a.query):
+            print("\t".join("" if v is None else str(v) for v in row))
+    cat.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Append-only columnar store for high-rate telemetry.
+
+One raw little-endian file per column under <run>/columns/, described by
+columns/schema.json, so a column is just a typed array on disk:
+
+    ultrasonic.uptime.f8  ultrasonic.L.i2  ultrasonic.C.i2  ultrasonic.R.i2
+    commands.uptime.f8    commands.code.u1          (code = ASCII of F/S/5/...)
+
+That is 14 bytes per ultrasonic reading instead of ~150 bytes of JSON, and
+load() memory-maps it straight into NumPy arrays. Distances use -1 for
+no reading - and for values the column type can't hold (the text protocol
+has no CRC, so a garbled "C: 99999" can arrive): a row is written whole or
+not at all, so the columns never drift apart. events.jsonl keeps the sparse
+events (http, tx, heartbeats...).
+
+    python3 colstore.py convert runlogs/<date>/<run> [...]   # backfill old runs from events.jsonl
+    python3 colstore.py info runlogs/<date>/<run>
+"""
+import json, os, sys, threading
+from array import array
+from pathlib import Path
+
+MISSING = -1
+_INT_RANGE = {"h": (-0x8000, 0x7FFF), "B": (0, 0xFF)}
+
+def fit(typecode, v):
+    """v as stored in a `typecode` column: None / out of range -> MISSING (signed columns)."""
+    if v is None:
+        return MISSING
+    r = _INT_RANGE.get(typecode)
+    if r is None:
+        return float(v)
+    v = int(v)
+    if not r[0] <= v <= r[1]:
+        if r[0] > MISSING:
+            raise ValueError(f"{v!r} does not fit column type {typecode!r}")
+        return MISSING
+    return v
+
+# table -> [(column, array typecode, numpy dtype)]
+SCHEMA = {
+    "ultrasonic": [("uptime", "d", "<f8"), ("L", "h", "<i2"), ("C", "h", "<i2"), ("R", "h", "<i2")],
+    "commands":   [("uptime", "d", "<f8"), ("code", "B", "|u1")],
+}
+
+def _fname(table, col, dtype):
+    return f"{table}.{col}.{dtype.lstrip('<|')}"
+
+def columns_dir(run_dir):
+    return Path(run_dir) / "columns"
+
+
+class ColumnWriter:
+    """Buffers rows in array.array columns; flush() appends them to the column files.
+
+    append() may be called from any thread; flush()/close() from one owner
+    (LogWriter's thread in the servers).
+    """
+    def __init__(self, run_dir, schema=SCHEMA):
+        self.dir = columns_dir(run_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._buf = {t: [array(tc) for _, tc, _ in cols] for t, cols in schema.items()}
+        self._files = {t: [open(self.dir / _fname(t, c, dt), "ab") for c, _, dt in cols]
+                       for t, cols in schema.items()}
+        self.rows = {t: 0 for t in schema}
+        self.out_of_range = 0       # cells stored as MISSING because the type couldn't hold them
+        with open(self.dir / "schema.json", "w", encoding="utf-8") as f:
+            json.dump({t: [{"name": c, "dtype": dt, "file": _fname(t, c, dt)} for c, _, dt in cols]
+                       for t, cols in schema.items()}, f, indent=1)
+
+    def append(self, table, row):
+        bufs = self._buf[table]
+        # convert the whole row first: a failure must not leave some columns a row ahead
+        cells = [fit(a.typecode, v) for a, v in zip(bufs, row)]
+        self.out_of_range += sum(1 for c, v in zip(cells, row) if c == MISSING and v is not None)
+        with self._lock:
+            for a, c in zip(self._buf[table], cells):
+                a.append(c)
+
+    def flush(self):
+        with self._lock:
+            full = {t: bufs for t, bufs in self._buf.items() if bufs[0]}
+            for t in full:
+                self._buf[t] = [array(a.typecode) for a in full[t]]
+        for t, bufs in full.items():
+            for f, a in zip(self._files[t], bufs):
+                if sys.byteorder != "little":
+                    a.byteswap()
+                a.tofile(f)
+                f.flush()
+            self.rows[t] += len(bufs[0])
+
+    def fileno_list(self):
+        return [f.fileno() for fs in self._files.values() for f in fs]
+
+    def close(self):
+        self.flush()
+        for fs in self._files.values():
+            for f in fs:
+                f.close()
+
+    def stats(self):
+        return {**self.rows, "out_of_range": self.out_of_range}
+
+
+def load(run_dir, table, mmap=True):
+    """{column: numpy array} for one table; rows cut to the shortest column
+    (a crash mid-flush can leave one column a row ahead)."""
+    import numpy as np
+    d = columns_dir(run_dir)
+    with open(d / "schema.json", encoding="utf-8") as f:
+        cols = json.load(f)[table]
+    out = {}
+    for c in cols:
+        path = d / c["file"]
+        dt = np.dtype(c["dtype"])
+        n = os.path.getsize(path) // dt.itemsize if path.exists() else 0
+        if n == 0:
+            out[c["name"]] = np.zeros(0, dt)
+        elif mmap:
+            out[c["name"]] = np.memmap(path, dtype=dt, mode="r", shape=(n,))
+        else:
+            out[c["name"]] = np.fromfile(path, dtype=dt, count=n)
+    n = min((len(a) for a in out.values()), default=0)
+    return {k: a[:n] for k, a in out.items()}
+
+def has_columns(run_dir):
+    return (columns_dir(run_dir) / "schema.json").exists()
+
+
+# ---------- converter for runs recorded before the column store ----------
+def convert(run_dir):
+    """Backfill columns/ from the ultrasonic and tx events of an existing run."""
+    from logrotate import iter_events
+    run_dir = Path(run_dir)
+    if has_columns(run_dir):
+        for p in columns_dir(run_dir).iterdir():
+            p.unlink()
+    w = ColumnWriter(run_dir)
+    n = 0
+    for rec in iter_events(run_dir, kinds={"ultrasonic", "tx"}):
+        up = rec.get("rx_uptime_s", rec.get("uptime_s"))
+        if rec["kind"] == "ultrasonic":
+            d = rec.get("data") or {}
+            w.append("ultrasonic", (up, d.get("L"), d.get("C"), d.get("R")))
+        elif rec.get("command"):
+            w.append("commands", (up, ord(rec["command"][0])))
+        n += 1
+        if n % 50000 == 0:
+            w.flush()
+    w.close()
+    return w.stats()
+
+def _main(argv):
+    if len(argv) < 3 or argv[1] not in ("convert", "info"):
+        sys.exit("usage: colstore.py convert|info <run_dir> [...]")
+    for run in argv[2:]:
+        if argv[1] == "convert":
+            print(run, convert(run))
+        else:
+            for t in SCHEMA:
+                cols = load(run, t)
+                print(run, t, {k: (len(a), str(a.dtype)) for k, a in cols.items()})
+
+if __name__ == "__main__":
+    _main(sys.argv)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""QMC5883L compass: rate-honouring sampler, calibration and ellipsoid fit.
+
+The sensor runs continuously at the rate set in CONTROL1 (0x1D = 200 Hz).
+CompassSampler reads it on its own thread whenever the data-ready flag is
+up, applies a fixed calibration (hard-iron offset + soft-iron matrix) and
+keeps a window of calibrated vectors; heading comes from the window mean,
+so it does not wrap badly around 0/360 like averaging angles would.
+
+    python3 compass.py record raw.csv --seconds 60     # spin the robot slowly, full circles
+    python3 compass.py calibrate raw.csv -o compass_cal.json [--2d]
+    python3 compass.py run --cal compass_cal.json      # print calibrated heading
+    python3 compass.py run --mock                      # same, against MockBus off-robot
+
+Any object with smbus2.SMBus's write_byte_data/read_byte_data/
+read_i2c_block_data works as the bus, e.g. MockBus below.
+"""
+import argparse, json, math, random, threading, time
+from collections import deque
+
+I2C_ADDR = 0x0D
+REG_DATA = 0x00         # X LSB .. Z MSB (6 bytes)
+REG_STATUS = 0x06       # bit0 DRDY, bit1 OVL (range overflow), bit2 DOR (data skipped)
+REG_CONTROL1 = 0x09
+REG_PERIOD = 0x0B
+CONTROL1 = 0x1D         # OSR 512, 2 G, 200 Hz, continuous
+ODR_HZ = {0: 10, 1: 50, 2: 100, 3: 200}
+
+def _s16(lo, hi):
+    v = (hi << 8) | lo
+    return v - 65536 if v > 32767 else v
+
+
+class QMC5883L:
+    def __init__(self, bus, addr=I2C_ADDR, control1=CONTROL1):
+        self.bus = bus
+        self.addr = addr
+        self.control1 = control1
+        self.rate_hz = ODR_HZ[(control1 >> 2) & 3]
+
+    def configure(self):
+        self.bus.write_byte_data(self.addr, REG_PERIOD, 0x01)      # set/reset period (datasheet)
+        self.bus.write_byte_data(self.addr, REG_CONTROL1, self.control1)
+
+    def status(self):
+        return self.bus.read_byte_data(self.addr, REG_STATUS)
+
+    def read_raw(self):
+        d = self.bus.read_i2c_block_data(self.addr, REG_DATA, 6)
+        return _s16(d[0], d[1]), _s16(d[2], d[3]), _s16(d[4], d[5])
+
+
+class Calibration:
+    """calibrated = matrix @ (raw - offset)."""
+    def __init__(self, offset=(0.0, 0.0, 0.0), matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1))):
+        self.offset = tuple(float(v) for v in offset)
+        self.matrix = tuple(tuple(float(v) for v in row) for row in matrix)
+
+    def apply(self, raw):
+        x, y, z = (raw[0] - self.offset[0], raw[1] - self.offset[1], raw[2] - self.offset[2])
+        m = self.matrix
+        return (m[0][0] * x + m[0][1] * y + m[0][2] * z,
+                m[1][0] * x + m[1][1] * y + m[1][2] * z,
+                m[2][0] * x + m[2][1] * y + m[2][2] * z)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            d = json.load(f)
+        return cls(d["offset"], d["matrix"])
+
+    def save(self, path, **extra):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"offset": self.offset, "matrix": self.matrix, **extra}, f, indent=1)
+
+
+def heading_deg(x, y):
+    h = math.degrees(math.atan2(y, x))
+    return h + 360.0 if h < 0 else h
+
+
+class CompassSampler:
+    """Reads every sample the sensor produces (DRDY-gated) on a background thread."""
+    def __init__(self, sensor, calib=None, window=20, raw_log=None, on_sample=None):
+        self.sensor = sensor
+        self.calib = calib or Calibration()
+        self.window = deque(maxlen=window)
+        self.raw_log = raw_log          # optional open text file: "t,x,y,z" per raw sample
+        self.on_sample = on_sample      # (t_mono, heading_deg) after each sample, on the sampler thread
+        self._lock = threading.Lock()
+        self._last = None               # (t_mono, heading, mean vector, raw)
+        self.samples = 0
+        self.not_ready = 0
+        self.overflows = 0
+        self.skipped = 0                # DOR: sensor overwrote a sample we never read
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._win = (time.monotonic(), 0)   # (start, samples) of the rate window being filled
+        self._rate = 0.0                    # samples/s over the last full second
+        self._last_read = time.monotonic()
+
+    def poll(self):
+        """One DRDY check + read; True if a sample was taken."""
+        st = self.sensor.status()
+        if not st & 0x01:
+            self.not_ready += 1
+            return False
+        if st & 0x04:
+            self.skipped += 1
+        raw = self.sensor.read_raw()
+        t = self._last_read = time.monotonic()
+        if st & 0x02:
+            self.overflows += 1         # saturated: don't let it drag the average
+            return True
+        cal = self.calib.apply(raw)
+        with self._lock:
+            self.window.append(cal)
+            n = len(self.window)
+            mx = sum(v[0] for v in self.window) / n
+            my = sum(v[1] for v in self.window) / n
+            mz = sum(v[2] for v in self.window) / n
+            self._last = (t, heading_deg(mx, my), (mx, my, mz), raw)
+            self.samples += 1
+            t0, n0 = self._win
+            if t - t0 >= 1.0:               # rolled here, so stats() has no side effects
+                self._rate = (self.samples - n0) / (t - t0)
+                self._win = (t, self.samples)
+        if self.raw_log:
+            self.raw_log.write(f"{t:.4f},{raw[0]},{raw[1]},{raw[2]}\n")
+        if self.on_sample:
+            self.on_sample(t, self._last[1])
+        return True
+
+    def run(self):
+        period = 1.0 / self.sensor.rate_hz
+        while not self._stop.is_set():
+            try:
+                got = self.poll()
+            except OSError:             # I2C glitch (loose wire, bus contention)
+                self.errors += 1
+                self._stop.wait(0.05)
+                continue
+            # next sample is due one period after this one: sleep until just before
+            # it (measured from the read, so our own processing doesn't push us late),
+            # then re-check in short steps until DRDY rises
+            if got:
+                self._stop.wait(max(0.0, self._last_read + period * 0.9 - time.monotonic()))
+            else:
+                self._stop.wait(period * 0.1)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="compass", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def latest(self):
+        """{"heading_deg", "vector", "raw", "window", "age_s"} or None before the first sample."""
+        with self._lock:
+            last, n = self._last, len(self.window)
+        if last is None:
+            return None
+        t, h, vec, raw = last
+        return {"heading_deg": round(h, 2), "vector": [round(v, 2) for v in vec], "raw": list(raw),
+                "window": n, "age_s": round(time.monotonic() - t, 4)}
+
+    def stats(self):
+        rate = self._rate if time.monotonic() - self._win[0] < 2.0 else 0.0    # stalled: no samples
+        return {"samples": self.samples, "samples_per_s": round(rate, 1),
+                "rate_hz": self.sensor.rate_hz, "not_ready": self.not_ready, "overflows": self.overflows,
+                "skipped": self.skipped, "errors": self.errors}
+
+
+class MockBus:
+    """Stand-in for smbus2.SMBus that emulates a QMC5883L in a (distorted) field.
+
+    heading_fn(t) gives the true heading in degrees; hard-iron offset and a
+    soft-iron matrix distort the field like motors and steel nearby do.
+    DRDY rises on the sensor's own output-data-rate clock, DOR when a tick was missed.
+    """
+    def __init__(self, heading_fn=lambda t: (t * 30.0) % 360, field=3000.0, incl_deg=60.0,
+                 offset=(400.0, -250.0, 120.0), soft=((1.1, 0.08, 0.0), (0.08, 0.9, 0.0), (0.0, 0.0, 1.0)),
+                 noise=15.0, seed=None):
+        self.heading_fn, self.field, self.incl = heading_fn, field, math.radians(incl_deg)
+        self.offset, self.soft, self.noise = offset, soft, noise
+        self.rng = random.Random(seed)
+        self.regs = {REG_CONTROL1: 0, REG_PERIOD: 0}
+        self._t0 = time.monotonic()
+        self._read_idx = 0              # output-data-rate tick of the last sample read
+
+    def _rate(self):
+        return ODR_HZ[(self.regs[REG_CONTROL1] >> 2) & 3] if self.regs[REG_CONTROL1] & 3 else 0
+
+    def write_byte_data(self, addr, reg, val):
+        self.regs[reg] = val
+
+    def read_byte_data(self, addr, reg):
+        if reg != REG_STATUS:
+            return self.regs.get(reg, 0)
+        rate = self._rate()
+        if not rate:
+            return 0
+        new = int((time.monotonic() - self._t0) * rate) - self._read_idx
+        return (0x01 if new >= 1 else 0) | (0x04 if new >= 2 else 0)
+
+    def read_i2c_block_data(self, addr, reg, n):
+        t = time.monotonic() - self._t0
+        self._read_idx = int(t * (self._rate() or 1))
+        h = math.radians(self.heading_fn(t))
+        hz = self.field * math.cos(self.incl)
+        v = (hz * math.cos(h), hz * math.sin(h), self.field * math.sin(self.incl))
+        s = self.soft
+        d = [sum(s[i][j] * v[j] for j in range(3)) + self.offset[i] + self.rng.gauss(0, self.noise)
+             for i in range(3)]
+        out = []
+        for x in d:
+            x = max(-32768, min(32767, int(round(x)))) & 0xFFFF
+            out += [x & 0xFF, x >> 8]
+        return out[:n]
+
+
+# ---------- calibration fit ----------
+def fit_ellipsoid(xyz, planar=False):
+    """Least-squares hard/soft-iron fit -> Calibration mapping the samples onto a sphere.
+
+    3D: solves  a x^2 + b y^2 + c z^2 + 2d xy + 2e xz + 2f yz + 2g x + 2h y + 2i z = 1
+    for all samples at once. planar=True fits only the x/y ellipse (robot turning
+    on flat ground, where z barely changes) and just centres z.
+    """
+    import numpy as np
+    P = np.asarray(xyz, dtype=float)
+    x, y, z = P[:, 0], P[:, 1], P[:, 2]
+    if planar:
+        D = np.column_stack([x * x, y * y, 2 * x * y, 2 * x, 2 * y])
+        (a, b, d, g, h), *_ = np.linalg.lstsq(D, np.ones(len(P)), rcond=None)
+        Q = np.array([[a, d], [d, b]]); lin = np.array([g, h])
+    else:
+        D = np.column_stack([x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z])
+        (a, b, c, d, e, f, g, h, i), *_ = np.linalg.lstsq(D, np.ones(len(P)), rcond=None)
+        Q = np.array([[a, d, e], [d, b, f], [e, f, c]]); lin = np.array([g, h, i])
+    center = -np.linalg.solve(Q, lin)
+    k = 1.0 + center @ Q @ center
+    w, V = np.linalg.eigh(Q / k)
+    if np.any(w <= 0):
+        raise ValueError("samples don't describe an ellipsoid - tilt through more orientations, "
+                         "or use planar=True (--2d) for flat-ground spins")
+    radii = 1.0 / np.sqrt(w)
+    scale = np.exp(np.mean(np.log(radii)))          # keep output in raw counts
+    W = V @ np.diag(np.sqrt(w)) @ V.T * scale
+    if planar:
+        M = np.eye(3); M[:2, :2] = W
+        off = [center[0], center[1], float(np.mean(z))]
+    else:
+        M, off = W, list(center)
+    resid = np.linalg.norm((P - off) @ M.T, axis=1)
+    return Calibration(off, M.tolist()), {"radius": float(np.mean(resid)),
+                                          "radius_spread_pct": float(100 * np.std(resid) / np.mean(resid)),
+                                          "samples": int(len(P)), "planar": planar}
+
+def load_raw(path):
+    rows = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.strip().split(",")
+            if len(parts) == 4:
+                try:
+                    rows.append([float(v) for v in parts[1:]])
+                except ValueError:
+                    continue        # header
+    return rows
+
+
+# ---------- CLI ----------
+def _open(mock):
+    if mock:
+        bus = MockBus(seed=1)
+    else:
+        import smbus2
+        bus = smbus2.SMBus(1)
+    sensor = QMC5883L(bus)
+    sensor.configure()
+    return sensor
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mock", action="store_true", help="use MockBus instead of I2C bus 1")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("record"); p.add_argument("out"); p.add_argument("--seconds", type=float, default=60.0)
+    p = sub.add_parser("calibrate"); p.add_argument("raw"); p.add_argument("-o", "--out", default="compass_cal.json")
+    p.add_argument("--2d", dest="planar", action="store_true", help="fit x/y only (flat-ground spins)")
+    p = sub.add_parser("run"); p.add_argument("--cal"); p.add_argument("--window", type=int, default=20)
+    a = ap.parse_args(argv)
+
+    if a.cmd == "calibrate":
+        cal, info = fit_ellipsoid(load_raw(a.raw), a.planar)
+        cal.save(a.out, **info)
+        print(f"saved {a.out}: offset={[round(v, 1) for v in cal.offset]} {info}")
+        return
+    sensor = _open(a.mock)
+    if a.cmd == "record":
+        with open(a.out, "w", encoding="utf-8") as f:
+            f.write("t,x,y,z\n")
+            s = CompassSampler(sensor, raw_log=f).start()
+            time.sleep(a.seconds)
+            s.stop()
+        print(f"recorded {s.samples} samples to {a.out}", s.stats())
+        return
+    s = CompassSampler(sensor, Calibration.load(a.cal) if a.cal else None, window=a.window).start()
+    try:
+        while True:
+            time.sleep(1.0)
+            print(s.latest(), s.stats())
+    except KeyboardInterrupt:
+        s.stop()
+
+if __name__ == "__main__":
+    main()
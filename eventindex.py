@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Sidecar offset index for events.jsonl.
+
+Built incrementally by LogWriter as it appends, stored next to the log:
+
+    index/events.idx         one <Qd record per line: byte offset, uptime_s
+                             (record n describes line n, so line -> offset is
+                             one seek; uptime is kept non-decreasing so it can
+                             be binary-searched)
+    index/kind.<kind>.idx    <Q line numbers of every line of that kind
+
+A query like kind=ultrasonic from line 120000, limit 50 is a bisect in the
+kind file, 50 lookups in events.idx and 50 seeks into the log - no scan of
+the JSONL, however large it is.
+
+    python3 eventindex.py build runlogs/<date>/<run>/events.jsonl   # index an old run
+"""
+import json, os, re, struct, sys
+from pathlib import Path
+from logrotate import open_segment
+
+REC = struct.Struct("<Qd")
+LINE = struct.Struct("<Q")
+
+def _kind_file(index_dir, kind):
+    return Path(index_dir) / f"kind.{re.sub(r'[^A-Za-z0-9_.-]', '_', kind or 'none')}.idx"
+
+def index_dir_for(events_path):
+    return Path(events_path).parent / "index"
+
+
+class IndexWriter:
+    """Used from the LogWriter thread only: add() per line, flush() per batch."""
+    def __init__(self, index_dir, start_line=0, last_uptime=0.0):
+        self.dir = Path(index_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.line = start_line
+        self.uptime = last_uptime
+        self._main = open(self.dir / "events.idx", "ab")
+        self._kinds = {}           # kind -> (file, bytearray)
+        self._buf = bytearray()
+
+    def add(self, offset, uptime, kind):
+        if uptime is not None and uptime > self.uptime:
+            self.uptime = uptime
+        self._buf += REC.pack(offset, self.uptime)
+        k = self._kinds.get(kind)
+        if k is None:
+            k = self._kinds[kind] = (open(_kind_file(self.dir, kind), "ab"), bytearray())
+        k[1].extend(LINE.pack(self.line))
+        self.line += 1
+
+    def flush(self):
+        # events.idx before the kind lists, so any line a kind list names is already resolvable.
+        if self._buf:
+            self._main.write(self._buf); self._main.flush(); self._buf.clear()
+        for f, b in self._kinds.values():
+            if b:
+                f.write(b); f.flush(); b.clear()
+
+    def close(self):
+        self.flush()
+        self._main.close()
+        for f, _ in self._kinds.values():
+            f.close()
+
+
+def build(events_path, index_dir=None):
+    """(Re)build the index for an existing events.jsonl by scanning it once."""
+    index_dir = Path(index_dir or index_dir_for(events_path))
+    index_dir.mkdir(parents=True, exist_ok=True)
+    for p in index_dir.glob("*.idx"):
+        p.unlink()
+    w = IndexWriter(index_dir)
+    off = 0
+    with open(events_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break                      # torn last line; leave it unindexed
+            try:
+                rec = json.loads(raw)
+            except ValueError:
+                rec = {}
+            w.add(off, rec.get("uptime_s"), rec.get("kind"))
+            off += len(raw)
+            if w.line % 10000 == 0:
+                w.flush()
+    w.close()
+    return w.line
+
+
+class EventIndex:
+    """Read side: look up lines of events.jsonl by line number, uptime and kind."""
+    def __init__(self, events_path, index_dir=None):
+        self.events_path = Path(events_path)
+        self.dir = Path(index_dir or index_dir_for(events_path))
+
+    def count(self):
+        try:
+            return os.path.getsize(self.dir / "events.idx") // REC.size
+        except OSError:
+            return 0
+
+    def kinds(self):
+        return sorted(p.name[len("kind."):-len(".idx")] for p in self.dir.glob("kind.*.idx"))
+
+    def _rec(self, f, n):
+        f.seek(n * REC.size)
+        return REC.unpack(f.read(REC.size))
+
+    def line_for_uptime(self, uptime):
+        """First line with uptime_s >= uptime."""
+        lo, hi = 0, self.count()
+        with open(self.dir / "events.idx", "rb") as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._rec(f, mid)[1] < uptime:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+    def _kind_lines(self, kind, from_line, limit):
+        path = _kind_file(self.dir, kind)
+        try:
+            n = os.path.getsize(path) // LINE.size
+        except OSError:
+            return []
+        with open(path, "rb") as f:
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid * LINE.size)
+                if LINE.unpack(f.read(LINE.size))[0] < from_line:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            f.seek(lo * LINE.size)
+            data = f.read(min(limit, n - lo) * LINE.size)
+        return [x for (x,) in LINE.iter_unpack(data)]
+
+    def query(self, kind=None, from_line=None, since=None, until=None, limit=100):
+        """-> (records, next_line). Filters combine; `next_line` continues the scan."""
+        start = from_line or 0
+        if since is not None:
+            start = max(start, self.line_for_uptime(since))
+        total = self.count()
+        if kind:
+            lines = self._kind_lines(kind, start, limit)
+        else:
+            lines = list(range(start, min(total, start + limit)))
+        lines = [n for n in lines if n < total]
+        out, nxt = [], start
+        # open_segment: closed segments may be gzip/zstd; their seeks decompress forward
+        with open(self.dir / "events.idx", "rb") as fi, open_segment(self.events_path) as fe:
+            for n in lines:
+                off, up = self._rec(fi, n)
+                if until is not None and up > until:
+                    break
+                fe.seek(off)
+                raw = fe.readline()
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    rec = {"_raw": raw.decode("utf-8", "ignore")}
+                rec["_line"] = n
+                out.append(rec)
+                nxt = n + 1
+        return out, nxt
+
+    def tail(self, n=20):
+        total = self.count()
+        return self.query(from_line=max(0, total - n), limit=n)[0]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "build":
+        sys.exit("usage: eventindex.py build <events.jsonl>")
+    print(f"indexed {build(sys.argv[2])} lines")
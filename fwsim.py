@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Arduino firmware simulator on a pseudo-terminal.
+
+    python3 fwsim.py                                  # tank_jsn.ino, prints the pty path
+    python3 fwsim.py --fw grid_autopilot --link /tmp/ttyFW
+    SER_DEV=/tmp/ttyFW python3 grid_autopilot.py
+
+Behaves like the sketches closely enough for load tests without the robot:
+
+  tank_jsn.ino        F/B/L/R/S/X/Y + digits 0-9 (mapTable), RAMP_UP 4 / DOWN 2,
+                      one ultrasonic sensor pinged every --ping-ms (120), printed
+                      as "L: NN cm  " / "C: NN cm  " / "R: NN cm\\r\\n" pieces
+  grid_autopilot.ino  F/B/L/R/S/G + digits 1-5 ("Base speed set to N"), RAMP_UP 4 /
+                      DOWN 3, T = blocking two-phase 180 spin ending in
+                      "IMU spin done, heading=NNN.N"
+
+Both run the same 20 ms control loop: incoming bytes queue in a 64-byte RX
+buffer (overflow is lost, e.g. during a spin) and are acted on once per tick,
+wheel outputs ramp toward their targets, and everything printed goes out
+paced to --baud (10 bits per byte), so timing is close to the real USB
+serial link. Distances come from a toy world: the robot closes on whatever
+is ahead while driving forward and a turn swaps in a new scene.
+"""
+import argparse, os, random, select, threading, time
+
+import telemetry_codec
+
+TICK_MS = 20
+RX_BUFFER = 64                # Arduino core Serial RX buffer
+
+class Firmware:
+    """Shared 50 Hz ramp model; subclasses supply the command set and output."""
+    RAMP_UP = 4
+    RAMP_DOWN = 2
+
+    def __init__(self, emit, rng):
+        self.emit = emit            # emit(bytes) -> paced write to the port
+        self.rng = rng
+        self.base = 50
+        self.tgt = [0, 0]
+        self.cur = [0, 0]
+        self.last_cmd = "S"
+        self.commands = 0
+
+    def boot(self):
+        pass
+
+    def busy(self):
+        """True while the sketch is stuck in a blocking routine (no Serial.read)."""
+        return False
+
+    def set_targets(self, c):
+        b = self.base
+        t = {"F": (b, b), "B": (-b, -b), "L": (-b, b), "R": (b, -b), "S": (0, 0)}.get(c)
+        self.last_cmd = c
+        if t is not None:
+            self.tgt = list(t)
+
+    def handle(self, c):
+        self.commands += 1
+        self.set_targets(c)
+
+    def ramp(self):
+        for i in (0, 1):
+            cur, tgt = self.cur[i], self.tgt[i]
+            if cur != tgt:
+                step = self.RAMP_DOWN if abs(tgt) < abs(cur) else self.RAMP_UP
+                self.cur[i] = min(cur + step, tgt) if cur < tgt else max(cur - step, tgt)
+
+    def tick(self, now_ms):
+        self.ramp()
+
+
+class TankJsn(Firmware):
+    MAP = (0, 25, 35, 45, 89, 255, 90, 180, 110, 110)
+
+    def __init__(self, emit, rng, ping_ms=120, binary=False, no_echo=0.02):
+        super().__init__(emit, rng)
+        self.ping_ms = ping_ms
+        self.binary = binary
+        self.no_echo = no_echo
+        self.last_ping = 0
+        self.sensor = 0
+        self.ahead = [rng.uniform(60, 300) for _ in range(3)]   # cm to the nearest thing, L/C/R
+        self.d = [0, 0, 0]
+
+    def set_targets(self, c):
+        super().set_targets(c)
+        b = self.base
+        if c == "X":
+            self.tgt = [0, b]
+        elif c == "Y":
+            self.tgt = [b, 0]
+
+    def handle(self, c):
+        self.commands += 1
+        if "0" <= c <= "9":
+            self.base = self.MAP[ord(c) - 48]
+            self.set_targets(self.last_cmd)   # re-apply so targets follow the new speed
+        else:
+            self.set_targets(c)
+
+    def tick(self, now_ms):
+        self.ramp()
+        self._move(TICK_MS / 1000.0)
+        if now_ms - self.last_ping >= self.ping_ms:
+            self.last_ping = now_ms
+            self._ping()
+
+    def _move(self, dt):
+        # ~0.6 cm/s per PWM unit of forward speed; turning in place reveals a new scene
+        fwd = (self.cur[0] + self.cur[1]) / 2.0
+        turn = abs(self.cur[0] - self.cur[1])
+        for i in range(3):
+            self.ahead[i] = max(3.0, self.ahead[i] - fwd * 0.6 * dt)
+            if turn > 40 and self.rng.random() < 0.02:
+                self.ahead[i] = self.rng.uniform(30, 300)
+
+    def _ping(self):
+        i = self.sensor
+        d = 0 if self.rng.random() < self.no_echo else int(self.ahead[i] + self.rng.gauss(0, 1.5))
+        self.d[i] = max(0, d)
+        self.sensor = (i + 1) % 3
+        if self.binary:
+            if i == 2:
+                self.emit(telemetry_codec.encode_ultrasonic(*[x or None for x in self.d]))
+            return
+        label = "LCR"[i]
+        self.emit(f"{label}: {self.d[i]} cm".encode() + (b"\r\n" if i == 2 else b"  "))
+
+
+class GridAutopilot(Firmware):
+    RAMP_DOWN = 3
+    SPEED = (0, 20, 40, 80, 140, 255)
+    YAW_PER_PWM = 1.5               # deg/s per PWM unit of wheel speed difference / 2
+
+    def __init__(self, emit, rng, gyro_noise=0.5):
+        super().__init__(emit, rng)
+        self.gyro_noise = gyro_noise
+        self.spin = None            # (phase, heading, start_ms, brake_ticks)
+        self.spins = 0
+
+    def boot(self):
+        self.emit(b"MPU ready.\r\n")
+        self.emit(b"Ramped drive ready.\r\n")
+
+    def busy(self):
+        return self.spin is not None
+
+    def handle(self, c):
+        self.commands += 1
+        if "1" <= c <= "5":
+            self.base = self.SPEED[ord(c) - 48]
+            self.emit(f"Base speed set to {self.base}\r\n".encode())
+            if self.last_cmd != "S":
+                self.set_targets(self.last_cmd)
+        elif c == "T":
+            self._start_spin()
+        elif c == "G":
+            self.set_targets("F")
+        else:
+            self.set_targets(c)
+
+    # ---- spin180_IMU(clockwise=true) as a per-tick state machine ----
+    def _start_spin(self):
+        self.emit(b"IMU Spin 180 adaptive start\r\n")
+        self.coarse, self.final = (50.0, 178.0) if self.base >= 100 else (140.0, 178.0)
+        self.fast = max(self.base, 60)
+        self.slow = max(int(self.base * 0.33), 35)
+        self.tgt = [self.fast, -self.fast]
+        self.spin = ["A", 0.0, None, 0]
+
+    def tick(self, now_ms):
+        self.ramp()
+        if self.spin is None:
+            return
+        phase, heading, start, brake = self.spin
+        start = now_ms if start is None else start
+        if phase in ("A", "B"):
+            gz = (self.cur[0] - self.cur[1]) / 2.0 * self.YAW_PER_PWM + self.rng.gauss(0, self.gyro_noise)
+            heading += gz * TICK_MS / 1000.0
+            timeout = now_ms - start >= 12000
+            if phase == "A" and (abs(heading) >= self.coarse or timeout):
+                phase = "B"
+                self.tgt = [self.slow, -self.slow]
+            elif phase == "B" and (abs(heading) >= self.final or timeout):
+                phase = "brake"
+                self.last_cmd = "S"; self.tgt = [0, 0]
+        else:
+            brake += 1
+            if brake >= 25:
+                self.emit(f"IMU spin done, heading={heading:.1f}\r\n".encode())
+                if heading > self.final + 2.0:
+                    self.emit(b"Note: slight overshoot (momentum).\r\n")
+                self.spin = None
+                self.spins += 1
+                return
+        self.spin = [phase, heading, start, brake]
+
+
+FIRMWARE = {"tank_jsn": TankJsn, "grid_autopilot": GridAutopilot}
+
+
+class Simulator:
+    """Runs one firmware model against the master side of a pty.
+
+    Point SER_DEV at .path. on_command(ch, t) is called (perf_counter time)
+    as each byte arrives, before loop() acts on it - handy for wire-latency
+    benchmarks.
+    """
+    def __init__(self, fw="tank_jsn", baud=115200, seed=None, link=None, on_command=None, **fw_kw):
+        import pty, tty
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)
+        os.set_blocking(self.master, False)
+        self.path = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.lexists(link):
+                os.unlink(link)
+            os.symlink(self.path, link)
+        self.baud = baud
+        self.on_command = on_command
+        self.fw = FIRMWARE[fw](self._emit, random.Random(seed), **fw_kw)
+        self.bytes_out = 0
+        self.dropped_out = 0        # host not reading: pty buffer full
+        self.overruns = 0           # ticks that started late by a whole tick
+        self._t_wire = time.perf_counter()
+        self._inject = []
+        self._rx = bytearray()
+        self.rx_overflows = 0       # host wrote faster than loop() drains (busy spin)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _emit(self, data):
+        # 10 bits per byte at `baud`: the host sees the bytes once they have crossed the wire.
+        now = time.perf_counter()
+        done = max(self._t_wire, now) + len(data) * 10.0 / self.baud
+        if done > now:
+            time.sleep(done - now)
+        self._t_wire = done
+        try:
+            self.bytes_out += os.write(self.master, data)
+        except (BlockingIOError, OSError):
+            self.dropped_out += len(data)
+
+    def inject(self, ch):
+        """Queue a command as if it came from the host (picked up on the loop thread)."""
+        self._inject.append(ch)
+
+    def _receive(self, timeout):
+        # UART RX: bytes land in the 64-byte Serial buffer as they arrive; the
+        # sketch only looks at them at the top of its next loop().
+        r, _, _ = select.select([self.master], [], [], max(0.0, timeout))
+        if not r:
+            return
+        try:
+            data = os.read(self.master, 256)
+        except BlockingIOError:
+            return
+        except OSError:             # host side gone; don't spin on a dead fd
+            time.sleep(max(0.0, timeout))
+            return
+        t = time.perf_counter()
+        for b in data:
+            if len(self._rx) >= RX_BUFFER:
+                self.rx_overflows += 1
+                continue
+            self._rx.append(b)
+            if self.on_command:
+                self.on_command(chr(b), t)
+
+    def run(self):
+        fw = self.fw
+        fw.boot()
+        t0 = time.monotonic()
+        n = 0
+        while not self._stop.is_set():
+            now_ms = int((time.monotonic() - t0) * 1000)
+            if not fw.busy():
+                while self._inject:
+                    fw.handle(self._inject.pop(0))
+                rx, self._rx = self._rx, bytearray()
+                for b in rx:
+                    fw.handle(chr(b))
+            fw.tick(now_ms)
+            n += 1
+            deadline = t0 + n * TICK_MS / 1000.0
+            if deadline - time.monotonic() < -TICK_MS / 1000.0:
+                self.overruns += 1
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                self._receive(deadline - time.monotonic())
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="fwsim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(2)
+        for fd in (self.master, self.slave):
+            try: os.close(fd)
+            except OSError: pass
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+
+    def stats(self):
+        fw = self.fw
+        return {"commands": fw.commands, "bytes_out": self.bytes_out, "dropped_out": self.dropped_out,
+                "rx_overflows": self.rx_overflows,
+                "overruns": self.overruns, "cur": list(fw.cur), "tgt": list(fw.tgt), "base": fw.base,
+                **({"spins": fw.spins} if isinstance(fw, GridAutopilot) else {})}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--fw", choices=sorted(FIRMWARE), default="tank_jsn")
+    ap.add_argument("--baud", type=int, default=115200)
+    ap.add_argument("--link", help="also expose the pty under this path (symlink)")
+    ap.add_argument("--ping-ms", type=int, default=120, help="tank_jsn: ms between single-sensor pings")
+    ap.add_argument("--binary", action="store_true", help="tank_jsn: send binary frames instead of text lines")
+    ap.add_argument("--spin-every-s", type=float, default=0.0, help="grid_autopilot: start a T spin this often")
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--status-s", type=float, default=5.0, help="print stats this often (0 = never)")
+    a = ap.parse_args(argv)
+
+    kw = {"ping_ms": a.ping_ms, "binary": a.binary} if a.fw == "tank_jsn" else {}
+    sim = Simulator(a.fw, a.baud, a.seed, a.link, **kw).start()
+    print(f"{a.fw} simulator on {a.link or sim.path}" + (f" -> {sim.path}" if a.link else ""), flush=True)
+    try:
+        t_spin = time.monotonic()
+        while True:
+            time.sleep(a.status_s or 1.0)
+            if a.spin_every_s and time.monotonic() - t_spin >= a.spin_every_s and not sim.fw.busy():
+                sim.inject("T"); t_spin = time.monotonic()
+            if a.status_s:
+                print(sim.stats(), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,69 +1,62 @@
-import serial
-import pynmea2
-import smbus2
-import math
+import os
+import sys
 import time
 
+from sensorhub import CompassSource, GpsSource, SensorHub, SimCompassSource, SimGpsSource
+
 # -------------------------------
 # GPS SETUP
 # -------------------------------
-GPS_PORT = '/dev/serial0'
-GPS_BAUD = 115200
-
-ser = serial.Serial(GPS_PORT, GPS_BAUD, timeout=1)
+GPS_PORT = os.environ.get("GPS_PORT", "/dev/serial0")
+GPS_BAUD = int(os.environ.get("GPS_BAUD", "115200"))
 
 # -------------------------------
 # COMPASS SETUP (QMC5883L)
 # -------------------------------
-I2C_ADDR = 0x0D  # I2C address for QMC5883L
-bus = smbus2.SMBus(1)
-
-# Configure the compass: Continuous mode, 200Hz, 2G range
-bus.write_byte_data(I2C_ADDR, 0x0B, 0x01)  # Set reset period
-bus.write_byte_data(I2C_ADDR, 0x09, 0x1D)  # 0x1D = 200Hz, continuous mode, 2G
-
-def read_compass_heading():
-    """Reads magnetometer data and returns heading in degrees."""
-    try:
-        data = bus.read_i2c_block_data(I2C_ADDR, 0x00, 6)
-        x = (data[1] << 8) | data[0]
-        y = (data[3] << 8) | data[2]
-        z = (data[5] << 8) | data[4]
-
-        # Handle two's complement
-        if x > 32767:
-            x -= 65536
-        if y > 32767:
-            y -= 65536
-        if z > 32767:
-            z -= 65536
-
-        heading_rad = math.atan2(y, x)
-        heading_deg = math.degrees(heading_rad)
-        if heading_deg < 0:
-            heading_deg += 360
-        return heading_deg
-    except Exception:
-        return None
+# compass.py samples at the sensor's 200 Hz on its own thread and averages a
+# calibrated window; calibrate with `compass.py record` + `compass.py calibrate`.
+COMPASS_CAL = os.environ.get("COMPASS_CAL", "compass_cal.json")
+
+def setup_hub(sim=False):
+    """GPS + compass as sensorhub sources; the control servers host the same ones via SENSORS=gps,compass."""
+    hub = SensorHub()
+    if sim:
+        hub.add(SimGpsSource())
+        hub.add(SimCompassSource())
+    else:
+        hub.add(GpsSource(GPS_PORT, GPS_BAUD, on_error=lambda e: print(f"GPS: {e}")))
+        hub.add(CompassSource(cal_path=COMPASS_CAL, on_error=lambda e: print(f"Compass: {e}")))
+        if not os.path.exists(COMPASS_CAL):
+            print(f"No compass calibration at {COMPASS_CAL}: headings are raw")
+    return hub.start()
 
 # -------------------------------
 # MAIN LOOP
 # -------------------------------
-print("GPS + Compass reader started...\n")
-
-while True:
-    line = ser.readline().decode(errors="ignore").strip()
-    if line.startswith("$GNGGA"):
-        try:
-            msg = pynmea2.parse(line)
-            heading = read_compass_heading()
-            heading_str = f"{heading:.1f} deg" if heading is not None else "N/A"
-
-            print(
-                f"Lat: {msg.latitude:.6f}, Lon: {msg.longitude:.6f}, "
-                f"Alt: {msg.altitude} m, Sats: {msg.num_sats}, "
-                f"Heading: {heading_str}"
-            )
-        except pynmea2.ParseError:
-            pass
-    time.sleep(0.2)
+# Standalone viewer (--sim: no hardware). Hardware is only opened by hub.start(),
+# so the helpers above can be imported off-robot.
+if __name__ == "__main__":
+    hub = setup_hub(sim="--sim" in sys.argv)
+    print("GPS + Compass reader started...\n")
+
+    seq = 0
+    while True:
+        msg = hub.store.wait("gps", after_seq=seq, timeout=1.0)
+        if msg is None:
+            st = hub.stats()["sources"].get("gps", {})
+            print(f"No fix yet ({st.get('sentences_per_s', 0)} sentences/s, "
+                  f"{st.get('dropped_bytes', 0)} bytes dropped, last error: {st.get('last_error')})")
+            continue
+        seq = msg["seq"]
+        mag = hub.store.get("compass")
+        heading_str = f"{mag['heading_deg']:.1f} deg" if mag is not None else "N/A"
+
+        speed = msg.get("speed_mps")
+        speed_str = f"{speed:.2f} m/s @ {msg.get('course_deg') or 0:.0f} deg" if speed is not None else "N/A"
+
+        print(
+            f"Lat: {msg['lat']:.6f}, Lon: {msg['lon']:.6f}, "
+            f"Alt: {msg.get('alt_m')} m, Sats: {msg.get('sats')}, HDOP: {msg.get('hdop')}, "
+            f"Speed: {speed_str}, Heading: {heading_str}, Fix age: {msg['age_s'] * 1000:.0f} ms"
+        )
+        time.sleep(1.0)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Background NMEA reader with a thread-safe latest-fix cache.
+
+One thread drains the GPS port continuously (serial_reader.LineReader, so
+no sleep between lines and no kernel-buffer build-up) and replaces the
+cached fix on every position sentence (nmea.py: GGA/RMC position, RMC/VTG
+speed and course, GSA DOPs merged into one record). Consumers never touch
+the port:
+
+    gps = GpsReader(serial.Serial("/dev/serial0", 115200, timeout=1)).start()
+    fix = gps.latest.get()          # None until the first fix; else a dict with age_s
+    gps.latest.subscribe(print)     # called on the reader thread for each new fix
+    fix = gps.latest.wait(after_seq=fix["seq"], timeout=2.0)   # block for a newer one
+    gps.stats()                     # sentences/s, bytes/s, dropped bytes, parse errors, ...
+"""
+import threading, time
+
+import nmea
+from serial_reader import LineReader
+
+
+class LatestFix:
+    """Latest-value cache: the writer replaces, readers get a copy stamped with its age."""
+    def __init__(self):
+        self._cv = threading.Condition()
+        self._fix = None
+        self._seq = 0
+        self._subs = ()
+        self.callback_errors = 0
+
+    def update(self, fix, t_rx):
+        """Store `fix` (dict) received at time.monotonic() `t_rx` and notify subscribers."""
+        rec = dict(fix, rx_mono=t_rx, rx_ts=time.time() - (time.monotonic() - t_rx))
+        with self._cv:
+            self._seq += 1
+            rec["seq"] = self._seq
+            self._fix = rec
+            self._cv.notify_all()
+            subs = self._subs
+        for fn in subs:
+            try:
+                fn(self._stamp(rec))
+            except Exception:
+                self.callback_errors += 1
+
+    def _stamp(self, rec):
+        out = dict(rec)
+        out["age_s"] = round(time.monotonic() - rec["rx_mono"], 3)
+        return out
+
+    def get(self):
+        with self._cv:
+            rec = self._fix
+        return None if rec is None else self._stamp(rec)
+
+    def wait(self, after_seq=0, timeout=None):
+        """Block until a fix newer than `after_seq` arrives; None on timeout."""
+        with self._cv:
+            if not self._cv.wait_for(lambda: self._seq > after_seq, timeout):
+                return None
+            rec = self._fix
+        return self._stamp(rec)
+
+    def subscribe(self, fn):
+        """fn(fix) runs on the reader thread - keep it short. Returns an unsubscribe function."""
+        with self._cv:
+            self._subs = self._subs + (fn,)
+        def unsubscribe():
+            with self._cv:
+                self._subs = tuple(s for s in self._subs if s is not fn)
+        return unsubscribe
+
+    @property
+    def seq(self):
+        return self._seq
+
+
+class GpsReader:
+    def __init__(self, ser, parse=nmea.parse, latest=None):
+        self.ser = ser
+        self.latest = latest if latest is not None else LatestFix()   # e.g. a sensorhub topic
+        self.parse = parse
+        self.fixes_from = nmea.FixAssembler()
+        self.types = {}             # sentence type -> count
+        self.reader = LineReader(ser, self._on_line)
+        self.sentences = 0
+        self.fixes = 0
+        self.parse_errors = 0
+        self.ignored = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _on_line(self, line, t_rx):
+        if not line.startswith("$"):
+            self.ignored += 1
+            return
+        self.sentences += 1
+        t = line[3:6]
+        self.types[t] = self.types.get(t, 0) + 1
+        if t not in nmea.PARSERS:   # GSV, TXT, ...: not worth a parse (or pynmea2)
+            self.ignored += 1
+            return
+        try:
+            rec = self.parse(line)
+        except ValueError:          # nmea.ParseError: bad checksum or layout
+            self.parse_errors += 1
+            return
+        fix = self.fixes_from.feed(rec)
+        if fix is not None:
+            self.fixes += 1
+            self.latest.update(fix, t_rx)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.reader.run(self._stop)
+            except Exception:
+                self.reader.errors += 1
+                self._stop.wait(1.0)    # port hiccup (USB reset...): retry
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="gps_reader", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self):
+        st = self.reader.stats()
+        fix = self.latest.get()
+        return {
+            "sentences": self.sentences,
+            "sentences_per_s": st["lines_per_s"],
+            "bytes": st["bytes"],
+            "bytes_per_s": st["bytes_per_s"],
+            "backlog_bytes": st["backlog_bytes"],
+            "dropped_bytes": st["dropped_bytes"],
+            "fixes": self.fixes,
+            "parse_errors": self.parse_errors,
+            "ignored": self.ignored,
+            "types": dict(self.types),
+            "subscriber_errors": self.latest.callback_errors,
+            "fix_age_s": fix["age_s"] if fix else None,
+        }
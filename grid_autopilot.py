@@ -1,7 +1,18 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import os, json, csv, time, uuid, signal, threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+import os, json, time, uuid, signal, threading
 from pathlib import Path
+from logwriter import LogWriter
+from eventindex import EventIndex
+from logrotate import SegmentManager
+from colstore import ColumnWriter
+from catalog import Catalog, DriveTimer
+import html
+import wsctl, sse, promstats
+from serial_out import SerialWriter
+from lease import LeaseManager
+from sensorhub import SensorHub, build as build_sensors
+from urllib.parse import urlsplit, parse_qs
 
 # ====== Serial (kept identical to your current setup) ======
 import serial
@@ -19,6 +30,14 @@ RUN_DIR.mkdir(parents=True, exist_ok=True)
 EVENTS_PATH   = RUN_DIR / "events.jsonl"   # all events (requests, commands, errors, heartbeats)
 COMMANDS_CSV  = RUN_DIR / "commands.csv"   # only sent drive/speed commands
 SESSION_META  = RUN_DIR / "session.json"   # static info about this run
+CATALOG_DB    = os.environ.get("CATALOG_DB", str(Path("runlogs") / "catalog.sqlite"))   # cross-run index
+HTTP_MODE = os.environ.get("HTTP_MODE", "threaded")   # threaded | single
+HTTP_PORT = int(os.environ.get("HTTP_PORT", "8000"))
+LEASE_MS = int(os.environ.get("LEASE_MS", "500"))   # hold-to-move lease; 0 = commands never expire
+SENSORS = os.environ.get("SENSORS", "")   # in-process sensors, e.g. "gps,compass" or "sim:gps,sim:compass"
+# POST /ingest/<topic> accepts these topics only (each one becomes a hub topic and metric series)
+INGEST_TOPICS = frozenset(t.strip() for t in os.environ.get("INGEST_TOPICS", "gps,compass,imu").split(",") if t.strip())
+KEEPALIVE_S = float(os.environ.get("HTTP_KEEPALIVE_S", "30"))   # idle timeout; 0 = HTTP/1.0, close per request
 HTML = """<!doctype html>
 <title>Motor Control</title>
 <meta name="viewport" content="width=device-width,initial-scale=1">
@@ -103,7 +122,31 @@ button:active { transform: scale(0.96); }
 <div class="small">Speed: 1?5 ? G = Straight ? T = Spin</div>
 
 <script>
-async function send(p){ fetch("/"+p, {cache:"no-store"}); }
+// Drive commands ride one ordered WebSocket (seq-numbered); GETs are the fallback.
+let ws = null, seq = 0;
+function connectWS(){
+  const s = new WebSocket((location.protocol==="https:"?"wss://":"ws://")+location.host+"/ws");
+  s.onopen  = ()=>{ ws = s; };
+  s.onmessage = e=>{ if (e.data==="lease:0") leaseLost(); };
+  s.onclose = ()=>{ if (ws===s) ws = null; setTimeout(connectWS, 2000); };
+}
+if ("WebSocket" in window) connectWS();
+// Hold-to-move codes carry a short server-side lease (lease.py): while one is in force
+// the page renews it every 100 ms, and the server sends "S" itself if renewals stop.
+const lid = Math.random().toString(36).slice(2);
+let held = "S";
+async function send(p){
+  seq++;
+  if (!(p>='0'&&p<='9')) held = p;
+  if (ws && ws.readyState===1) ws.send(seq+":"+p);
+  else fetch("/"+p+"?l="+lid, {cache:"no-store"});
+}
+function leaseLost(){ if ("FBLRXY".includes(held)) send(held); }   // expired while still held: re-grant
+setInterval(()=>{
+  if (!"FBLRXY".includes(held)) return;
+  if (ws && ws.readyState===1) ws.send("k");
+  else fetch("/k?l="+lid, {cache:"no-store"}).then(r=>r.text()).then(t=>{ if (t==="0") leaseLost(); }).catch(()=>{});
+}, 100);
 
 const pressed = new Set();
 const ids = ["F","L","R","B","G","T"]; // include autonomous buttons
@@ -163,7 +206,59 @@ ROUTES = {
 
 
 # ---------- tiny logging helpers ----------
-_lock = threading.Lock()
+# Records go through a background writer (see logwriter.py) so disk stalls
+# never sit on the tx() path. LOG_FSYNC = none | interval:<sec> | every:<n>
+# events.jsonl rotates into RUN_DIR/segments/ (compressed, listed in manifest.json)
+# at LOG_ROTATE_MB or LOG_ROTATE_S, whichever comes first.
+_segments = SegmentManager(RUN_DIR, compress=os.environ.get("LOG_COMPRESS", "gzip"))
+_log = LogWriter(EVENTS_PATH, COMMANDS_CSV, fsync=os.environ.get("LOG_FSYNC", "none"),
+                 index_dir=RUN_DIR / "index", segments=_segments,
+                 rotate_bytes=int(float(os.environ.get("LOG_ROTATE_MB", "64")) * 1e6),
+                 rotate_s=float(os.environ.get("LOG_ROTATE_S", "3600")),
+                 columns=ColumnWriter(RUN_DIR),   # RUN_DIR/columns/: typed per-column files
+                 session=SESSION_ID, start_mono=START_MONO)
+# Offset index over events.jsonl (index/ next to it), maintained by the writer above.
+_events = EventIndex(EVENTS_PATH, RUN_DIR / "index")
+# Live fan-out for /stream dashboards (per-client bounded buffers, drop-oldest).
+_stream = sse.Broadcaster(maxlen=int(os.environ.get("STREAM_BUFFER", "64")))
+
+# Prometheus text on /metrics (promstats.py). Requests, serial writes and
+# heartbeats are counted inline; what the components already track is read
+# at scrape time.
+_metrics = promstats.Registry()
+_m_requests = _metrics.counter("robot_http_requests_total", "HTTP requests by route, method and status",
+                               ("route", "method", "code"))
+_m_handler = _metrics.histogram("robot_http_handler_seconds", "Time in the request handler (not /stream, /ws)",
+                                ("route", "method"))
+_m_ser_write = _metrics.histogram("robot_serial_write_seconds", "Time in ser.write() per command burst")
+_m_ser_bytes = _metrics.counter("robot_serial_write_bytes_total", "Command bytes written to the serial port")
+_m_hb_lag = _metrics.histogram("robot_heartbeat_lag_seconds", "Heartbeat wake-up past its 5 s schedule")
+_hb_last = [time.monotonic()]
+_metrics.gauge_fn("robot_uptime_seconds", "Seconds since the server started", lambda: uptime_s())
+_metrics.gauge_fn("robot_heartbeat_age_seconds", "Seconds since the last heartbeat",
+                  lambda: round(time.monotonic() - _hb_last[0], 3))
+_metrics.counter_fn("robot_serial_commands_total", "Commands submitted to the serial writer, and how many were coalesced",
+                    lambda: {("submitted",): _ser_out.submitted, ("coalesced",): _ser_out.coalesced,
+                             ("stop_preempted",): _ser_out.preempted}, ("state",))
+_metrics.counter_fn("robot_serial_write_errors_total", "Failed ser.write() calls", lambda: _ser_out.errors)
+_metrics.counter_fn("robot_lease_events_total", "Drive leases granted, renewed, refused, released and expired",
+                    lambda: {(k,): _leases.stats()[k] for k in ("granted", "renewed", "refused", "released", "expired")},
+                    ("event",))
+_metrics.gauge_fn("robot_lease_expiry_lag_seconds", "Last lease expiry: S issued this long after the deadline",
+                  lambda: _leases.wheel.lag_s)
+_metrics.gauge_fn("robot_sensor_age_seconds", "Age of the latest value per sensor hub topic",
+                  lambda: {(t,): r["age_s"] for t, r in _hub.store.snapshot().items() if r}, ("topic",))
+_metrics.counter_fn("robot_sensor_updates_total", "Values published per sensor hub topic",
+                    lambda: {(t,): _hub.store.topic(t).seq for t in _hub.store.topics()}, ("topic",))
+_metrics.counter_fn("robot_sensor_errors_total", "Sensor source failures (each one is retried)",
+                    lambda: {(s.name,): s.errors for s in _hub.sources}, ("source",))
+_metrics.gauge_fn("robot_log_queue_depth", "Records waiting for the log writer thread", lambda: _log.q.qsize())
+_metrics.counter_fn("robot_log_written_total", "Records written by the log writer", lambda: _log.written)
+_metrics.counter_fn("robot_log_dropped_total", "Records dropped on a full log queue", lambda: _log.dropped)
+_metrics.counter_fn("robot_log_errors_total", "Log writer failures survived (rotation, flush, fsync)",
+                    lambda: _log.errors)
+_metrics.counter_fn("robot_log_fsyncs_total", "fsync calls by the log writer", lambda: _log.fsyncs)
+_metrics.gauge_fn("robot_stream_clients", "Connected /stream clients", lambda: _stream.stats()["clients"])
 
 def uptime_s():
     return round(time.monotonic() - START_MONO, 3)
@@ -179,41 +274,140 @@ def log_event(kind, **payload):
         "kind": kind,
         **payload
     }
-    with _lock:
-        with EVENTS_PATH.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    _log.event(rec)
 
 
 def log_command_csv(ch):
     is_speed = ch.isdigit()
-    row = [now_iso(), uptime_s(), SESSION_ID, ("speed" if is_speed else "drive"), ch]
-    header = ["ts","uptime_s","session","type","value"]
-    with _lock:
-        new = not COMMANDS_CSV.exists()
-        with COMMANDS_CSV.open("a", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            if new: w.writerow(header)
-            w.writerow(row)
-
-def tx(ch):
-    ser.write(ch.encode())
-    log_event("tx", command=ch)
-    log_command_csv(ch)
+    _log.command([now_iso(), uptime_s(), SESSION_ID, ("speed" if is_speed else "drive"), ch])
+
+def _on_serial_written(codes):
+    # Runs on the serial owner thread: log only what actually hit the wire.
+    for ch in codes:
+        log_event("tx", command=ch)
+        _stream.publish("tx", {"uptime_s": uptime_s(), "command": ch})
+        log_command_csv(ch)
+        _log.column("commands", (uptime_s(), ord(ch)))
+        _drive.mark(ch, uptime_s())
+
+def _on_serial_timing(seconds, nbytes):
+    _m_ser_write.observe(seconds)
+    _m_ser_bytes.inc(v=nbytes)
+
+_drive = DriveTimer()   # seconds held per drive code, for the session catalog
+
+# One thread owns ser.write(); bursts collapse to latest drive/speed, "S" jumps the queue.
+_ser_out = SerialWriter(ser, on_write=_on_serial_written,
+                        on_error=lambda e: log_event("error", where="serial_out", msg=str(e)),
+                        on_timing=_on_serial_timing)
+
+def tx(ch, holder=None):
+    _leases.command(holder, ch)
+    _ser_out.submit(ch)
+
+# Deadman: F/B/L/R/X/Y stop by themselves LEASE_MS after the page's last keepalive.
+def _on_lease_expired(holder, code):
+    tx("S")
+    log_event("lease_expired", holder=holder, command=code, lag_ms=round(_leases.wheel.lag_s * 1000, 2))
+    _stream.publish("lease", {"uptime_s": uptime_s(), "expired": code, "holder": holder})
+
+_leases = LeaseManager(_on_lease_expired, ttl_s=LEASE_MS / 1000)
+
+# ---------- sensor hub ----------
+# SENSORS (gps / compass / sim:*) run in-process on their own threads (sensorhub.py) and
+# publish into one latest-value store, so GPS and heading no longer need gps_compass.py + /ingest.
+_hub = SensorHub()
+_sensor_opts = {"gps": {"port": os.environ.get("GPS_PORT", "/dev/serial0"),
+                        "baud": int(os.environ.get("GPS_BAUD", "115200"))},
+                "compass": {"cal_path": os.environ.get("COMPASS_CAL", "compass_cal.json")}}
+for _src in build_sensors(SENSORS, _sensor_opts,
+                          on_error=lambda e: log_event("error", where="sensor", msg=str(e))):
+    _hub.add(_src)
+
+def _on_sensor(topic, rec):
+    # hub sources or POST /ingest -> /stream, and GPS fixes into the log
+    data = {k: v for k, v in rec.items() if k not in ("rx_mono", "rx_ts", "age_s")}
+    _stream.publish(topic, {"uptime_s": round(rec["rx_mono"] - START_MONO, 3), **data})
+    if topic == "gps":
+        log_event("gps", data=data)
+
+_hub.store.subscribe_all(_on_sensor)
 
 # ---------- heartbeat thread ----------
 _stop_hb = threading.Event()
 def _heartbeat():
+    due = time.monotonic()
     while not _stop_hb.is_set():
+        now = time.monotonic()
+        _m_hb_lag.observe(max(0.0, now - due))
+        _hb_last[0] = now
         log_event("heartbeat", ser_dev=SER_DEV, baud=BAUD)
+        due = now + 5.0
         _stop_hb.wait(5.0)  # every 5s
 
 # ---------- HTTP handler ----------
+# Exactly the GET paths _get() serves (no /telemetry here: that is tank_jsn's ring buffer).
+_KNOWN_PATHS = set(ROUTES) | {"/", "/index.html", "/metrics", "/metrics.html", "/metrics.json",
+                              "/events", "/events.tail", "/stream", "/ws", "/k", "/sensors"}
+_LONG_LIVED = ("/stream", "/ws")
+
+def _route_label(path):
+    # Bounded label set: scanners and typos all land in "other".
+    p = path.split("?", 1)[0]
+    if p.startswith("/ingest/"):
+        return "/ingest"
+    return p if p in _KNOWN_PATHS else "other"
+
+def _holder(h, query):
+    # Lease owner: the page's random id (?l=...), else the client address (curl, old pages).
+    for part in query.split("&"):
+        if part.startswith("l="):
+            return "page:" + part[2:40]
+    return "http:" + h.client_address[0]
+
 class H(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the page's connection open between button presses;
+    # `timeout` is the idle limit before the handler thread gives it up.
+    protocol_version = "HTTP/1.1" if KEEPALIVE_S > 0 else "HTTP/1.0"
+    timeout = KEEPALIVE_S or None
+    # Headers and body go out as separate writes; without TCP_NODELAY the
+    # second one waits on the client's delayed ACK (~40 ms per command).
+    disable_nagle_algorithm = True
+
     def do_GET(self):
+        self._timed("GET", self._get)
+
+    def do_POST(self):
+        self._timed("POST", self._post)
+
+    def _timed(self, method, handler):
+        self._status = None
+        t0 = time.perf_counter()
+        try:
+            handler()
+        finally:
+            route = _route_label(self.path)
+            code = self._status or (101 if route == "/ws" else 0)
+            _m_requests.inc((route, method, str(code)))
+            if route not in _LONG_LIVED:
+                _m_handler.observe(time.perf_counter() - t0, (route, method))
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _get(self):
+        path, _, query = self.path.partition("?")
+        if path == "/k":
+            # Lease keepalive, 10-20/s per held button: no event log, no parsing beyond the id.
+            ok = _leases.renew(_holder(self, query))
+            return self._send(200, "1" if ok else "0", "text/plain")
         log_event("http_get", path=self.path, client=self.client_address[0])
         if self.path in ("/", "/index.html"):
             return self._send(200, HTML, "text/html")
         if self.path == "/metrics":
+            return self._send(200, _metrics.render(), promstats.CONTENT_TYPE)
+        if self.path == "/metrics.html":
             body = {
                 "session": SESSION_ID,
                 "uptime_s": uptime_s(),
@@ -222,6 +416,11 @@ class H(BaseHTTPRequestHandler):
                 "run_dir": str(RUN_DIR),
                 "events_path": str(EVENTS_PATH),
                 "commands_csv": str(COMMANDS_CSV),
+                "log": _log.stats(),
+                "serial_tx": _ser_out.stats(),
+                "lease": _leases.stats(),
+                "stream": _stream.stats(),
+                "sensors": _hub.stats(),
                 "start_ts": START_TS
             }
             pretty = "<h1>Metrics</h1><pre>"+json.dumps(body, indent=2)+"</pre>"
@@ -233,40 +432,58 @@ class H(BaseHTTPRequestHandler):
                 "ser_dev": SER_DEV,
                 "baud": BAUD,
                 "run_dir": str(RUN_DIR),
+                "log": _log.stats(),
+                "serial_tx": _ser_out.stats(),
+                "lease": _leases.stats(),
+                "stream": _stream.stats(),
+                "sensors": _hub.stats(),
                 "start_ts": START_TS
             }
             return self._send(200, json.dumps(body), "application/json")
+        if self.path == "/sensors":
+            # Latest value per hub topic, each with rx_ts, seq and age_s
+            return self._send(200, json.dumps(_hub.store.snapshot()), "application/json")
+        if self.path.split("?", 1)[0] == "/events":
+            return self._events()
+        if self.path.split("?", 1)[0] == "/stream" and HTTP_MODE == "threaded":
+            return self._stream()
         if self.path == "/events.tail":
-            # Return last ~2KB of the events file for quick peeks in browser
+            # Last 30 whole events for quick peeks in browser (via the index, never a torn line)
             try:
-                data = ""
-                with EVENTS_PATH.open("rb") as f:
-                    f.seek(0, os.SEEK_END)
-                    size = f.tell()
-                    f.seek(max(size-2048,0), os.SEEK_SET)
-                    data = f.read().decode("utf-8","ignore")
-                return self._send(200, "<pre>"+data+"</pre>", "text/html")
+                lines = [json.dumps(r, ensure_ascii=False) for r in _events.tail(30)]
+                return self._send(200, "<pre>"+html.escape("\n".join(lines), quote=False)+"</pre>", "text/html")
             except Exception as e:
                 log_event("error", where="events.tail", msg=str(e))
                 return self._send(500, "error", "text/plain")
-        if self.path in ROUTES:
-            ch = ROUTES[self.path]
-            tx(ch)
+        if self.path == "/ws" and HTTP_MODE == "threaded":
+            return self._ws()
+        if path in ROUTES:
+            ch = ROUTES[path]
+            tx(ch, _holder(self, query))
             return self._send(200, "OK", "text/plain")
         return self._send(404, "Not found", "text/plain")
 
 
-    def do_POST(self):
+    def _post(self):
         # Ingest sensor data: POST /ingest/<topic>  with JSON body
+        # Always consume the body so the next request on a kept-alive
+        # connection starts at a request line.
+        body = self._read_body()
+        if body is None:
+            return self._send(411, "Length required", "text/plain")
         if self.path.startswith("/ingest/"):
             topic = self.path.split("/", 2)[-1]
-            length = int(self.headers.get("Content-Length","0") or 0)
-            body = self.rfile.read(length) if length>0 else b"{}"
+            if topic not in INGEST_TOPICS:
+                return self._send(404, "Unknown ingest topic (see INGEST_TOPICS)", "text/plain")
+            body = body or b"{}"
             try:
                 payload = json.loads(body.decode("utf-8") or "{}")
             except Exception:
                 payload = {"_raw": body.decode("utf-8","ignore")}
             log_event("ingest", topic=topic, data=payload)
+            _stream.publish("ingest", {"uptime_s": uptime_s(), "topic": topic, "data": payload})
+            if isinstance(payload, dict) and "_raw" not in payload:
+                _hub.store.publish(topic, payload)     # external sensors share the hub's store
             return self._send(200, "OK", "text/plain")
         return self._send(404, "Not found", "text/plain")
 
@@ -274,6 +491,63 @@ class H(BaseHTTPRequestHandler):
         # Silence default stdout logs (we log ourselves)
         return
 
+    def _ws(self):
+        # Persistent, ordered drive channel; holds this handler thread until the page goes away.
+        if not wsctl.handshake(self):
+            return self._send(400, "Expected WebSocket upgrade", "text/plain")
+        client = self.client_address[0]
+        log_event("ws_open", client=client)
+        holder = f"ws:{id(self)}"
+        st = {}
+        try:
+            st = wsctl.drive_session(self, lambda ch: tx(ch, holder), set(ROUTES.values()),
+                                     keepalive=lambda: _leases.renew(holder))
+        finally:
+            # however the session ended (even an escaped socket error)
+            if _leases.holder == holder:
+                tx("S", holder)             # page gone mid-hold: don't wait for the lease
+            log_event("ws_close", client=client, **st)
+
+    def _stream(self):
+        # Server-Sent Events: /stream?topics=ultrasonic,tx (default: everything)
+        q = parse_qs(urlsplit(self.path).query)
+        topics = [t for t in ",".join(q.get("topics", [])).split(",") if t] or None
+        st = sse.serve(self, _stream, topics)
+        log_event("stream_close", client=self.client_address[0], **st)
+
+    def _events(self):
+        # /events?kind=ultrasonic&from=<line>&since=&until=<uptime_s>&limit=  -> seeks via index/
+        # &segment=N reads closed segment N (see segments/manifest.json); default is the live one.
+        q = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        try:
+            frm = int(q["from"]) if q.get("from") else None
+            since = float(q["since"]) if q.get("since") else None
+            until = float(q["until"]) if q.get("until") else None
+            limit = min(int(q.get("limit") or 100), 5000)
+            seg = int(q["segment"]) if q.get("segment") else None
+        except ValueError:
+            return self._send(400, "from/limit/segment must be integers, since/until numbers", "text/plain")
+        idx = _events
+        if seg is not None:
+            entry = next((e for e in _segments.manifest["segments"] if e["seq"] == seg), None)
+            if entry is None or not entry.get("index"):
+                return self._send(404, "No such segment", "text/plain")
+            idx = EventIndex(_segments.dir / entry["file"], _segments.dir / entry["index"])
+        try:
+            recs, nxt = idx.query(q.get("kind"), frm, since, until, limit)
+        except OSError as e:      # segment rotated/compressed under us; client can retry
+            return self._send(503, f"events busy: {e}", "text/plain")
+        body = {"count": len(recs), "next": nxt, "total_lines": idx.count(),
+                "segments": _segments.manifest["segments"], "events": recs}
+        return self._send(200, json.dumps(body, ensure_ascii=False), "application/json")
+
+    def _read_body(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True   # no chunked decoding here; reply and hang up
+            return None
+        length = int(self.headers.get("Content-Length","0") or 0)
+        return self.rfile.read(length) if length>0 else b""
+
     def _send(self, code, body, ctype):
         if not isinstance(body, (bytes, bytearray)):
             body = body.encode()
@@ -296,12 +570,28 @@ def _write_session_meta():
     with SESSION_META.open("w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
     log_event("session_start", **meta)
+    _catalog("session_started", meta)
+
+def _catalog(method, *args):
+    # The catalog is only an index over runlogs/; never let it stop the server.
+    try:
+        cat = Catalog(CATALOG_DB)
+        try: getattr(cat, method)(*args)
+        finally: cat.close()
+    except Exception as e:
+        print(f"catalog {method}: {e}")
 
 def _shutdown(*_):
     log_event("session_end", uptime_s=uptime_s())
     _stop_hb.set()
+    _leases.stop()
+    _hub.stop()
+    _ser_out.close()
     try: ser.close()
     except: pass
+    _log.close()
+    up = uptime_s()
+    _catalog("log_ended", SESSION_ID, START_TS + up, _log.kinds, _drive.snapshot(up))
     os._exit(0)
 
 if __name__=="__main__":
@@ -309,6 +599,11 @@ if __name__=="__main__":
     signal.signal(signal.SIGINT, _shutdown)
     signal.signal(signal.SIGTERM, _shutdown)
     threading.Thread(target=_heartbeat, daemon=True).start()
-    print(f"Serving on :8000, talking to {SER_DEV}\nLogs in {RUN_DIR}")
-    log_event("http_start", host="0.0.0.0", port=8000)
-    HTTPServer(("0.0.0.0", 8000), H).serve_forever()
+    _leases.start()
+    _hub.start()
+    print(f"Serving on :{HTTP_PORT}, talking to {SER_DEV}\nLogs in {RUN_DIR}")
+    if HTTP_MODE != "threaded":
+        H.protocol_version = "HTTP/1.0"   # one idle keep-alive client would block everyone else
+    log_event("http_start", host="0.0.0.0", port=HTTP_PORT, mode=HTTP_MODE, protocol=H.protocol_version)
+    Server = ThreadingHTTPServer if HTTP_MODE == "threaded" else HTTPServer
+    Server(("0.0.0.0", HTTP_PORT), H).serve_forever()
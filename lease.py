@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Drive-command leases with a server-side deadman.
+
+A hold-to-move command (F/B/L/R/X/Y) only stays in force while its lease
+is renewed. The control page renews with keepalives ("k" frames on /ws,
+GET /k?l=<id> otherwise) every 100 ms while a button is held; if they
+stop - page closed, Wi-Fi dropped the release request, phone locked - the
+lease runs out and "S" goes to the Arduino within one wheel tick.
+
+    leases = LeaseManager(on_expire=lambda holder, code: tx("S"), ttl_s=0.5).start()
+    leases.command("ws:3", "F")     # grant (or S / another code: release / re-grant)
+    leases.renew("ws:3")            # keepalive: one uncontended lock + one float store
+    leases.stats()
+
+Renewal never touches the wheel. Each lease sits in one wheel slot; when
+that slot comes round, a lease renewed in the meantime is just moved to
+the slot of its new expiry (lazy rescheduling), so renew() stays O(1)
+no matter how many clients send keepalives.
+"""
+import threading, time
+
+LEASED = frozenset("FBLRXY")     # hold-to-move; S, speed digits and G/T (autonomous) are not leased
+
+
+class TimerWheel:
+    """Hashed timing wheel: slots of tick_s; fire(key) runs on the wheel thread when a key is due."""
+    def __init__(self, fire, tick_s=0.01, slots=512):
+        self.fire = fire
+        self.tick_s = tick_s
+        self.slots = [dict() for _ in range(slots)]   # key -> deadline (monotonic)
+        self._lock = threading.Lock()
+        self._cur = int(time.monotonic() / tick_s)
+        self._stop = threading.Event()
+        self._thread = None
+        self.fired = 0
+        self.lag_s = 0.0                # last fire time past its deadline
+
+    def _slot(self, deadline):
+        return self.slots[int(deadline / self.tick_s) % len(self.slots)]
+
+    def schedule(self, key, deadline):
+        with self._lock:
+            self._slot(deadline)[key] = deadline
+
+    def cancel(self, key, deadline):
+        with self._lock:
+            self._slot(deadline).pop(key, None)
+
+    def run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            target = int(now / self.tick_s)
+            due = []
+            with self._lock:
+                # walk every tick since the last pass (a late wake-up must not skip slots);
+                # deadlines a full revolution out share the slot and stay put
+                for t in range(self._cur, target + 1):
+                    slot = self.slots[t % len(self.slots)]
+                    for key, dl in list(slot.items()):
+                        if dl <= now:
+                            del slot[key]
+                            due.append((key, dl))
+                self._cur = target
+            for key, dl in due:
+                self.fired += 1
+                self.lag_s = now - dl
+                self.fire(key, dl)
+            self._stop.wait(self.tick_s - (time.monotonic() % self.tick_s))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="lease_wheel", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+class LeaseManager:
+    """At most one live drive lease: the robot has one set of motors."""
+    def __init__(self, on_expire, ttl_s=0.5, tick_s=0.01):
+        self.on_expire = on_expire      # (holder, code), called on the wheel thread
+        self.ttl_s = ttl_s
+        self.wheel = TimerWheel(self._due, tick_s)
+        self._lock = threading.Lock()
+        self.holder = None
+        self.code = None
+        self.expires = 0.0
+        self._slotted = 0.0             # deadline the lease is filed under in the wheel
+        self._gen = 0                   # bumps on every grant/release; wheel keys carry it
+        self.granted = self.renewed = self.refused = self.released = self.expired = 0
+
+    def command(self, holder, code):
+        """Note a drive code from `holder`; grants, replaces or releases the lease."""
+        if code.isdigit() or self.ttl_s <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.holder is not None:
+                self.wheel.cancel(self._gen, self._slotted)
+            self._gen += 1
+            if code in LEASED:
+                self.holder, self.code = holder, code
+                self.expires = self._slotted = now + self.ttl_s
+                self.wheel.schedule(self._gen, self._slotted)
+                self.granted += 1
+            elif self.holder is not None:
+                self.holder = self.code = None
+                self.released += 1
+
+    def renew(self, holder):
+        """Keepalive; True if `holder` owns the live lease (a stale page gets False)."""
+        with self._lock:            # _due() decides expiry from expires under the same lock
+            if self.holder != holder or holder is None:
+                self.refused += 1
+                return False
+            self.expires = time.monotonic() + self.ttl_s
+            self.renewed += 1
+            return True
+
+    def _due(self, gen, deadline):
+        with self._lock:
+            if gen != self._gen or self.holder is None:
+                return                  # released or replaced since
+            if self.expires > deadline:
+                self._slotted = self.expires    # renewed meanwhile: file under the new expiry
+                self.wheel.schedule(gen, self._slotted)
+                return
+            holder, code = self.holder, self.code
+            self.holder = self.code = None
+            self._gen += 1
+            self.expired += 1
+        self.on_expire(holder, code)
+
+    def start(self):
+        if self.ttl_s > 0:
+            self.wheel.start()
+        return self
+
+    def stop(self):
+        self.wheel.stop()
+
+    def stats(self):
+        return {"ttl_s": self.ttl_s, "holder": self.holder, "code": self.code,
+                "remaining_s": round(max(0.0, self.expires - time.monotonic()), 3) if self.holder else None,
+                "granted": self.granted, "renewed": self.renewed, "refused": self.refused,
+                "released": self.released, "expired": self.expired,
+                "expiry_lag_ms": round(self.wheel.lag_s * 1000, 2)}
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Size/time rotation and background compression for events.jsonl.
+
+The live segment is always <run>/events.jsonl (+ index/). When it grows past
+rotate_bytes or gets older than rotate_s, LogWriter closes it and hands it
+here: it moves to segments/events.<NNNNN>.jsonl (+ .index/), gets an entry
+in segments/manifest.json, and a background thread compresses it to
+.jsonl.gz (or .jsonl.zst when LOG_COMPRESS=zstd and zstandard is installed).
+
+Each manifest entry records lines, bytes and the first/last uptime_s and ts,
+so readers can skip segments that don't overlap their query:
+
+    for path in event_files(run_dir, since=120.0, until=300.0): ...
+    for rec in iter_events(run_dir, since=120.0, until=300.0): ...
+
+    python3 logrotate.py compress runlogs/<date>/<run>   # finish leftovers after a crash
+"""
+import gzip, io, json, os, queue, shutil, sys, threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MANIFEST = "manifest.json"
+
+def _seg_name(seq):
+    return f"events.{seq:05d}"
+
+def load_manifest(run_dir):
+    try:
+        with open(Path(run_dir) / "segments" / MANIFEST, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"segments": []}
+
+def open_segment(path):
+    """Binary file object for a plain, .gz or .zst segment."""
+    path = str(path)
+    if not os.path.exists(path):
+        # compressed since the caller read the manifest
+        for ext in (".gz", ".zst"):
+            if os.path.exists(path + ext):
+                path += ext
+                break
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path}: pip install zstandard to read .zst segments")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    return open(path, "rb")
+
+
+class SegmentManager:
+    def __init__(self, run_dir, compress="gzip"):
+        self.run_dir = Path(run_dir)
+        self.dir = self.run_dir / "segments"
+        self.compress = (compress or "none").lower()
+        if self.compress == "zstd" and zstandard is None:
+            self.compress = "gzip"
+        self._lock = threading.Lock()
+        self.manifest = load_manifest(run_dir)
+        self.compressed = 0
+        self.errors = 0
+        self._q = queue.Queue()
+        self._thread = None
+
+    def next_seq(self):
+        segs = self.manifest["segments"]
+        return (segs[-1]["seq"] + 1) if segs else 1
+
+    def close_segment(self, events_path, index_dir, meta):
+        """Move the just-closed live segment into segments/ and queue compression."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        seq = self.next_seq()
+        name = _seg_name(seq)
+        dst = self.dir / f"{name}.jsonl"
+        os.replace(events_path, dst)
+        idx = None
+        if index_dir and Path(index_dir).exists():
+            idx = self.dir / f"{name}.index"
+            os.replace(index_dir, idx)
+        entry = {"seq": seq, "file": dst.name, "index": idx.name if idx else None,
+                 "compressed": False, **meta}
+        with self._lock:
+            self.manifest["segments"].append(entry)
+            self._save()
+        if self.compress != "none":
+            self._start()
+            self._q.put(entry)
+        return entry
+
+    def _save(self):
+        tmp = self.dir / (MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self.dir / MANIFEST)
+
+    # ---------- background compression ----------
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="logcompress", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            entry = self._q.get()
+            if entry is None:
+                return
+            try:
+                self._compress(entry)
+            except Exception:
+                self.errors += 1
+
+    def _compress(self, entry):
+        src = self.dir / entry["file"]
+        ext = ".zst" if self.compress == "zstd" else ".gz"
+        dst = src.with_name(src.name + ext)
+        tmp = dst.with_name(dst.name + ".tmp")
+        with open(src, "rb") as fin, open(tmp, "wb") as raw:
+            if ext == ".zst":
+                with zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False) as out:
+                    shutil.copyfileobj(fin, out, 1 << 20)
+            else:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as out:
+                    shutil.copyfileobj(fin, out, 1 << 20)
+            raw.flush(); os.fsync(raw.fileno())
+        os.replace(tmp, dst)
+        with self._lock:
+            entry["file"] = dst.name
+            entry["compressed"] = True
+            entry["stored_bytes"] = dst.stat().st_size
+            self._save()
+        src.unlink()
+        self.compressed += 1
+
+    def compress_pending(self):
+        """Synchronously compress every segment still stored plain."""
+        for entry in list(self.manifest["segments"]):
+            if not entry.get("compressed"):
+                self._compress(entry)
+
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join(timeout)
+
+    def stats(self):
+        segs = self.manifest["segments"]
+        return {"segments": len(segs), "compressed": sum(1 for s in segs if s.get("compressed")),
+                "pending": self._q.qsize(), "errors": self.errors}
+
+
+# ---------- readers ----------
+def _overlaps(entry, since, until):
+    if since is not None and entry.get("last_uptime") is not None and entry["last_uptime"] < since:
+        return False
+    if until is not None and entry.get("first_uptime") is not None and entry["first_uptime"] > until:
+        return False
+    return True
+
+def event_files(run_dir, since=None, until=None):
+    """Segment files (oldest first, live events.jsonl last) that may hold [since, until]."""
+    run_dir = Path(run_dir)
+    out = [run_dir / "segments" / e["file"] for e in load_manifest(run_dir)["segments"]
+           if _overlaps(e, since, until)]
+    live = run_dir / "events.jsonl"
+    if live.exists():
+        out.append(live)
+    return out
+
+def iter_events(run_dir, since=None, until=None, kinds=None):
+    """Stream decoded events across all segments, skipping the ones outside the range."""
+    for path in event_files(run_dir, since, until):
+        with open_segment(path) as f:
+            for raw in f:
+                try:
+                    rec = json.loads(raw)
+                except ValueError:
+                    continue
+                if kinds and rec.get("kind") not in kinds:
+                    continue
+                up = rec.get("uptime_s")
+                if up is not None:
+                    if since is not None and up < since:
+                        continue
+                    if until is not None and up > until:
+                        continue
+                yield rec
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "compress":
+        sys.exit("usage: logrotate.py compress <run_dir>")
+    m = SegmentManager(sys.argv[2])
+    m.compress_pending()
+    print(f"compressed {m.compressed} segment(s)")
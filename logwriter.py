@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Background writer for the run logs (events.jsonl + commands.csv).
+
+log_event()/log_command_csv() only build a record and drop it on a bounded
+queue; one writer thread keeps both files open, writes in batches and
+flushes/fsyncs according to the chosen policy.
+
+With a SegmentManager (logrotate.py) the live events.jsonl is rotated into
+numbered, compressed segments once it passes rotate_bytes or rotate_s.
+With a ColumnWriter (colstore.py) high-rate rows go to typed column files
+through the same queue instead of events.jsonl.
+
+A failed rotation, flush or fsync is counted (errors), written in-band as a
+"log_error" event and survived: the writer thread keeps draining the queue.
+
+fsync policy (LOG_FSYNC env in the servers):
+    "none"          flush to the OS only (default, same as before)
+    "interval:2.0"  fsync at most every 2.0 s
+    "every:100"     fsync after every 100 records
+"""
+import os, csv, json, queue, shutil, threading, time
+from eventindex import IndexWriter
+
+CSV_HEADER = ["ts","uptime_s","session","type","value"]
+COLUMN_PREFIX = "col:"      # kinds key for column-store rows, kept apart from JSONL kinds of the same name
+
+def parse_fsync(spec):
+    """'none' | 'interval:<sec>' | 'every:<n>'  ->  (mode, value)"""
+    spec = (spec or "none").strip().lower()
+    if spec in ("", "none", "off"):
+        return ("none", 0)
+    mode, _, val = spec.partition(":")
+    if mode == "interval":
+        return ("interval", float(val or 1.0))
+    if mode == "every":
+        return ("every", max(1, int(val or 1)))
+    raise ValueError(f"bad fsync policy: {spec!r}")
+
+
+class LogWriter:
+    def __init__(self, events_path, commands_path, fsync="none",
+                 maxsize=10000, batch=256, flush_interval=0.2, index_dir=None,
+                 segments=None, rotate_bytes=0, rotate_s=0, columns=None, session=None, start_mono=None):
+        self.events_path = events_path
+        self.commands_path = commands_path
+        self.fsync_mode, self.fsync_val = parse_fsync(fsync)
+        self.batch = batch
+        self.flush_interval = flush_interval
+        self.q = queue.Queue(maxsize=maxsize)
+
+        self.session = session      # stamped on the writer's own records (log_dropped, log_error)
+        self.start_mono = time.monotonic() if start_mono is None else start_mono
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0             # writer-thread failures survived (rotation, flush, fsync)
+        self.last_error = None
+        self._drop_lock = threading.Lock()
+        self.batches = 0
+        self.fsyncs = 0
+        self._dropped_reported = 0
+        self._since_fsync = 0
+        self._last_fsync = time.monotonic()
+        self._closed = False
+
+        self.index_dir = index_dir
+        self.segments = segments
+        self.rotate_bytes = rotate_bytes
+        self.rotate_s = rotate_s
+        self.rotations = 0
+        self._rotate_retry_at = 0.0 # after a failed rotation, wait before trying again
+        self.columns = columns
+        self.kinds = {}             # kind / "col:"+table -> [count, first_uptime, last_uptime], for the catalog
+        self._open_segment()
+        new = not os.path.exists(commands_path) or os.path.getsize(commands_path) == 0
+        self._cmd = open(commands_path, "a", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._cmd)
+        if new:
+            self._csv.writerow(CSV_HEADER)
+
+        self._thread = threading.Thread(target=self._run, name="logwriter", daemon=True)
+        self._thread.start()
+
+    def _open_segment(self, resume=None):
+        """Open a fresh live segment, or with resume=(line, uptime) reopen the current one."""
+        self._ev = open(self.events_path, "ab")
+        self._ev_off = self._ev.tell()
+        # Optional sidecar offset index (eventindex.py), fed as lines are written.
+        self.index = IndexWriter(self.index_dir, *(resume or ())) if self.index_dir else None
+        if resume:
+            return                  # same segment: line numbers and segment meta carry on
+        self._seg_t0 = time.monotonic()
+        self._seg = {"lines": 0, "first_uptime": None, "last_uptime": None,
+                     "first_ts": None, "last_ts": None}
+
+    # ---------- producer side (called from any thread) ----------
+    def event(self, rec):
+        self._put(("e", rec))
+
+    def command(self, row):
+        self._put(("c", row))
+
+    def column(self, table, row):
+        self._put(("u", (table, row)))
+
+    def _put(self, item):
+        if self._closed:
+            return
+        try:
+            self.q.put_nowait(item)
+        except queue.Full:
+            with self._drop_lock:       # producers race here
+                self.dropped += 1
+
+    def stats(self):
+        return {
+            "queued": self.q.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "rotations": self.rotations,
+            **({"segments": self.segments.stats()} if self.segments else {}),
+            **({"columns": self.columns.stats()} if self.columns else {}),
+            "fsync": self.fsync_mode if self.fsync_mode == "none" else f"{self.fsync_mode}:{self.fsync_val}",
+        }
+
+    # ---------- writer thread ----------
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self.q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._guarded(self._idle)
+                continue
+            items = [item]
+            while len(items) < self.batch:
+                try:
+                    items.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                # close()'s marker; a producer that passed the _closed check late
+                # can still put records after it
+                items = [i for i in items if i is not None]
+                stop = True
+            self._guarded(self._write, items)
+        self._finish()
+
+    def _idle(self):
+        self._maybe_fsync(idle=True)
+        self._maybe_rotate()
+
+    def _guarded(self, fn, *args):
+        # A failed rotation/flush/fsync must not kill the only writer thread:
+        # count it, note it in-band and carry on with the next batch.
+        try:
+            fn(*args)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            try:
+                self._write_event(self._own_record("log_error", error=self.last_error))
+            except Exception:
+                pass
+
+    def _own_record(self, kind, **payload):
+        # Same envelope as the servers' log_event(), so index/segments/catalog can place it.
+        now = time.time()
+        return {"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(now)) + f".{int((now % 1) * 1000):03d}Z",
+                "uptime_s": round(time.monotonic() - self.start_mono, 3), "session": self.session,
+                "kind": kind, **payload}
+
+    def _write(self, items):
+        n = 0
+        for item in items:
+            if item is None:        # close() raced with a put; ignore stray marker
+                continue
+            kind, payload = item
+            try:
+                if kind == "e":
+                    self._write_event(payload)
+                elif kind == "u":
+                    self.columns.append(*payload)
+                    self._count_kind(COLUMN_PREFIX + payload[0], payload[1][0])
+                else:
+                    self._csv.writerow(payload)
+                n += 1
+            except Exception:
+                with self._drop_lock:
+                    self.dropped += 1
+        self._report_drops()
+        self._flush()
+        self.written += n
+        self.batches += 1
+        self._since_fsync += n
+        self._maybe_fsync()
+        self._maybe_rotate()
+
+    def _report_drops(self):
+        # Records lost to a full queue are reported in-band so readers see the gap.
+        if self.dropped != self._dropped_reported:
+            dropped = self.dropped
+            rec = self._own_record("log_dropped", dropped_total=dropped,
+                                   dropped_new=dropped - self._dropped_reported)
+            self._dropped_reported = dropped
+            self._write_event(rec)
+
+    def _write_event(self, rec):
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        if self.index:
+            self.index.add(self._ev_off, rec.get("uptime_s"), rec.get("kind"))
+        self._ev.write(line)
+        self._ev_off += len(line)
+        self._count_kind(rec.get("kind"), rec.get("uptime_s"))
+        seg = self._seg
+        seg["lines"] += 1
+        if rec.get("uptime_s") is not None:
+            if seg["first_uptime"] is None:
+                seg["first_uptime"], seg["first_ts"] = rec["uptime_s"], rec.get("ts")
+            seg["last_uptime"], seg["last_ts"] = rec["uptime_s"], rec.get("ts")
+
+    def _count_kind(self, kind, up):
+        k = self.kinds.get(kind)
+        if k is None:
+            self.kinds[kind] = [1, up, up]
+        else:
+            k[0] += 1
+            if up is not None:
+                k[1] = up if k[1] is None else k[1]
+                k[2] = up
+
+    def _flush(self):
+        self._ev.flush()
+        self._cmd.flush()
+        if self.index:
+            self.index.flush()      # after the log, so indexed offsets are always readable
+        if self.columns:
+            self.columns.flush()
+
+    def _maybe_rotate(self):
+        if not self.segments or not self._seg["lines"] or time.monotonic() < self._rotate_retry_at:
+            return
+        if self.rotate_bytes and self._ev_off >= self.rotate_bytes:
+            self._rotate()
+        elif self.rotate_s and time.monotonic() - self._seg_t0 >= self.rotate_s:
+            self._rotate()
+
+    def _rotate(self):
+        self._flush()
+        if self.fsync_mode != "none":
+            self._fsync()
+        self._ev.close()
+        resume = None
+        if self.index:
+            resume = (self.index.line, self.index.uptime)
+            self.index.close()
+        try:
+            self.segments.close_segment(self.events_path, self.index_dir,
+                                        {"bytes": self._ev_off, **self._seg})
+        except Exception:
+            self._rotate_retry_at = time.monotonic() + 30.0
+            if os.path.exists(self.events_path):
+                self._open_segment(resume)      # nothing moved: keep appending, index lines continue
+            else:
+                # the log moved but its index / manifest entry didn't: never let the next
+                # segment append to the old index (rebuild it with eventindex.py build)
+                if self.index_dir:
+                    shutil.rmtree(self.index_dir, ignore_errors=True)
+                self._open_segment()
+            raise
+        self.rotations += 1
+        self._open_segment()
+
+    def _maybe_fsync(self, idle=False):
+        if self.fsync_mode == "none" or self._since_fsync == 0:
+            return
+        now = time.monotonic()
+        if self.fsync_mode == "every" and self._since_fsync < self.fsync_val and not idle:
+            return
+        if self.fsync_mode == "interval" and now - self._last_fsync < self.fsync_val:
+            return
+        self._fsync()
+
+    def _fsync(self):
+        fds = [self._ev.fileno(), self._cmd.fileno()]
+        if self.columns:
+            fds += self.columns.fileno_list()
+        for fd in fds:
+            try: os.fsync(fd)
+            except OSError: pass
+        self.fsyncs += 1
+        self._since_fsync = 0
+        self._last_fsync = time.monotonic()
+
+    def _finish(self):
+        self._report_drops()
+        self._flush()
+        if self.fsync_mode != "none":
+            self._fsync()
+        self._ev.close()
+        self._cmd.close()
+        if self.index:
+            self.index.close()
+        if self.segments:
+            self.segments.close()
+        if self.columns:
+            self.columns.close()
+
+    # ---------- shutdown ----------
+    def close(self, timeout=2.0):
+        """Drain the queue, flush (and fsync if enabled), close the files."""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self.q.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Small NMEA 0183 parser for the sentences the GPS actually gives us.
+
+GGA, RMC, VTG and GSA (any talker: GP/GN/GL/...) are parsed with plain
+str.split - no regex, no per-field objects - into flat dicts. Every
+sentence's checksum is checked first. Other sentence types go to pynmea2
+when it is installed, otherwise they come back as {"type": ..., "fields": [...]}.
+
+    rec = parse("$GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,W*6A")
+    # {'type': 'RMC', 'utc': '123519', 'valid': True, 'lat': 48.1173, 'lon': 11.5166..., 'speed_mps': 11.52..., ...}
+
+    python3 nmea.py capture /dev/serial0 gps.nmea --seconds 60     # record raw sentences
+    python3 nmea.py dump gps.nmea                                  # print parsed records
+"""
+import sys
+from functools import reduce
+from operator import xor
+
+try:
+    import pynmea2
+except ImportError:
+    pynmea2 = None
+
+KNOT_MPS = 0.514444
+KMH_MPS = 1 / 3.6
+
+
+class ParseError(ValueError):
+    pass
+
+
+def checksum_ok(line):
+    """True when the '*hh' checksum matches (sentences without one are rejected)."""
+    star = line.rfind("*")
+    if star < 1 or len(line) < star + 3:
+        return False
+    try:
+        want = int(line[star + 1:star + 3], 16)
+    except ValueError:
+        return False
+    return reduce(xor, line[1:star].encode("ascii", "replace"), 0) == want
+
+def _f(s):
+    return float(s) if s else None
+
+def _i(s):
+    return int(s) if s else None
+
+def _coord(v, hemi):
+    # ddmm.mmmm / dddmm.mmmm -> signed decimal degrees
+    if not v:
+        return None
+    x = float(v)
+    deg = int(x // 100)
+    d = deg + (x - deg * 100) / 60.0
+    return -d if hemi in ("S", "W") else d
+
+# ---------- per-sentence field layouts (f = fields after the address) ----------
+def _gga(f):
+    q = _i(f[5]) or 0
+    return {"type": "GGA", "utc": f[0], "lat": _coord(f[1], f[2]), "lon": _coord(f[3], f[4]),
+            "quality": q, "sats": _i(f[6]) or 0, "hdop": _f(f[7]), "alt_m": _f(f[8]),
+            "geoid_m": _f(f[10]) if len(f) > 10 else None, "valid": q > 0}
+
+def _rmc(f):
+    kn = _f(f[6])
+    return {"type": "RMC", "utc": f[0], "valid": f[1] == "A",
+            "lat": _coord(f[2], f[3]), "lon": _coord(f[4], f[5]),
+            "speed_mps": None if kn is None else kn * KNOT_MPS, "course_deg": _f(f[7]), "date": f[8]}
+
+def _vtg(f):
+    # VTG,course_true,T,course_mag,M,speed_kn,N,speed_kmh,K[,mode]
+    kmh, kn = _f(f[6]) if len(f) > 6 else None, _f(f[4]) if len(f) > 4 else None
+    speed = kmh * KMH_MPS if kmh is not None else (None if kn is None else kn * KNOT_MPS)
+    return {"type": "VTG", "course_deg": _f(f[0]), "speed_mps": speed}
+
+def _gsa(f):
+    return {"type": "GSA", "mode": f[0], "fix_type": _i(f[1]) or 1,
+            "prns": [int(p) for p in f[2:14] if p], "pdop": _f(f[14]), "hdop": _f(f[15]),
+            "vdop": _f(f[16]) if len(f) > 16 else None}
+
+PARSERS = {"GGA": _gga, "RMC": _rmc, "VTG": _vtg, "GSA": _gsa}
+
+
+def parse(line, fallback=True):
+    """One sentence -> flat dict with "type". Raises ParseError on bad checksum or layout."""
+    line = line.strip()
+    if not line.startswith("$") or not checksum_ok(line):
+        raise ParseError(f"bad sentence/checksum: {line[:40]!r}")
+    body = line[1:line.rfind("*")]
+    fields = body.split(",")
+    typ = fields[0][-3:]
+    fn = PARSERS.get(typ)
+    if fn is not None:
+        try:
+            return fn(fields[1:])
+        except (IndexError, ValueError) as e:
+            raise ParseError(f"{typ}: {e}") from None
+    if fallback and pynmea2 is not None:
+        try:
+            msg = pynmea2.parse(line)
+        except pynmea2.ParseError as e:
+            raise ParseError(str(e)) from None
+        names = [fd[1] for fd in msg.fields]
+        return {"type": typ, **dict(zip(names, msg.data))}
+    return {"type": typ, "fields": fields[1:]}
+
+
+class FixAssembler:
+    """Merges the sentence stream into one compact fix record.
+
+    feed(rec) returns the merged fix when `rec` carries a position (GGA, or
+    RMC with status A) and None otherwise; speed/course from RMC/VTG and
+    DOPs/fix type from GSA ride along with the next position.
+    """
+    KEEP = ("lat", "lon", "alt_m", "sats", "quality", "hdop", "pdop", "vdop", "fix_type",
+            "speed_mps", "course_deg", "utc", "date")
+
+    def __init__(self):
+        self.state = {}
+
+    def feed(self, rec):
+        t = rec["type"]
+        st = self.state
+        if t == "GSA":
+            st.update(fix_type=rec["fix_type"], pdop=rec["pdop"], vdop=rec["vdop"])
+            if rec["hdop"] is not None:
+                st["hdop"] = rec["hdop"]
+            return None
+        if t == "VTG":
+            st.update(speed_mps=rec["speed_mps"], course_deg=rec["course_deg"])
+            return None
+        if t not in ("GGA", "RMC") or not rec.get("valid") or rec.get("lat") is None:
+            return None
+        for k in self.KEEP:
+            v = rec.get(k)
+            if v is not None:
+                st[k] = v
+        st["src"] = t
+        return dict(st)
+
+
+# ---------- CLI ----------
+def _capture(port, out, seconds, baud=115200):
+    import serial, time
+    ser = serial.Serial(port, baud, timeout=1)
+    end = time.monotonic() + seconds
+    n = 0
+    with open(out, "wb") as f:
+        while time.monotonic() < end:
+            line = ser.readline()
+            if line.startswith(b"$"):
+                f.write(line.rstrip(b"\r\n") + b"\n")
+                n += 1
+    print(f"captured {n} sentences to {out}")
+
+def _main(argv):
+    import argparse
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("capture"); p.add_argument("port"); p.add_argument("out")
+    p.add_argument("--seconds", type=float, default=60.0); p.add_argument("--baud", type=int, default=115200)
+    p = sub.add_parser("dump"); p.add_argument("file")
+    a = ap.parse_args(argv)
+    if a.cmd == "capture":
+        return _capture(a.port, a.out, a.seconds, a.baud)
+    asm = FixAssembler()
+    with open(a.file, encoding="ascii", errors="replace") as f:
+        for line in f:
+            try:
+                rec = parse(line)
+            except ParseError as e:
+                print("ERR", e); continue
+            fix = asm.feed(rec) if rec["type"] in PARSERS else None
+            print(rec if fix is None else f"{rec}\n  fix: {fix}")
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
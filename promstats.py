@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""In-process counters/histograms rendered in the Prometheus text format.
+
+Hot paths only touch a dict entry under a per-metric lock; numbers that
+other objects already keep (LogWriter.stats(), LineReader.stats(), ...)
+are read at scrape time through callbacks instead of being counted twice.
+
+    reg = Registry()
+    reqs = reg.counter("robot_http_requests_total", "HTTP requests", ("route", "code"))
+    lat = reg.histogram("robot_http_request_seconds", "Handler time", ("route",))
+    reg.gauge_fn("robot_log_queue_depth", "Records waiting", lambda: log.q.qsize())
+    reqs.inc(("/F", "200")); lat.observe(0.0012, ("/F",))
+    reg.render()  ->  "# HELP ...\\n# TYPE ...\\nrobot_http_requests_total{route="/F",code="200"} 1\\n..."
+"""
+import threading
+from bisect import bisect_left
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 100 us .. 10 s; serial writes and drive requests live in the low end
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=""):
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._v = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), v=1):
+        with self._lock:
+            self._v[labels] = self._v.get(labels, 0) + v
+
+    def samples(self):
+        with self._lock:
+            items = list(self._v.items())
+        return [(self.name, _labels(self.labelnames, k), v) for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._v = {}                # labels -> [per-bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, x, labels=()):
+        i = bisect_left(self.buckets, x)
+        with self._lock:
+            h = self._v.get(labels)
+            if h is None:
+                h = self._v[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            h[0][i] += 1
+            h[1] += x
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(c), s) for k, (c, s) in self._v.items()]
+        out = []
+        for k, counts, total in items:
+            acc = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                acc += n
+                out.append((self.name + "_bucket", _labels(self.labelnames, k, f'le="{_num(le)}"'), acc))
+            out.append((self.name + "_sum", _labels(self.labelnames, k), round(total, 6)))
+            out.append((self.name + "_count", _labels(self.labelnames, k), acc))
+        return out
+
+
+class Callback:
+    """Gauge/counter read at scrape time. fn() returns a number or {label values tuple: number}."""
+    def __init__(self, kind, name, help, fn, labelnames=()):
+        self.kind, self.name, self.help, self.fn, self.labelnames = kind, name, help, fn, tuple(labelnames)
+
+    def samples(self):
+        v = self.fn()
+        if v is None:
+            return []
+        if isinstance(v, dict):
+            return [(self.name, _labels(self.labelnames, k), x) for k, x in v.items() if x is not None]
+        return [(self.name, "", v)]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, m):
+        self._metrics.append(m)
+        return m
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def gauge_fn(self, name, help, fn, labelnames=()):
+        return self._add(Callback("gauge", name, help, fn, labelnames))
+
+    def counter_fn(self, name, help, fn, labelnames=()):
+        return self._add(Callback("counter", name, help, fn, labelnames))
+
+    def render(self):
+        lines = []
+        for m in self._metrics:
+            try:
+                samples = m.samples()
+            except Exception:       # a broken callback must not take the whole page down
+                continue
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines += [f"{name}{labels} {_num(v)}" for name, labels, v in samples]
+        return "\n".join(lines) + "\n"
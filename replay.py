@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Replay a recorded session through a real server on a fake serial port.
+
+    python3 replay.py runlogs/<date>/<run>                    # real time
+    python3 replay.py runlogs/<date>/<run> --speed 10         # 10x
+    python3 replay.py runlogs/<date>/<run> --speed 0          # as fast as possible
+    python3 replay.py runlogs/<date>/<run> --server grid_autopilot.py --json out.json
+
+Starts the server as a subprocess (cwd --out, so its runlogs/ land there)
+with SER_DEV pointed at a pseudo-terminal. The recorded timeline is then
+played back from one thread, in uptime order:
+
+  - ultrasonic readings -> written to the pty as firmware lines (or binary
+    frames with --binary), so they go through _serial_listener as usual
+  - drive/speed GETs    -> sent as HTTP on one kept-alive connection
+    (tx events are used instead when the session has no http_get routes)
+  - ingest events       -> POST /ingest/<topic>
+
+Whatever the server writes to the port is read back, so the report compares
+the replayed command sequence on the wire with the recorded tx sequence.
+"""
+import argparse, http.client, json, os, re, subprocess, sys, tempfile, threading, time
+from pathlib import Path
+
+import telemetry_codec
+from logrotate import iter_events
+
+HERE = Path(__file__).resolve().parent
+_ROUTE = re.compile(r"^/[A-Z0-9](\?|$)")     # drive GETs may carry the page's lease id
+
+# ---------- timeline ----------
+def load_timeline(run, commands="auto"):
+    """Sorted [(uptime_s, what, payload)] plus the recorded tx code sequence."""
+    run = Path(run)
+    ev, gets, txs, ultra = [], [], [], []
+    for rec in iter_events(run, kinds={"http_get", "tx", "ingest", "ultrasonic"}):
+        k, up = rec["kind"], rec.get("uptime_s")
+        if up is None:
+            continue
+        if k == "http_get" and _ROUTE.match(rec.get("path", "")):
+            gets.append((up, "get", rec["path"].split("?", 1)[0]))
+        elif k == "tx" and rec.get("command"):
+            txs.append((up, "get", "/" + rec["command"][0]))
+        elif k == "ingest":
+            ev.append((up, "ingest", (rec.get("topic", ""), rec.get("data"))))
+        elif k == "ultrasonic":
+            ultra.append((rec.get("rx_uptime_s", up), "serial", rec.get("data") or {}))
+    import colstore
+    if colstore.has_columns(run):
+        u = colstore.load(run, "ultrasonic", mmap=False)
+        if len(u["uptime"]):
+            ultra = [(t, "serial", {c: (None if v < 0 else v) for c, v in zip("LCR", row)})
+                     for t, *row in zip(u["uptime"].tolist(), u["L"].tolist(), u["C"].tolist(), u["R"].tolist())]
+    if commands == "auto":
+        commands = "http" if gets else "tx"
+    ev += gets if commands == "http" else txs
+    ev += ultra
+    ev.sort(key=lambda e: e[0])         # stable: ties keep the recorded order within each source
+    return ev, "".join(p[1] for _, _, p in txs)
+
+def sensor_bytes(data, binary=False):
+    if binary:
+        return telemetry_codec.encode_ultrasonic(data.get("L"), data.get("C"), data.get("R"))
+    parts = [f"{c}: {data[c]} cm" for c in "LCR" if data.get(c) is not None]
+    return ("  ".join(parts) + "\r\n").encode()
+
+# ---------- server under test ----------
+def open_pty():
+    import pty, tty
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, slave
+
+def spawn_server(script, ser_dev, port, cwd, env=None, wait_s=15.0):
+    """Start a server script with SER_DEV/HTTP_PORT set; return once it answers /metrics.json."""
+    e = dict(os.environ, SER_DEV=ser_dev, HTTP_PORT=str(port), PYTHONUNBUFFERED="1", **(env or {}))
+    proc = subprocess.Popen([sys.executable, str(HERE / script)], cwd=cwd, env=e,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + wait_s
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{script} exited: {proc.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            c = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            c.request("GET", "/metrics.json"); c.getresponse().read(); c.close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{script} did not start on :{port}")
+
+def stop_server(proc, timeout=10.0):
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill(); proc.wait()
+
+def _drain(master, out, stop):
+    # Everything the server writes to the "Arduino", with arrival times.
+    import select
+    while not stop.is_set():
+        r, _, _ = select.select([master], [], [], 0.1)
+        if r:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return
+            t = time.perf_counter()
+            out.extend((t, chr(b)) for b in data)
+
+# ---------- replay ----------
+def replay(timeline, master, port, speed=1.0, binary=False):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    lat, sent_cmds, n_serial, n_ingest, late = [], [], 0, 0, 0
+    t_first = timeline[0][0] if timeline else 0.0
+    t0 = time.perf_counter()
+    for up, what, payload in timeline:
+        if speed > 0:
+            due = t0 + (up - t_first) / speed
+            d = due - time.perf_counter()
+            if d > 0:
+                time.sleep(d)
+            elif d < -0.05:
+                late += 1
+        if what == "serial":
+            os.write(master, sensor_bytes(payload, binary))
+            n_serial += 1
+            continue
+        ts = time.perf_counter()
+        if what == "get":
+            conn.request("GET", payload)
+            sent_cmds.append(payload[1:])
+        else:
+            topic, data = payload
+            conn.request("POST", f"/ingest/{topic}", body=json.dumps(data).encode(),
+                         headers={"Content-Type": "application/json"})
+            n_ingest += 1
+        conn.getresponse().read()
+        lat.append(time.perf_counter() - ts)
+    wall = time.perf_counter() - t0
+    conn.close()
+    return {"wall_s": round(wall, 3), "recorded_s": round(timeline[-1][0] - t_first, 3) if timeline else 0.0,
+            "serial_lines": n_serial, "http_commands": len(sent_cmds), "ingest": n_ingest,
+            "late_events": late, "http_latency_ms": _pcts(lat), "sent": "".join(sent_cmds)}
+
+def _pcts(samples):
+    if not samples:
+        return {}
+    s = sorted(x * 1000 for x in samples)
+    at = lambda p: round(s[min(len(s) - 1, int(round(p / 100.0 * (len(s) - 1))))], 3)
+    return {"n": len(s), "p50": at(50), "p99": at(99), "max": round(s[-1], 3)}
+
+def _metrics(port):
+    try:
+        c = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        c.request("GET", "/metrics.json")
+        body = json.loads(c.getresponse().read())
+        c.close()
+        return body
+    except (OSError, ValueError):
+        return {}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("run", help="recorded session directory (runlogs/<date>/<run>)")
+    ap.add_argument("--server", default="tank_jsn.py")
+    ap.add_argument("--speed", type=float, default=1.0, help="1 = real time, 10 = 10x, 0 = as fast as possible")
+    ap.add_argument("--commands", choices=("auto", "http", "tx"), default="auto",
+                    help="replay recorded http_get routes or the tx sequence")
+    ap.add_argument("--binary", action="store_true", help="send sensor readings as binary frames")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--out", help="working dir for the server's runlogs/ (default: a temp dir)")
+    ap.add_argument("--settle-s", type=float, default=1.0, help="wait for the last commands to reach the wire")
+    ap.add_argument("--json", help="also write the report here")
+    a = ap.parse_args(argv)
+
+    timeline, recorded_tx = load_timeline(a.run, a.commands)
+    if not timeline:
+        sys.exit("nothing to replay")
+    out = a.out or tempfile.mkdtemp(prefix="replay_")
+    Path(out).mkdir(parents=True, exist_ok=True)
+    master, slave = open_pty()
+    wire, stop = [], threading.Event()
+    reader = threading.Thread(target=_drain, args=(master, wire, stop), daemon=True)
+    reader.start()
+    # recorded sessions carry no keepalives (they aren't logged): hold commands as recorded.
+    # The safety loop runs on wall-clock time, so at --speed != 1 it would stop the robot at
+    # different points on every run; switch it off and let the recorded commands drive.
+    # Accept every ingest topic the session recorded.
+    topics = sorted({p[0] for _, what, p in timeline if what == "ingest" and p[0]})
+    proc = spawn_server(a.server, os.ttyname(slave), a.port, out,
+                        env={"LEASE_MS": "0", "SAFETY": "off",
+                             "INGEST_TOPICS": ",".join(topics) or "gps,compass,imu"})
+    try:
+        rep = replay(timeline, master, a.port, a.speed, a.binary)
+        time.sleep(a.settle_s)
+        m = _metrics(a.port)
+    finally:
+        stop_server(proc)
+        stop.set(); reader.join(1)
+        os.close(master); os.close(slave)
+    on_wire = "".join(c for _, c in wire)
+    rep.update({
+        "run": str(a.run), "server": a.server, "speed": a.speed, "out": out,
+        "events_per_s": round(len(timeline) / rep["wall_s"], 1) if rep["wall_s"] else None,
+        "wire_commands": len(on_wire),
+        "coalesced_commands": len(rep["sent"]) - len(on_wire),
+        "wire_matches_recorded_tx": on_wire == recorded_tx,
+        "wire_matches_sent": on_wire == rep["sent"],
+        "server_stats": {k: m.get(k) for k in ("log", "serial_tx", "serial_rx") if k in m},
+    })
+    rep.pop("sent")
+    print(json.dumps(rep, indent=1))
+    if rep["coalesced_commands"]:
+        print(f"note: sent {rep['http_commands']} commands, {len(on_wire)} reached the wire: SerialWriter "
+              "coalesces a burst into its latest drive command, so the counts differ at high --speed")
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Fixed-capacity in-memory telemetry history.
+
+One array.array per column (monotonic uptime + L/C/R distances), written
+round-robin, so memory stays constant no matter how long the session runs:
+capacity * (8 + 3*4) bytes, e.g. ~720 KB for 36000 samples.
+Timestamps only ever increase, which makes time-range queries a binary
+search instead of a scan.
+"""
+import threading
+from array import array
+
+MISSING = -1   # stored for None (no echo / not yet seen)
+
+class TelemetryRing:
+    def __init__(self, capacity=36000, cols=("L", "C", "R")):
+        self.capacity = capacity
+        self.cols = tuple(cols)
+        self.t = array("d", bytes(8 * capacity))
+        self.v = {c: array("i", [MISSING]) * capacity for c in self.cols}
+        self.head = 0        # next slot to write
+        self.size = 0
+        self.appended = 0
+        self._lock = threading.Lock()
+
+    def append(self, t, values):
+        """t: monotonic seconds (must not go backwards); values: {col: int|None}."""
+        with self._lock:
+            i = self.head
+            self.t[i] = t
+            for c in self.cols:
+                x = values.get(c)
+                self.v[c][i] = MISSING if x is None else x
+            self.head = (i + 1) % self.capacity
+            if self.size < self.capacity:
+                self.size += 1
+            self.appended += 1
+
+    def _phys(self, k):
+        # logical index k (0 = oldest) -> slot in the arrays
+        return (self.head - self.size + k) % self.capacity
+
+    def _bisect(self, x):
+        """First logical index whose t >= x."""
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.t[self._phys(mid)] < x:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def span(self):
+        with self._lock:
+            if not self.size:
+                return None, None
+            return self.t[self._phys(0)], self.t[self._phys(self.size - 1)]
+
+    def query(self, since=None, until=None, step=0.0, limit=5000):
+        """Samples with since <= t <= until, at most one per `step` seconds.
+
+        Returns column lists {"t": [...], "L": [...], ...}; None where no echo.
+        "next" is None when everything in range was returned; otherwise `limit`
+        was hit and it is the time of the first sample left out (pass it as
+        `since` to continue).
+        """
+        with self._lock:
+            lo = 0 if since is None else self._bisect(since)
+            hi = self.size if until is None else self._bisect(until + 1e-9)
+            out = {"t": []}
+            out.update({c: [] for c in self.cols})
+            ts, cols = out["t"], [(self.v[c], out[c]) for c in self.cols]
+            k = lo
+            while k < hi and len(ts) < limit:
+                p = self._phys(k)
+                t = self.t[p]
+                ts.append(round(t, 3))
+                for src, dst in cols:
+                    x = src[p]
+                    dst.append(None if x == MISSING else x)
+                # with a step, jump straight to the next bucket instead of walking every sample
+                k = max(k + 1, self._bisect(t + step)) if step > 0 else k + 1
+            out["next"] = self.t[self._phys(k)] if k < hi else None
+            return out
+
+    def stats(self):
+        return {"capacity": self.capacity, "size": self.size, "appended": self.appended,
+                "bytes": self.t.itemsize * self.capacity
+                         + sum(a.itemsize * self.capacity for a in self.v.values())}
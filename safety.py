@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Pi-side reactive safety loop for the ultrasonic tank.
+
+A thread ticks at a fixed rate on a monotonic deadline schedule (next
+deadline = previous deadline + period, so wake-up error never accumulates)
+and checks the freshest distances against the driver's intent:
+
+    forward intent (F/X/Y) and C < stop_cm + braking  -> "S"
+    forward intent, a side < side_cm + braking        -> "S" (mode stop) or
+                                                         veer away, "Y" right / "X" left (mode steer)
+    forward intent, telemetry older than stale_s      -> "S"
+    obstacle cleared by hyst_cm                       -> re-send the driver's command
+
+While an override is active, the driver's forward commands are replaced
+with the override (command() sits in front of tx()), so holding "F" can't
+push into the obstacle; B/L/R/S and speed digits always pass. No telemetry
+at all counts as stale, so forward is refused until the sensors report
+(mode "off" for a chassis without them).
+
+    loop = SafetyLoop(read=lambda: (nearest(filtered, raw), t_rx), send=ser_out.submit).start()
+    tx = lambda ch: ser_out.submit(loop.command(ch))
+    loop.stats()    # ticks, overruns, period jitter p50/p99/max, sensor->command latency, overrides
+
+With closing speeds (velocity=, e.g. the Kalman's), each distance is first
+moved forward by speed * reading age - readings are a few hundred ms old by the
+time they land - and the threshold grows by the braking distance
+speed^2 / (2 * brake_cmps2). The sketch ramps down 100 PWM/s (~60 cm/s^2
+in fwsim's model), so a fixed threshold alone is far too short at speed.
+
+Jitter is wake-up time minus the scheduled deadline. Latency is the age of
+the reading that triggered an override at the moment the override is
+handed to the serial writer.
+"""
+import threading, time
+from collections import deque
+
+FORWARD = frozenset("FXY")
+DRIVE = frozenset("FBLRSXY")
+
+
+def nearest(filtered, raw, min_cm=20):
+    """Per channel, the nearer of the filtered value and the latest raw echo.
+
+    The median trails a fast approach by a couple of readings; a raw echo
+    that is already closer wins (a spike costs a brief stop, not a crash).
+    Raw 0 is "no echo"; blind-zone readings count as min_cm.
+    """
+    out = {}
+    for c, f in filtered.items():
+        r = raw.get(c)
+        r = None if not r else max(r, min_cm)
+        out[c] = f if r is None else (r if f is None else min(f, r))
+    return out
+
+
+def _pcts(samples):
+    if not samples:
+        return None
+    s = sorted(samples)
+    pick = lambda p: s[min(len(s) - 1, int(p / 100 * len(s)))]
+    return {"p50_ms": round(pick(50) * 1e3, 3), "p99_ms": round(pick(99) * 1e3, 3),
+            "max_ms": round(s[-1] * 1e3, 3), "n": len(s)}
+
+
+class SafetyLoop:
+    def __init__(self, read, send, rate_hz=50.0, mode="stop", stop_cm=40, side_cm=30, hyst_cm=10,
+                 stale_s=1.0, velocity=None, brake_cmps2=60.0, on_override=None, on_tick=None):
+        self.read = read                # () -> ({"L","C","R": cm|None}, t_rx monotonic|None)
+        self.velocity = velocity        # optional () -> {"C": cm/s (+ = opening) | None, ...}
+        self.brake_cmps2 = brake_cmps2
+        self.send = send                # bypasses command(): override codes go straight out
+        self.period = 1.0 / rate_hz
+        self.mode = mode                # stop | steer | off
+        self.stop_cm, self.side_cm, self.hyst_cm = stop_cm, side_cm, hyst_cm
+        self.stale_s = stale_s
+        self.on_override = on_override  # (code or None, reason, latency_s) on engage/change/release
+        self.on_tick = on_tick          # (jitter_s, duration_s) every tick, e.g. for a histogram
+        self._lock = threading.Lock()
+        self.intent = "S"               # last drive code the driver asked for
+        self.active = None              # override code in force, or None
+        self.reason = None
+        self.ticks = 0
+        self.overruns = 0               # whole periods missed (tick ran past the next deadline)
+        self.overrides = {}             # reason -> count
+        self.suppressed = 0             # driver commands replaced while an override was active
+        self._jitter = deque(maxlen=1000)
+        self._latency = deque(maxlen=200)
+        self._busy = deque(maxlen=1000)
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ---------- driver side ----------
+    def command(self, ch):
+        """Filter one driver command; returns what should actually be sent."""
+        if ch not in DRIVE or self.mode == "off":
+            return ch
+        d, t_rx = self.read() if ch in FORWARD else (None, None)
+        with self._lock:
+            self.intent = ch
+            if ch not in FORWARD:
+                self.active = self.reason = None     # driver stopped / backed off / turned: stand down
+                return ch
+            want, why = self._decide(d, t_rx, time.monotonic())
+            if want is None:
+                self.active = self.reason = None
+                return ch
+            engaged = want != self.active
+            if self.active is None:
+                self.overrides[why] = self.overrides.get(why, 0) + 1
+            self.active, self.reason = want, why
+            self.suppressed += 1
+            lat = None if t_rx is None else time.monotonic() - t_rx
+            if engaged and lat is not None and why != "stale":
+                self._latency.append(lat)
+        if engaged and self.on_override:
+            # overridden on arrival: report it like tick() would (tick() now sees want == active)
+            self.on_override(want, why, lat)
+        return want
+
+    # ---------- loop side ----------
+    def _near(self, d, vel, ch, limit_cm, age):
+        x = d.get(ch)
+        if x is None:
+            return False
+        v = vel.get(ch) if vel else None
+        closing = -v if v is not None and v < 0 else 0.0
+        return x - closing * age < limit_cm + closing * closing / (2 * self.brake_cmps2)
+
+    def _decide(self, d, t_rx, now):
+        if t_rx is None or now - t_rx > self.stale_s:
+            return "S", "stale"
+        h = self.hyst_cm if self.active is not None else 0
+        vel = self.velocity() if self.velocity else None
+        age = now - t_rx
+        if self._near(d, vel, "C", self.stop_cm + h, age):
+            return "S", "front"
+        near_l = self._near(d, vel, "L", self.side_cm + h, age)
+        near_r = self._near(d, vel, "R", self.side_cm + h, age)
+        if near_l and near_r:
+            return "S", "both_sides"
+        if self.mode == "steer" and (near_l or near_r):
+            return ("Y", "left") if near_l else ("X", "right")
+        if near_l or near_r:
+            return "S", "left" if near_l else "right"
+        return None, None
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        d, t_rx = self.read()
+        with self._lock:
+            if self.intent not in FORWARD:
+                return
+            want, why = self._decide(d, t_rx, now)
+            if want == self.active:
+                return
+            out = want if want is not None else self.intent     # release: back to what's held
+            self.active, self.reason = want, why
+            self.send(out)
+            lat = None if t_rx is None else time.monotonic() - t_rx
+            if want is not None:
+                self.overrides[why] = self.overrides.get(why, 0) + 1
+                if lat is not None and why != "stale":     # stale readings are old by definition
+                    self._latency.append(lat)
+        if self.on_override:
+            self.on_override(want, why or "clear", lat)
+
+    def run(self):
+        due = time.monotonic()
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now < due:
+                self._stop.wait(due - now)
+                continue
+            jitter = now - due
+            self._jitter.append(jitter)
+            try:
+                self.tick(now)
+            except Exception:
+                self.overrides["error"] = self.overrides.get("error", 0) + 1
+            self.ticks += 1
+            busy = time.monotonic() - now
+            self._busy.append(busy)
+            if self.on_tick:
+                self.on_tick(jitter, busy)
+            due += self.period
+            late = time.monotonic() - due
+            if late > 0:
+                # fell a whole period (or more) behind: skip the missed ticks
+                # instead of firing them back to back
+                missed = int(late / self.period) + 1
+                self.overruns += missed
+                due += missed * self.period
+
+    def start(self):
+        if self.mode == "off":
+            return self
+        self._thread = threading.Thread(target=self.run, name="safety", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {"mode": self.mode, "rate_hz": round(1 / self.period, 1), "ticks": self.ticks,
+                "overruns": self.overruns, "intent": self.intent, "active": self.active, "reason": self.reason,
+                "overrides": dict(self.overrides), "suppressed": self.suppressed,
+                "jitter": _pcts(list(self._jitter)), "tick_busy": _pcts(list(self._busy)),
+                "sensor_to_command": _pcts(list(self._latency))}
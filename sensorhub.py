@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""In-process sensor hub: source plugins on their own threads, one latest-value store.
+
+Each source owns its reader thread and publishes into a shared Store - one
+gps_reader.LatestFix per topic, so every value carries its receive time,
+a per-topic sequence number and its age on read. Consumers never talk to
+the sensors, and nothing goes through another process or /ingest:
+
+    hub = SensorHub()
+    for src in build("gps,compass"):            # or "sim:gps,sim:compass,sim:ultrasonic"
+        hub.add(src)
+    hub.start()
+    hub.store.get("gps")                        # {"lat": .., "lon": .., "age_s": .., "seq": ..} or None
+    hub.store.subscribe("compass", fn)          # fn(rec) on the source's thread - keep it short
+    hub.store.subscribe_all(fn)                 # fn(topic, rec) for every topic
+    hub.store.wait("gps", after_seq=n, timeout=1.0)
+    hub.stats()
+
+    python3 sensorhub.py sim:gps,sim:compass,sim:ultrasonic     # print the store once a second
+
+Sources: gps (NMEA serial, gps_reader.py), compass (QMC5883L over I2C,
+compass.py), ultrasonic (the Arduino's L/C/R telemetry, serial_reader.py),
+and sim:<name> stand-ins for each that need no hardware.
+"""
+import math, random, sys, threading, time
+
+from gps_reader import GpsReader, LatestFix
+
+
+class Store:
+    """topic -> LatestFix, created on first publish/subscribe."""
+    def __init__(self):
+        self._topics = {}
+        self._any = ()
+        self._lock = threading.Lock()
+
+    def topic(self, name):
+        t = self._topics.get(name)
+        if t is None:
+            with self._lock:
+                t = self._topics.get(name)
+                if t is None:
+                    t = self._topics[name] = LatestFix()
+                    for fn in self._any:
+                        t.subscribe(lambda rec, fn=fn, name=name: fn(name, rec))
+        return t
+
+    def publish(self, name, value, t_rx=None):
+        """value: dict; t_rx: time.monotonic() when it was read (default now)."""
+        self.topic(name).update(value, time.monotonic() if t_rx is None else t_rx)
+
+    def get(self, name):
+        t = self._topics.get(name)
+        return None if t is None else t.get()
+
+    def wait(self, name, after_seq=0, timeout=None):
+        return self.topic(name).wait(after_seq, timeout)
+
+    def subscribe(self, name, fn):
+        return self.topic(name).subscribe(fn)
+
+    def subscribe_all(self, fn):
+        with self._lock:
+            self._any = self._any + (fn,)
+            unsubs = [t.subscribe(lambda rec, name=name: fn(name, rec)) for name, t in self._topics.items()]
+        return unsubs
+
+    def topics(self):
+        return sorted(self._topics)
+
+    def snapshot(self):
+        return {name: self.get(name) for name in self.topics()}
+
+
+class Source:
+    """Plugin base: run() blocks on the sensor until self._stop is set; errors restart it."""
+    name = topic = None
+    retry_s = 1.0
+    from_spec = True                # can build() make it from a SENSORS name alone?
+
+    def __init__(self, on_error=None):
+        self.on_error = on_error
+        self.errors = 0
+        self.last_error = None
+        self.published = 0
+        self.store = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, value, t_rx=None):
+        self.published += 1
+        self.store.publish(self.topic, value, t_rx)
+
+    def run(self):
+        raise NotImplementedError
+
+    def halt(self):
+        """Unblock run() when _stop alone can't (override as needed)."""
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run()
+            except Exception as e:      # port gone, I2C NAK, ...: report and retry
+                self.errors += 1
+                self.last_error = str(e)
+                if self.on_error:
+                    self.on_error(e)
+                self._stop.wait(self.retry_s)
+
+    def start(self, store):
+        self.store = store
+        self._thread = threading.Thread(target=self._run, name=f"sensor_{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.halt()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {"topic": self.topic, "published": self.published, "errors": self.errors,
+                "last_error": self.last_error}
+
+
+# ---------- hardware sources ----------
+class GpsSource(Source):
+    name = topic = "gps"
+
+    def __init__(self, port="/dev/serial0", baud=115200, **kw):
+        super().__init__(**kw)
+        self.port, self.baud = port, baud
+        self.reader = None
+
+    def run(self):
+        import serial
+        ser = serial.Serial(self.port, self.baud, timeout=1)
+        try:
+            # fixes land straight in the store's LatestFix - no copy, no second thread
+            self.reader = GpsReader(ser, latest=self.store.topic(self.topic))
+            self.reader.reader.run(self._stop)
+        finally:
+            ser.close()
+
+    def stats(self):
+        st = super().stats()
+        if self.reader:
+            st.update(self.reader.stats())
+            st["published"] = self.reader.fixes
+        return st
+
+
+class CompassSource(Source):
+    """CompassSampler at the sensor's own rate; the averaged heading is published at publish_hz."""
+    name = topic = "compass"
+
+    def __init__(self, bus=None, bus_num=1, cal_path="compass_cal.json", window=20, publish_hz=20.0, **kw):
+        super().__init__(**kw)
+        self.bus, self.bus_num = bus, bus_num
+        self.cal_path, self.window = cal_path, window
+        self.period = 1.0 / publish_hz
+        self.sampler = None
+        self.calibrated = False
+        self._t_pub = 0.0
+
+    def _open_bus(self):
+        if self.bus is not None:
+            return self.bus
+        import smbus2
+        return smbus2.SMBus(self.bus_num)
+
+    def _on_sample(self, t, heading):
+        if t - self._t_pub >= self.period:
+            self._t_pub = t
+            self.publish({"heading_deg": round(heading, 2), "calibrated": self.calibrated}, t)
+
+    def run(self):
+        import os
+        from compass import Calibration, CompassSampler, QMC5883L
+        sensor = QMC5883L(self._open_bus())
+        sensor.configure()
+        calib = None
+        if self.cal_path and os.path.exists(self.cal_path):
+            calib = Calibration.load(self.cal_path)
+        self.calibrated = calib is not None
+        self.sampler = CompassSampler(sensor, calib, window=self.window, on_sample=self._on_sample)
+        if self._stop.is_set():
+            return
+        self.sampler.run()              # returns once halt() stops it
+
+    def halt(self):
+        if self.sampler:
+            self.sampler.stop()
+
+    def stats(self):
+        st = super().stats()
+        if self.sampler:
+            st.update(self.sampler.stats())
+        st["calibrated"] = self.calibrated
+        return st
+
+
+class UltrasonicSource(Source):
+    """The Arduino's telemetry (text lines or binary frames) from the command serial port.
+
+    L/C/R distances go to "ultrasonic", heading frames to "heading"; anything
+    else (firmware text lines, unknown frame types) goes to on_record.
+    """
+    name = topic = "ultrasonic"
+    from_spec = False               # needs the server's already-open port
+
+    def __init__(self, ser, on_record=None, **kw):
+        from serial_reader import RecordReader
+        super().__init__(**kw)
+        self.on_record = on_record      # (kind, data, t_rx) for "text", "frame", ...
+        self.reader = RecordReader(ser, self._on_record)
+
+    def _on_record(self, kind, data, t_rx):
+        if kind == "ultrasonic":
+            self.publish(data, t_rx)
+        elif kind == "heading":
+            self.store.publish("heading", data, t_rx)
+        elif self.on_record:
+            self.on_record(kind, data, t_rx)
+
+    def run(self):
+        self.reader.run(self._stop)
+
+    def stats(self):
+        st = super().stats()
+        st.update(self.reader.stats())
+        return st
+
+
+# ---------- simulated sources ----------
+class _Ticker(Source):
+    hz = 1.0
+
+    def tick(self, now):
+        raise NotImplementedError
+
+    def run(self):
+        period = 1.0 / self.hz
+        due = time.monotonic()
+        while not self._stop.is_set():
+            self.tick(time.monotonic())
+            due += period
+            self._stop.wait(max(0.0, due - time.monotonic()))
+
+
+class SimGpsSource(_Ticker):
+    """Wanders from (lat, lon) at speed_mps with a slowly drifting course; 10 Hz fixes like a u-blox."""
+    name, topic = "sim:gps", "gps"
+
+    def __init__(self, lat=48.1173, lon=11.5167, speed_mps=1.0, hz=10.0, seed=None, **kw):
+        super().__init__(**kw)
+        self.lat, self.lon, self.speed, self.hz = lat, lon, speed_mps, hz
+        self.course = 90.0
+        self.rng = random.Random(seed)
+
+    def tick(self, now):
+        self.course = (self.course + self.rng.gauss(0, 3)) % 360
+        d = self.speed / self.hz
+        c = math.radians(self.course)
+        self.lat += d * math.cos(c) / 111320.0
+        self.lon += d * math.sin(c) / (111320.0 * math.cos(math.radians(self.lat)))
+        self.publish({"lat": round(self.lat + self.rng.gauss(0, 2e-6), 7),
+                      "lon": round(self.lon + self.rng.gauss(0, 2e-6), 7),
+                      "alt_m": 520.0, "sats": 12, "quality": 1, "fix_type": 3, "hdop": 0.8,
+                      "speed_mps": round(self.speed, 2), "course_deg": round(self.course, 1),
+                      "utc": time.strftime("%H%M%S", time.gmtime()), "src": "SIM"}, now)
+
+
+class SimCompassSource(CompassSource):
+    """The real sampler and calibration path, against compass.MockBus."""
+    name, topic = "sim:compass", "compass"
+
+    def __init__(self, seed=None, **kw):
+        from compass import MockBus
+        kw.setdefault("cal_path", None)
+        super().__init__(bus=MockBus(seed=seed), **kw)
+
+
+class SimUltrasonicSource(_Ticker):
+    """L/C/R random walks, one full line per three pings (the sketch pings every 120 ms)."""
+    name, topic = "sim:ultrasonic", "ultrasonic"
+
+    def __init__(self, ping_ms=120, no_echo=0.02, seed=None, **kw):
+        super().__init__(**kw)
+        self.hz = 1000.0 / (3 * ping_ms)
+        self.no_echo = no_echo
+        self.rng = random.Random(seed)
+        self.d = [self.rng.uniform(60, 300) for _ in range(3)]
+
+    def tick(self, now):
+        out = {}
+        for i, c in enumerate("LCR"):
+            self.d[i] = min(450.0, max(25.0, self.d[i] + self.rng.gauss(0, 8)))
+            out[c] = 0 if self.rng.random() < self.no_echo else int(self.d[i])
+        self.publish(out, now)
+
+
+SOURCES = {"gps": GpsSource, "compass": CompassSource, "ultrasonic": UltrasonicSource,
+           "sim:gps": SimGpsSource, "sim:compass": SimCompassSource, "sim:ultrasonic": SimUltrasonicSource}
+
+def build(spec, options=None, exclude=(), **common):
+    """"gps,sim:compass" -> [GpsSource(**options["gps"]), SimCompassSource(...)].
+
+    Unknown names, names in `exclude` and sources that need more than options
+    (ultrasonic: the server's serial port) raise ValueError.
+    """
+    options = options or {}
+    out = []
+    for name in (n.strip() for n in spec.split(",")):
+        if not name:
+            continue
+        cls = SOURCES.get(name)
+        if cls is None or name in exclude or not cls.from_spec:
+            allowed = sorted(n for n, c in SOURCES.items() if c.from_spec and n not in exclude)
+            raise ValueError(f"sensor source {name!r} not available here (choose from {', '.join(allowed)})")
+        out.append(cls(**dict(common, **options.get(name, {}))))
+    return out
+
+
+class SensorHub:
+    def __init__(self, store=None):
+        self.store = store or Store()
+        self.sources = []
+
+    def add(self, source):
+        self.sources.append(source)
+        return source
+
+    def start(self):
+        for s in self.sources:
+            s.start(self.store)
+        return self
+
+    def stop(self):
+        for s in self.sources:
+            s._stop.set()
+            s.halt()
+        for s in self.sources:
+            s.stop(timeout=1.0)
+
+    def stats(self):
+        topics = {}
+        for name in self.store.topics():
+            rec = self.store.get(name)
+            topics[name] = {"updates": self.store.topic(name).seq,
+                            "age_s": rec["age_s"] if rec else None}
+        return {"sources": {s.name: s.stats() for s in self.sources}, "topics": topics}
+
+
+if __name__ == "__main__":
+    hub = SensorHub()
+    for src in build(sys.argv[1] if len(sys.argv) > 1 else "sim:gps,sim:compass,sim:ultrasonic"):
+        hub.add(src)
+    hub.start()
+    try:
+        while True:
+            time.sleep(1.0)
+            for name, rec in hub.store.snapshot().items():
+                print(f"{name:<11} {rec}")
+            print(hub.stats()["topics"], "\n")
+    except KeyboardInterrupt:
+        hub.stop()
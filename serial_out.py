@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Single-owner serial output stage with latest-wins coalescing.
+
+HTTP/WebSocket handlers call submit(); one writer thread owns the port.
+While a write is in flight, new commands collapse into these slots:
+
+    stop      "S" - jumps ahead of everything queued and cancels pending drives
+    speed     last digit wins
+    one-shot  anything else (grid_autopilot's G, T) - FIFO, never coalesced;
+              a drive submitted before one keeps its place, and an "S" submitted
+              after one is sent after it, not ahead of it
+    drive     last drive state (F/B/L/R/X/Y) wins
+
+and the next write sends them as one burst in that order, e.g. b"S5F" or b"GS".
+Nothing is delayed when the port is idle; coalescing only happens when
+commands arrive faster than they can be written. A failed write is put back
+(anything newer in the same slot still wins, and the ordering rules above
+still hold across the two) and retried after retry_s, up to `retries` times;
+a pending stop is kept until it goes out. While the port keeps failing the
+wait doubles up to max_retry_s, and on_error only hears about a failure
+that differs from the previous one.
+"""
+import threading, time
+
+DRIVE = frozenset("FBLRXY")
+
+class SerialWriter:
+    def __init__(self, ser, on_write=None, on_error=None, linger_s=0.0, on_timing=None, retries=3, retry_s=0.1,
+                 max_retry_s=5.0):
+        self.ser = ser
+        self.on_write = on_write      # called from the writer thread with the written codes
+        self.on_error = on_error
+        self.on_timing = on_timing    # called with (seconds in ser.write, bytes) per write
+        self.linger_s = linger_s      # optional wait after the first command to gather a burst
+        self.retries = retries
+        self.retry_s = retry_s
+        self.max_retry_s = max_retry_s
+        self._cv = threading.Condition()
+        self._halt = False
+        self._speed = None
+        self._fifo = []               # one-shots, with the drives / stops they must stay ordered with
+        self._drive = None
+        self._closing = False
+
+        self.submitted = 0
+        self.written = 0
+        self.coalesced = 0
+        self.preempted = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0              # codes given up on after `retries` failed writes
+        self.last_write_s = 0.0
+
+        self._thread = threading.Thread(target=self._run, name="serial_out", daemon=True)
+        self._thread.start()
+
+    def submit(self, ch):
+        with self._cv:
+            self.submitted += 1
+            if ch == "S":
+                if self._drive is not None:
+                    self._drive = None
+                    self.preempted += 1
+                    self.coalesced += 1
+                held = [c for c in self._fifo if c in DRIVE]
+                if held:
+                    self._fifo = [c for c in self._fifo if c not in DRIVE]
+                    self.preempted += len(held)
+                    self.coalesced += len(held)
+                if self._fifo:
+                    self._fifo.append(ch)       # stop what the queued one-shot starts
+                else:
+                    if self._halt:
+                        self.coalesced += 1
+                    self._halt = True
+            elif ch.isdigit():
+                if self._speed is not None:
+                    self.coalesced += 1
+                self._speed = ch
+            elif ch in DRIVE:
+                if self._drive is not None:
+                    self.coalesced += 1
+                self._drive = ch
+            else:
+                if self._drive is not None:     # sent before the one-shot, as it was submitted
+                    self._fifo.append(self._drive)
+                    self._drive = None
+                self._fifo.append(ch)
+            self._cv.notify()
+
+    def _pending(self):
+        return self._halt or self._speed is not None or bool(self._fifo) or self._drive is not None
+
+    def _put_back(self, halt, speed, fifo, drive, attempt):
+        # The failed batch was submitted before everything pending now: newer commands
+        # in a slot win, and the one-shot ordering rules hold across the two.
+        # A stop is never given up.
+        with self._cv:
+            if attempt >= self.retries:
+                self.dropped += len(speed or "") + len(fifo) + len(drive or "")
+                speed, fifo, drive = None, [], None
+            new_halt = self._halt
+            old = list(fifo)
+            if new_halt:
+                drive = None                    # stopped since
+                if old:                         # ... after these one-shots: the S goes after them
+                    old = [c for c in old if c not in DRIVE] + ["S"]
+                    new_halt = False
+            elif drive is not None and self._drive is None and self._fifo:
+                old.append(drive)               # it came before the newer one-shots
+                drive = None
+            self._halt = halt or new_halt
+            if self._speed is None:
+                self._speed = speed
+            self._fifo = old + self._fifo
+            if self._drive is None:
+                self._drive = drive
+
+    def _run(self):
+        attempt = 0
+        last_err = None
+        while True:
+            with self._cv:
+                while not self._pending() and not self._closing:
+                    self._cv.wait()
+                if not self._pending():
+                    return
+            if self.linger_s:
+                time.sleep(self.linger_s)
+            with self._cv:
+                batch = (self._halt, self._speed, self._fifo, self._drive)
+                out = ("S" if self._halt else "") + (self._speed or "") + "".join(self._fifo) + (self._drive or "")
+                self._halt, self._speed, self._fifo, self._drive = False, None, [], None
+            t0 = time.perf_counter()
+            try:
+                self.ser.write(out.encode())
+            except Exception as e:
+                self.errors += 1
+                attempt += 1
+                err = f"{type(e).__name__}: {e}"
+                if self.on_error and err != last_err:
+                    self.on_error(e)            # one report per distinct failure, not per retry
+                last_err = err
+                self._put_back(*batch, attempt)
+                if self._closing and attempt >= self.retries:
+                    return                      # port is gone; don't spin on a stop at shutdown
+                with self._cv:
+                    self._cv.wait(min(self.max_retry_s, self.retry_s * 2 ** (attempt - 1)))
+                continue
+            attempt = 0
+            last_err = None
+            self.last_write_s = time.perf_counter() - t0
+            self.written += len(out)
+            self.batches += 1
+            if self.on_timing:
+                self.on_timing(self.last_write_s, len(out))
+            if self.on_write:
+                try:
+                    self.on_write(out)
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(e)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "coalesced": self.coalesced,
+            "stop_preempted": self.preempted,
+            "write_batches": self.batches,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "last_write_ms": round(self.last_write_s * 1000, 3),
+        }
+
+    def close(self, timeout=1.0):
+        """Write whatever is still pending, then stop the writer thread."""
+        with self._cv:
+            self._closing = True
+            self._cv.notify()
+        self._thread.join(timeout)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Event-driven line reader for the Arduino serial port.
+
+Instead of polling in_waiting and sleeping, the reader waits on the port's
+file descriptor with selectors (falling back to a blocking pyserial read
+on ports without one), appends whatever arrived to one reusable bytearray
+and hands every complete line to a callback together with its arrival
+time (time.monotonic()).
+
+Rates (lines_per_s, bytes_per_s) are rolled over fixed RATE_WINDOW_S windows
+by the reading thread; stats() only reads them, so any number of consumers
+(/metrics, /metrics.json, ...) can call it without disturbing each other.
+"""
+import os, selectors, time
+from telemetry_codec import StreamDecoder
+
+RATE_WINDOW_S = 1.0
+
+class LineReader:
+    def __init__(self, ser, on_line, max_line=4096, chunk=4096):
+        self.ser = ser
+        self.on_line = on_line
+        self.max_line = max_line
+        self.chunk = chunk
+        self.buf = bytearray()
+        self.lines = 0
+        self.bytes = 0
+        self.overflows = 0
+        self.dropped_bytes = 0
+        self.errors = 0
+        self._win = (time.monotonic(), 0, 0)   # (start, lines, bytes) of the window being filled
+        self._rates = (0.0, 0.0)              # lines/s, bytes/s over the last full window
+
+    # ---------- reading ----------
+    def run(self, stop, poll_s=0.5):
+        """Read until the `stop` Event is set. Exceptions from on_line are counted, not raised."""
+        try:
+            fd = self.ser.fileno()
+        except Exception:
+            fd = None
+        if fd is None:
+            return self._run_blocking(stop)
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+        try:
+            while not stop.is_set():
+                if not sel.select(poll_s):
+                    continue
+                data = os.read(fd, self.chunk)
+                if not data:           # port went away (pty closed / USB unplugged)
+                    stop.wait(poll_s)
+                    continue
+                self.feed(data, time.monotonic())
+        finally:
+            sel.close()
+
+    def _run_blocking(self, stop):
+        while not stop.is_set():
+            data = self.ser.read(max(1, self.ser.in_waiting))   # blocks up to ser.timeout
+            if data:
+                self.feed(data, time.monotonic())
+
+    def _roll(self, t):
+        # reader thread only: close the rate window once it is RATE_WINDOW_S old
+        t0, l, b = self._win
+        if t - t0 >= RATE_WINDOW_S:
+            dt = t - t0
+            self._rates = ((self.lines - l) / dt, (self.bytes - b) / dt)
+            self._win = (t, self.lines, self.bytes)
+
+    def feed(self, data, t):
+        """Split `data` into lines; every line in one chunk shares arrival time `t`."""
+        self._roll(t)
+        self.bytes += len(data)
+        buf = self.buf
+        buf += data
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            line = buf[start:nl].decode("utf-8", "ignore").strip()
+            start = nl + 1
+            if not line:
+                continue
+            self.lines += 1
+            try:
+                self.on_line(line, t)
+            except Exception:
+                self.errors += 1
+        if start:
+            del buf[:start]
+        if len(buf) > self.max_line:   # garbage with no newline; don't grow forever
+            self.overflows += 1
+            self.dropped_bytes += len(buf)
+            del buf[:]
+
+    # ---------- stats ----------
+    def backlog(self):
+        """Bytes waiting in the kernel plus the unfinished line we hold."""
+        try:
+            pending = self.ser.in_waiting
+        except Exception:
+            pending = 0
+        return pending + len(self.buf)
+
+    def rates(self):
+        """(lines/s, bytes/s) over the last full window; 0 once nothing has arrived for two windows."""
+        if time.monotonic() - self._win[0] >= 2 * RATE_WINDOW_S:
+            return 0.0, 0.0
+        return self._rates
+
+    def stats(self):
+        lps, bps = self.rates()
+        return {
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "lines_per_s": round(lps, 1),
+            "bytes_per_s": round(bps, 1),
+            "backlog_bytes": self.backlog(),
+            "overflows": self.overflows,
+            "dropped_bytes": self.dropped_bytes,
+            "callback_errors": self.errors,
+        }
+
+
+class RecordReader(LineReader):
+    """LineReader that also understands framed binary telemetry (telemetry_codec).
+
+    on_record(kind, data, t) gets ("ultrasonic", {"L":..,"C":..,"R":..}),
+    ("heading", {...}), ("text", line), ... for both wire formats.
+    """
+    def __init__(self, ser, on_record, **kw):
+        super().__init__(ser, on_record, **kw)
+        self.decoder = StreamDecoder(max_text=self.max_line)
+
+    def feed(self, data, t):
+        self._roll(t)
+        self.bytes += len(data)
+        for kind, rec in self.decoder.feed(data):
+            self.lines += 1
+            try:
+                self.on_line(kind, rec, t)
+            except Exception:
+                self.errors += 1
+
+    def backlog(self):
+        return super().backlog() + len(self.decoder.buf) + len(self.decoder.text)
+
+    def stats(self):
+        st = super().stats()
+        st.update(self.decoder.stats())
+        return st
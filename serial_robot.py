@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import serial, os
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+import serial, os, threading
 
 SER_DEV = os.environ.get("SER_DEV", "/dev/ttyUSB0")
 BAUD = 115200
 ser = serial.Serial(SER_DEV, BAUD, timeout=0.2)
+HTTP_MODE = os.environ.get("HTTP_MODE", "threaded")   # threaded | single
+_ser_lock = threading.Lock()   # handler threads take turns on the port
 
 HTML = """<!doctype html>
 <title>Motor Test</title>
@@ -46,7 +48,9 @@ ROUTES = {
   "/5":"5","/6":"6","/7":"7","/8":"8","/9":"9"
 }
 
-def tx(ch): ser.write(ch.encode()); print("sent:", ch)
+def tx(ch):
+    with _ser_lock: ser.write(ch.encode())
+    print("sent:", ch)
 
 class H(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -65,6 +69,7 @@ class H(BaseHTTPRequestHandler):
         self.end_headers(); self.wfile.write(body)
 
 if __name__=="__main__":
-    print("Serving on :8000, talking to", SER_DEV)
-    HTTPServer(("0.0.0.0", 8000), H).serve_forever()
+    print("Serving on :8000, talking to", SER_DEV, f"({HTTP_MODE})")
+    Server = ThreadingHTTPServer if HTTP_MODE == "threaded" else HTTPServer
+    Server(("0.0.0.0", 8000), H).serve_forever()
 
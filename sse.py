@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Server-Sent Events fan-out for live telemetry.
+
+Producers (the serial listener, tx(), /ingest) call publish(); the event is
+encoded once and appended to every subscriber's own bounded deque. A full
+deque drops its oldest entry, so a slow dashboard only loses its own
+history and publish() never blocks the producer thread.
+
+    GET /stream                       every topic
+    GET /stream?topics=ultrasonic,tx  just those
+"""
+import json, threading, time
+from collections import deque
+
+class Subscriber:
+    def __init__(self, topics=None, maxlen=64):
+        self.topics = set(topics) if topics else None
+        self.q = deque(maxlen=maxlen)
+        self.ready = threading.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def push(self, topic, msg):
+        if self.topics is not None and topic not in self.topics:
+            return
+        if len(self.q) == self.q.maxlen:
+            self.dropped += 1          # deque discards the oldest on append
+        self.q.append(msg)
+        self.ready.set()
+
+    def drain(self, timeout):
+        """Wait up to `timeout` for data; return everything queued (maybe [])."""
+        if not self.q:
+            self.ready.wait(timeout)
+        self.ready.clear()
+        out = []
+        while True:
+            try:
+                out.append(self.q.popleft())
+            except IndexError:
+                return out
+
+
+class Broadcaster:
+    def __init__(self, maxlen=64):
+        self.maxlen = maxlen
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.published = 0
+
+    def subscribe(self, topics=None):
+        sub = Subscriber(topics, self.maxlen)
+        with self._lock:
+            self._subs = self._subs | {sub}     # copy-on-write: stats() and publish()'s empty check read it lock-free
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs = self._subs - {sub}
+
+    def publish(self, topic, data):
+        subs = self._subs
+        if not subs:
+            return
+        body = json.dumps(data, separators=(',', ':'))
+        # publish() runs on the serial reader, writer and HTTP threads: numbering and
+        # fan-out share the lock so every client sees each id once, in increasing order
+        with self._lock:
+            self._seq += 1
+            msg = f"id: {self._seq}\nevent: {topic}\ndata: {body}\n\n".encode()
+            for sub in self._subs:
+                sub.push(topic, msg)
+            self.published += 1
+
+    def stats(self):
+        subs = self._subs
+        return {
+            "clients": len(subs),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subs),
+        }
+
+
+def serve(h, bc, topics=None, ping_s=15.0):
+    """Stream to one client on a BaseHTTPRequestHandler until it disconnects."""
+    h.send_response(200)
+    h.send_header("Content-Type", "text/event-stream")
+    h.send_header("Cache-Control", "no-store")
+    h.send_header("Connection", "close")
+    h.end_headers()
+    h.close_connection = True
+    sub = bc.subscribe(topics)
+    last = time.monotonic()
+    try:
+        h.wfile.write(b"retry: 2000\n\n")
+        while True:
+            msgs = sub.drain(ping_s)
+            if msgs:
+                h.wfile.write(b"".join(msgs))
+                sub.sent += len(msgs)
+                last = time.monotonic()
+            elif time.monotonic() - last >= ping_s:
+                h.wfile.write(b": ping\n\n")   # keeps proxies/phones from idling us out
+                last = time.monotonic()
+    except OSError:
+        pass
+    finally:
+        bc.unsubscribe(sub)
+    return {"sent": sub.sent, "dropped": sub.dropped}
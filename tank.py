@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import serial, os
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+import serial, os, threading
+import wsctl
 
 SER_DEV = os.environ.get("SER_DEV", "/dev/ttyUSB0")
 BAUD = 115200
 ser = serial.Serial(SER_DEV, BAUD, timeout=0.2)
+HTTP_MODE = os.environ.get("HTTP_MODE", "threaded")   # threaded | single
+_ser_lock = threading.Lock()   # handler threads take turns on the port
 
 HTML = """<!doctype html>
 <title>Motor Test</title>
@@ -35,7 +38,19 @@ button{width:120px;height:70px;font-size:1.1rem;border:none;border-radius:12px;c
   <button class="speedbtn" onclick="send('7')">7</button>
 </div>
 <script>
-async function send(p){ fetch("/"+p, {cache:"no-store"}); }
+// Drive commands ride one ordered WebSocket (seq-numbered); GETs are the fallback.
+let ws = null, seq = 0;
+function connectWS(){
+  const s = new WebSocket((location.protocol==="https:"?"wss://":"ws://")+location.host+"/ws");
+  s.onopen  = ()=>{ ws = s; };
+  s.onclose = ()=>{ if (ws===s) ws = null; setTimeout(connectWS, 2000); };
+}
+if ("WebSocket" in window) connectWS();
+async function send(p){
+  seq++;
+  if (ws && ws.readyState===1) ws.send(seq+":"+p);
+  else fetch("/"+p, {cache:"no-store"});
+}
 
 // Track pressed buttons (supports multi-touch/multi-click)
 const pressed = new Set();
@@ -81,7 +96,9 @@ ROUTES = {
   "/5":"5","/6":"6","/7":"7","/8":"8","/9":"9"
 }
 
-def tx(ch): ser.write(ch.encode()); print("sent:", ch)
+def tx(ch):
+    with _ser_lock: ser.write(ch.encode())
+    print("sent:", ch)
 
 class H(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -89,9 +106,17 @@ class H(BaseHTTPRequestHandler):
         print("req:", self.path)
         if self.path in ("/", "/index.html"):
             return self._send(200, HTML, "text/html")
+        if self.path == "/ws" and HTTP_MODE == "threaded":
+            return self._ws()
         if self.path in ROUTES:
             tx(ROUTES[self.path]); return self._send(200, "OK", "text/plain")
         self._send(404, "Not found", "text/plain")
+    def _ws(self):
+        if not wsctl.handshake(self):
+            return self._send(400, "Expected WebSocket upgrade", "text/plain")
+        print("ws open:", self.client_address[0])
+        st = wsctl.drive_session(self, tx, set(ROUTES.values()))
+        print("ws closed:", self.client_address[0], st)
     def log_message(self, *args): return
     def _send(self, code, body, ctype):
         body=body.encode(); self.send_response(code)
@@ -100,5 +125,6 @@ class H(BaseHTTPRequestHandler):
         self.end_headers(); self.wfile.write(body)
 
 if __name__=="__main__":
-    print("Serving on :8000, talking to", SER_DEV)
-    HTTPServer(("0.0.0.0", 8000), H).serve_forever()
+    print("Serving on :8000, talking to", SER_DEV, f"({HTTP_MODE})")
+    Server = ThreadingHTTPServer if HTTP_MODE == "threaded" else HTTPServer
+    Server(("0.0.0.0", 8000), H).serve_forever()
@@ -1,7 +1,21 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import os, json, csv, time, uuid, signal, threading
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+import os, json, time, uuid, signal, threading
 from pathlib import Path
+from logwriter import LogWriter
+from eventindex import EventIndex
+from logrotate import SegmentManager
+from colstore import ColumnWriter
+from catalog import Catalog, DriveTimer
+import html
+import wsctl, sse, promstats
+from serial_out import SerialWriter
+from lease import LeaseManager
+from sensorhub import SensorHub, UltrasonicSource, build as build_sensors
+from ringbuf import TelemetryRing
+from usfilter import UltrasonicFilter
+from safety import SafetyLoop, nearest
+from urllib.parse import urlsplit, parse_qs
 
 # ====== Serial (kept identical to your current setup) ======
 import serial
@@ -19,6 +33,14 @@ RUN_DIR.mkdir(parents=True, exist_ok=True)
 EVENTS_PATH   = RUN_DIR / "events.jsonl"   # all events (requests, commands, errors, heartbeats)
 COMMANDS_CSV  = RUN_DIR / "commands.csv"   # only sent drive/speed commands
 SESSION_META  = RUN_DIR / "session.json"   # static info about this run
+CATALOG_DB    = os.environ.get("CATALOG_DB", str(Path("runlogs") / "catalog.sqlite"))   # cross-run index
+HTTP_MODE = os.environ.get("HTTP_MODE", "threaded")   # threaded | single
+HTTP_PORT = int(os.environ.get("HTTP_PORT", "8000"))
+LEASE_MS = int(os.environ.get("LEASE_MS", "500"))   # hold-to-move lease; 0 = commands never expire
+SENSORS = os.environ.get("SENSORS", "")   # extra in-process sensors, e.g. "gps,compass" or "sim:gps,sim:compass"
+# POST /ingest/<topic> accepts these topics only (each one becomes a hub topic and metric series)
+INGEST_TOPICS = frozenset(t.strip() for t in os.environ.get("INGEST_TOPICS", "gps,compass,imu").split(",") if t.strip())
+KEEPALIVE_S = float(os.environ.get("HTTP_KEEPALIVE_S", "30"))   # idle timeout; 0 = HTTP/1.0, close per request
 HTML = """<!doctype html>
 <title>Motor Test</title>
 <meta name="viewport" content="width=device-width,initial-scale=1">
@@ -48,9 +70,33 @@ pre{display:inline-block;text-align:left;background:#111;color:#eee;padding:12px
   <button class="speedbtn" onclick="send('6')">6</button>
   <button class="speedbtn" onclick="send('7')">7</button>
 </div>
-<p><a href="/metrics">Metrics</a> | <a href="/events.tail">Tail events</a></p>
+<p><a href="/metrics.html">Metrics</a> | <a href="/events.tail">Tail events</a></p>
 <script>
-async function send(p){ fetch("/"+p, {cache:"no-store"}); }
+// Drive commands ride one ordered WebSocket (seq-numbered); GETs are the fallback.
+let ws = null, seq = 0;
+function connectWS(){
+  const s = new WebSocket((location.protocol==="https:"?"wss://":"ws://")+location.host+"/ws");
+  s.onopen  = ()=>{ ws = s; };
+  s.onmessage = e=>{ if (e.data==="lease:0") leaseLost(); };
+  s.onclose = ()=>{ if (ws===s) ws = null; setTimeout(connectWS, 2000); };
+}
+if ("WebSocket" in window) connectWS();
+// Hold-to-move codes carry a short server-side lease (lease.py): while one is in force
+// the page renews it every 100 ms, and the server sends "S" itself if renewals stop.
+const lid = Math.random().toString(36).slice(2);
+let held = "S";
+async function send(p){
+  seq++;
+  if (!(p>='0'&&p<='9')) held = p;
+  if (ws && ws.readyState===1) ws.send(seq+":"+p);
+  else fetch("/"+p+"?l="+lid, {cache:"no-store"});
+}
+function leaseLost(){ if ("FBLRXY".includes(held)) send(held); }   // expired while still held: re-grant
+setInterval(()=>{
+  if (!"FBLRXY".includes(held)) return;
+  if (ws && ws.readyState===1) ws.send("k");
+  else fetch("/k?l="+lid, {cache:"no-store"}).then(r=>r.text()).then(t=>{ if (t==="0") leaseLost(); }).catch(()=>{});
+}, 100);
 
 // Multi-press/multi-touch support
 const pressed = new Set();
@@ -97,7 +143,82 @@ ROUTES = {
 }
 
 # ---------- tiny logging helpers ----------
-_lock = threading.Lock()
+# Records go through a background writer (see logwriter.py) so disk stalls
+# never sit on the tx() path. LOG_FSYNC = none | interval:<sec> | every:<n>
+# events.jsonl rotates into RUN_DIR/segments/ (compressed, listed in manifest.json)
+# at LOG_ROTATE_MB or LOG_ROTATE_S, whichever comes first.
+_segments = SegmentManager(RUN_DIR, compress=os.environ.get("LOG_COMPRESS", "gzip"))
+_log = LogWriter(EVENTS_PATH, COMMANDS_CSV, fsync=os.environ.get("LOG_FSYNC", "none"),
+                 index_dir=RUN_DIR / "index", segments=_segments,
+                 rotate_bytes=int(float(os.environ.get("LOG_ROTATE_MB", "64")) * 1e6),
+                 rotate_s=float(os.environ.get("LOG_ROTATE_S", "3600")),
+                 columns=ColumnWriter(RUN_DIR),   # RUN_DIR/columns/: typed per-column files
+                 session=SESSION_ID, start_mono=START_MONO)
+# Offset index over events.jsonl (index/ next to it), maintained by the writer above.
+_events = EventIndex(EVENTS_PATH, RUN_DIR / "index")
+# Live fan-out for /stream dashboards (per-client bounded buffers, drop-oldest).
+_stream = sse.Broadcaster(maxlen=int(os.environ.get("STREAM_BUFFER", "64")))
+
+# Prometheus text on /metrics (promstats.py). Requests, serial writes and
+# heartbeats are counted inline; what the components already track is read
+# at scrape time.
+_metrics = promstats.Registry()
+_m_requests = _metrics.counter("robot_http_requests_total", "HTTP requests by route, method and status",
+                               ("route", "method", "code"))
+_m_handler = _metrics.histogram("robot_http_handler_seconds", "Time in the request handler (not /stream, /ws)",
+                                ("route", "method"))
+_m_ser_write = _metrics.histogram("robot_serial_write_seconds", "Time in ser.write() per command burst")
+_m_ser_bytes = _metrics.counter("robot_serial_write_bytes_total", "Command bytes written to the serial port")
+_m_hb_lag = _metrics.histogram("robot_heartbeat_lag_seconds", "Heartbeat wake-up past its 5 s schedule")
+_hb_last = [time.monotonic()]
+_metrics.gauge_fn("robot_uptime_seconds", "Seconds since the server started", lambda: uptime_s())
+_metrics.gauge_fn("robot_heartbeat_age_seconds", "Seconds since the last heartbeat",
+                  lambda: round(time.monotonic() - _hb_last[0], 3))
+_metrics.counter_fn("robot_serial_commands_total", "Commands submitted to the serial writer, and how many were coalesced",
+                    lambda: {("submitted",): _ser_out.submitted, ("coalesced",): _ser_out.coalesced,
+                             ("stop_preempted",): _ser_out.preempted}, ("state",))
+_metrics.counter_fn("robot_serial_write_errors_total", "Failed ser.write() calls", lambda: _ser_out.errors)
+# Plain counters straight off the reader/decoder: no stats() dict built per series.
+_metrics.counter_fn("robot_serial_lines_total", "Serial records parsed by format",
+                    lambda: {("text",): _reader.decoder.text_lines, ("frame",): _reader.decoder.frames},
+                    ("format",))
+_metrics.counter_fn("robot_serial_rx_bytes_total", "Bytes read from the serial port", lambda: _reader.bytes)
+_metrics.counter_fn("robot_serial_rx_crc_errors_total", "Binary frames dropped on CRC mismatch",
+                    lambda: _reader.decoder.crc_errors)
+_metrics.gauge_fn("robot_serial_rx_backlog_bytes", "Bytes waiting in the kernel serial buffer",
+                  lambda: _reader.backlog())
+_metrics.gauge_fn("robot_ultrasonic_cm", "Latest ultrasonic distance, raw and filtered (absent = no echo)",
+                  lambda: {**{(c, "raw"): v for c, v in latest_ultrasonic.items()},
+                           **{(c, "filtered"): v for c, v in latest_filtered.items()}}, ("channel", "stage"))
+_metrics.counter_fn("robot_ultrasonic_filter_total", "Ultrasonic readings by filter outcome",
+                    lambda: {(c, k): n for c, st in _us_filter.stats().items() for k, n in st.items()},
+                    ("channel", "outcome"))
+_m_safety_jitter = _metrics.histogram("robot_safety_tick_jitter_seconds", "Safety loop wake-up past its deadline")
+_m_safety_latency = _metrics.histogram("robot_safety_sensor_to_command_seconds",
+                                       "Age of the reading that triggered a safety override when it was sent")
+_metrics.counter_fn("robot_safety_ticks_total", "Safety loop ticks, and periods skipped on overrun",
+                    lambda: {("run",): _safety.ticks, ("overrun",): _safety.overruns}, ("state",))
+_metrics.counter_fn("robot_safety_overrides_total", "Safety overrides by reason",
+                    lambda: {(k,): n for k, n in _safety.overrides.items()}, ("reason",))
+_metrics.gauge_fn("robot_safety_active", "1 while a safety override is in force", lambda: int(_safety.active is not None))
+_metrics.counter_fn("robot_lease_events_total", "Drive leases granted, renewed, refused, released and expired",
+                    lambda: {(k,): _leases.stats()[k] for k in ("granted", "renewed", "refused", "released", "expired")},
+                    ("event",))
+_metrics.gauge_fn("robot_lease_expiry_lag_seconds", "Last lease expiry: S issued this long after the deadline",
+                  lambda: _leases.wheel.lag_s)
+_metrics.gauge_fn("robot_sensor_age_seconds", "Age of the latest value per sensor hub topic",
+                  lambda: {(t,): r["age_s"] for t, r in _hub.store.snapshot().items() if r}, ("topic",))
+_metrics.counter_fn("robot_sensor_updates_total", "Values published per sensor hub topic",
+                    lambda: {(t,): _hub.store.topic(t).seq for t in _hub.store.topics()}, ("topic",))
+_metrics.counter_fn("robot_sensor_errors_total", "Sensor source failures (each one is retried)",
+                    lambda: {(s.name,): s.errors for s in _hub.sources}, ("source",))
+_metrics.gauge_fn("robot_log_queue_depth", "Records waiting for the log writer thread", lambda: _log.q.qsize())
+_metrics.counter_fn("robot_log_written_total", "Records written by the log writer", lambda: _log.written)
+_metrics.counter_fn("robot_log_dropped_total", "Records dropped on a full log queue", lambda: _log.dropped)
+_metrics.counter_fn("robot_log_errors_total", "Log writer failures survived (rotation, flush, fsync)",
+                    lambda: _log.errors)
+_metrics.counter_fn("robot_log_fsyncs_total", "fsync calls by the log writer", lambda: _log.fsyncs)
+_metrics.gauge_fn("robot_stream_clients", "Connected /stream clients", lambda: _stream.stats()["clients"])
 
 def uptime_s():
     return round(time.monotonic() - START_MONO, 3)
@@ -113,64 +234,201 @@ def log_event(kind, **payload):
         "kind": kind,
         **payload
     }
-    with _lock:
-        with EVENTS_PATH.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    _log.event(rec)
 
 
 def log_command_csv(ch):
     is_speed = ch.isdigit()
-    row = [now_iso(), uptime_s(), SESSION_ID, ("speed" if is_speed else "drive"), ch]
-    header = ["ts","uptime_s","session","type","value"]
-    with _lock:
-        new = not COMMANDS_CSV.exists()
-        with COMMANDS_CSV.open("a", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            if new: w.writerow(header)
-            w.writerow(row)
-
-def tx(ch):
-    ser.write(ch.encode())
-    log_event("tx", command=ch)
-    log_command_csv(ch)
-import re
-
-_stop_serial = threading.Event()
-
-def _serial_listener():
-    pattern = re.compile(r'([LCR]):\s*(\d+)\s*cm')
-    latest = {"L": None, "C": None, "R": None}
-
-    while not _stop_serial.is_set():
-        try:
-            if ser.in_waiting:
-                line = ser.readline().decode(errors="ignore").strip()
-                m = pattern.findall(line)
-                if m:
-                    for label, value in m:
-                        latest[label] = int(value)
-                    global latest_ultrasonic
-                    latest_ultrasonic.update(latest)
-                    log_event("ultrasonic", data=latest.copy())
-        except Exception as e:
-            log_event("error", where="serial_listener", msg=str(e))
-        time.sleep(0.05)
+    _log.command([now_iso(), uptime_s(), SESSION_ID, ("speed" if is_speed else "drive"), ch])
+
+def _on_serial_written(codes):
+    # Runs on the serial owner thread: log only what actually hit the wire.
+    for ch in codes:
+        log_event("tx", command=ch)
+        _stream.publish("tx", {"uptime_s": uptime_s(), "command": ch})
+        log_command_csv(ch)
+        _log.column("commands", (uptime_s(), ord(ch)))
+        _drive.mark(ch, uptime_s())
+
+def _on_serial_timing(seconds, nbytes):
+    _m_ser_write.observe(seconds)
+    _m_ser_bytes.inc(v=nbytes)
+
+_drive = DriveTimer()   # seconds held per drive code, for the session catalog
+
+# One thread owns ser.write(); bursts collapse to latest drive/speed, "S" jumps the queue.
+_ser_out = SerialWriter(ser, on_write=_on_serial_written,
+                        on_error=lambda e: log_event("error", where="serial_out", msg=str(e)),
+                        on_timing=_on_serial_timing)
+
+def tx(ch, holder=None):
+    _leases.command(holder, ch)             # the lease follows the driver's intent, not the override
+    _ser_out.submit(_safety.command(ch))
+
+# Deadman: F/B/L/R/X/Y stop by themselves LEASE_MS after the page's last keepalive.
+def _on_lease_expired(holder, code):
+    tx("S")
+    log_event("lease_expired", holder=holder, command=code, lag_ms=round(_leases.wheel.lag_s * 1000, 2))
+    _stream.publish("lease", {"uptime_s": uptime_s(), "expired": code, "holder": holder})
+
+_leases = LeaseManager(_on_lease_expired, ttl_s=LEASE_MS / 1000)
+ULTRASONIC_JSONL = os.environ.get("ULTRASONIC_JSONL", "0") == "1"   # also log readings as JSON events
+# Recent ultrasonic history in constant memory for /telemetry (uptime-stamped).
+_history = TelemetryRing(int(os.environ.get("TELEMETRY_CAPACITY", "36000")))
+
+# Per-channel spike/no-echo filtering (usfilter.py); raw values stay in latest_ultrasonic.
+# US_FILTER = kalman (median + constant-velocity Kalman, adds closing speed) | median
+_us_filter = UltrasonicFilter(kalman=os.environ.get("US_FILTER", "kalman") == "kalman")
+latest_filtered = _us_filter.filtered
+_us_last_rx = [None]    # monotonic time of the newest ultrasonic record
+
+def _on_ultrasonic(rec):
+    # Text "L: NN cm" lines and binary frames (telemetry_codec.py) both land in the hub's
+    # "ultrasonic" topic; this runs on the serial reader thread.
+    data = {c: rec[c] for c in latest_ultrasonic if c in rec}
+    t_rx = rec["rx_mono"]
+    latest_ultrasonic.update(data)
+    _us_filter.update(data, t_rx)
+    _us_last_rx[0] = t_rx
+    rx = round(t_rx - START_MONO, 3)
+    _history.append(rx, latest_ultrasonic)
+    # ~14 bytes/reading in columns/ instead of a ~150-byte JSON event
+    _log.column("ultrasonic", (rx, latest_ultrasonic["L"], latest_ultrasonic["C"], latest_ultrasonic["R"]))
+    if ULTRASONIC_JSONL:
+        log_event("ultrasonic", data=latest_ultrasonic.copy(), rx_uptime_s=rx)
+    _stream.publish("ultrasonic", {"uptime_s": rx, **latest_ultrasonic,
+                                   "filtered": dict(latest_filtered), "velocity": dict(_us_filter.velocity)})
+
+# Fixed-rate safety loop (safety.py): stops/steers a forward drive when the distances
+# (filtered, or a closer raw echo) cross SAFETY_STOP_CM (front) / SAFETY_SIDE_CM (sides),
+# each plus the braking distance at the Kalman closing speed (SAFETY_BRAKE_CMPS2).
+# SAFETY = stop | steer (veer away from a near side instead of stopping) | off
+def _on_safety_override(code, reason, latency_s):
+    lat = None if latency_s is None else round(latency_s * 1000, 1)
+    log_event("safety", command=code, reason=reason, latency_ms=lat, ultrasonic=dict(latest_filtered))
+    _stream.publish("safety", {"uptime_s": uptime_s(), "command": code, "reason": reason})
+    if code is not None and latency_s is not None and reason != "stale":
+        _m_safety_latency.observe(latency_s)
+
+_safety = SafetyLoop(read=lambda: (nearest(latest_filtered, latest_ultrasonic), _us_last_rx[0]),
+                     send=_ser_out.submit,
+                     rate_hz=float(os.environ.get("SAFETY_HZ", "50")),
+                     mode=os.environ.get("SAFETY", "stop"),
+                     stop_cm=float(os.environ.get("SAFETY_STOP_CM", "40")),
+                     side_cm=float(os.environ.get("SAFETY_SIDE_CM", "30")),
+                     velocity=lambda: _us_filter.velocity,     # all None with US_FILTER=median
+                     brake_cmps2=float(os.environ.get("SAFETY_BRAKE_CMPS2", "60")),
+                     on_override=_on_safety_override,
+                     on_tick=lambda jitter, busy: _m_safety_jitter.observe(jitter))
+
+# ---------- sensor hub ----------
+# Every sensor runs in-process on its own thread (sensorhub.py) and publishes into one
+# latest-value store: the Arduino's ultrasonic telemetry always, plus SENSORS
+# (gps / compass / sim:*), so GPS and heading no longer need gps_compass.py + /ingest.
+def _on_serial_other(kind, data, t_rx):
+    # Firmware text lines and unknown frame types: rare, so every one is logged.
+    log_event("serial_" + kind, data=data, rx_uptime_s=round(t_rx - START_MONO, 3))
+
+_hub = SensorHub()
+_us_source = _hub.add(UltrasonicSource(ser, on_record=_on_serial_other,
+                                       on_error=lambda e: log_event("error", where="serial_listener", msg=str(e))))
+_reader = _us_source.reader     # blocks on the port and decodes records as they arrive (serial_reader.py)
+_hub.store.subscribe("ultrasonic", _on_ultrasonic)
+_sensor_opts = {"gps": {"port": os.environ.get("GPS_PORT", "/dev/serial0"),
+                        "baud": int(os.environ.get("GPS_BAUD", "115200"))},
+                "compass": {"cal_path": os.environ.get("COMPASS_CAL", "compass_cal.json")}}
+# The "ultrasonic" topic is the Arduino's alone: sim:ultrasonic would feed fake distances
+# to the safety loop, ring buffer and columns next to the real ones.
+for _src in build_sensors(SENSORS, _sensor_opts, exclude=("sim:ultrasonic",),
+                          on_error=lambda e: log_event("error", where="sensor", msg=str(e))):
+    _hub.add(_src)
+
+def _on_sensor(topic, rec):
+    # gps / compass / Arduino heading (hub sources or POST /ingest) -> /stream, GPS fixes into the log
+    if topic == "ultrasonic":
+        return
+    data = {k: v for k, v in rec.items() if k not in ("rx_mono", "rx_ts", "age_s")}
+    _stream.publish(topic, {"uptime_s": round(rec["rx_mono"] - START_MONO, 3), **data})
+    if topic in ("gps", "heading"):
+        log_event(topic, data=data)
+
+_hub.store.subscribe_all(_on_sensor)
 # ---------- heartbeat thread ----------
 _stop_hb = threading.Event()
 def _heartbeat():
+    due = time.monotonic()
     while not _stop_hb.is_set():
+        now = time.monotonic()
+        _m_hb_lag.observe(max(0.0, now - due))
+        _hb_last[0] = now
         log_event("heartbeat", ser_dev=SER_DEV, baud=BAUD)
+        due = now + 5.0
         _stop_hb.wait(5.0)  # every 5s
 
 # ---------- HTTP handler ----------
+_KNOWN_PATHS = set(ROUTES) | {"/", "/index.html", "/metrics", "/metrics.html", "/metrics.json",
+                              "/events", "/events.tail", "/stream", "/ws", "/telemetry", "/k",
+                              "/sensors"}
+_LONG_LIVED = ("/stream", "/ws")
+
+def _route_label(path):
+    # Bounded label set: scanners and typos all land in "other".
+    p = path.split("?", 1)[0]
+    if p.startswith("/ingest/"):
+        return "/ingest"
+    return p if p in _KNOWN_PATHS else "other"
+
+def _holder(h, query):
+    # Lease owner: the page's random id (?l=...), else the client address (curl, old pages).
+    for part in query.split("&"):
+        if part.startswith("l="):
+            return "page:" + part[2:40]
+    return "http:" + h.client_address[0]
+
 class H(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the page's connection open between button presses;
+    # `timeout` is the idle limit before the handler thread gives it up.
+    protocol_version = "HTTP/1.1" if KEEPALIVE_S > 0 else "HTTP/1.0"
+    timeout = KEEPALIVE_S or None
+    # Headers and body go out as separate writes; without TCP_NODELAY the
+    # second one waits on the client's delayed ACK (~40 ms per command).
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        
+        self._timed("GET", self._get)
+
+    def do_POST(self):
+        self._timed("POST", self._post)
+
+    def _timed(self, method, handler):
+        self._status = None
+        t0 = time.perf_counter()
+        try:
+            handler()
+        finally:
+            route = _route_label(self.path)
+            code = self._status or (101 if route == "/ws" else 0)
+            _m_requests.inc((route, method, str(code)))
+            if route not in _LONG_LIVED:
+                _m_handler.observe(time.perf_counter() - t0, (route, method))
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def _get(self):
+        path, _, query = self.path.partition("?")
+        if path == "/k":
+            # Lease keepalive, 10-20/s per held button: no event log, no parsing beyond the id.
+            ok = _leases.renew(_holder(self, query))
+            return self._send(200, "1" if ok else "0", "text/plain")
         log_event("http_get", path=self.path, client=self.client_address[0])
         
         if self.path in ("/", "/index.html"):
             return self._send(200, HTML, "text/html")
         if self.path == "/metrics":
+            return self._send(200, _metrics.render(), promstats.CONTENT_TYPE)
+        if self.path == "/metrics.html":
             body = {
                 "session": SESSION_ID,
                 "uptime_s": uptime_s(),
@@ -180,6 +438,16 @@ class H(BaseHTTPRequestHandler):
                 "events_path": str(EVENTS_PATH),
                 "commands_csv": str(COMMANDS_CSV),
                 "ultrasonic_cm": latest_ultrasonic,
+                "ultrasonic_filtered_cm": latest_filtered,
+                "ultrasonic_filter": _us_filter.stats(),
+                "safety": _safety.stats(),
+                "log": _log.stats(),
+                "serial_tx": _ser_out.stats(),
+                "lease": _leases.stats(),
+                "stream": _stream.stats(),
+                "serial_rx": _reader.stats(),
+                "sensors": _hub.stats(),
+                "history": _history.stats(),
                 "start_ts": START_TS
                 
             }
@@ -194,40 +462,65 @@ class H(BaseHTTPRequestHandler):
                 "baud": BAUD,
                 "run_dir": str(RUN_DIR),
                 "ultrasonic_cm": latest_ultrasonic,
+                "ultrasonic_filtered_cm": latest_filtered,
+                "ultrasonic_filter": _us_filter.stats(),
+                "safety": _safety.stats(),
+                "log": _log.stats(),
+                "serial_tx": _ser_out.stats(),
+                "lease": _leases.stats(),
+                "stream": _stream.stats(),
+                "serial_rx": _reader.stats(),
+                "sensors": _hub.stats(),
+                "history": _history.stats(),
                 "start_ts": START_TS
             }
             return self._send(200, json.dumps(body), "application/json")
+        if self.path.split("?", 1)[0] == "/telemetry":
+            return self._telemetry()
+        if self.path == "/sensors":
+            # Latest value per hub topic, each with rx_ts, seq and age_s
+            return self._send(200, json.dumps(_hub.store.snapshot()), "application/json")
+        if self.path.split("?", 1)[0] == "/events":
+            return self._events()
+        if self.path.split("?", 1)[0] == "/stream" and HTTP_MODE == "threaded":
+            return self._stream()
         if self.path == "/events.tail":
-            # Return last ~2KB of the events file for quick peeks in browser
+            # Last 30 whole events for quick peeks in browser (via the index, never a torn line)
             try:
-                data = ""
-                with EVENTS_PATH.open("rb") as f:
-                    f.seek(0, os.SEEK_END)
-                    size = f.tell()
-                    f.seek(max(size-2048,0), os.SEEK_SET)
-                    data = f.read().decode("utf-8","ignore")
-                return self._send(200, "<pre>"+data+"</pre>", "text/html")
+                lines = [json.dumps(r, ensure_ascii=False) for r in _events.tail(30)]
+                return self._send(200, "<pre>"+html.escape("\n".join(lines), quote=False)+"</pre>", "text/html")
             except Exception as e:
                 log_event("error", where="events.tail", msg=str(e))
                 return self._send(500, "error", "text/plain")
-        if self.path in ROUTES:
-            ch = ROUTES[self.path]
-            tx(ch)
+        if self.path == "/ws" and HTTP_MODE == "threaded":
+            return self._ws()
+        if path in ROUTES:
+            ch = ROUTES[path]
+            tx(ch, _holder(self, query))
             return self._send(200, "OK", "text/plain")
         return self._send(404, "Not found", "text/plain")
 
 
-    def do_POST(self):
+    def _post(self):
         # Ingest sensor data: POST /ingest/<topic>  with JSON body
+        # Always consume the body so the next request on a kept-alive
+        # connection starts at a request line.
+        body = self._read_body()
+        if body is None:
+            return self._send(411, "Length required", "text/plain")
         if self.path.startswith("/ingest/"):
             topic = self.path.split("/", 2)[-1]
-            length = int(self.headers.get("Content-Length","0") or 0)
-            body = self.rfile.read(length) if length>0 else b"{}"
+            if topic not in INGEST_TOPICS:
+                return self._send(404, "Unknown ingest topic (see INGEST_TOPICS)", "text/plain")
+            body = body or b"{}"
             try:
                 payload = json.loads(body.decode("utf-8") or "{}")
             except Exception:
                 payload = {"_raw": body.decode("utf-8","ignore")}
             log_event("ingest", topic=topic, data=payload)
+            _stream.publish("ingest", {"uptime_s": uptime_s(), "topic": topic, "data": payload})
+            if isinstance(payload, dict) and "_raw" not in payload and topic != "ultrasonic":
+                _hub.store.publish(topic, payload)     # external sensors share the hub's store (not the Arduino's topic)
             return self._send(200, "OK", "text/plain")
         return self._send(404, "Not found", "text/plain")
 
@@ -235,6 +528,79 @@ class H(BaseHTTPRequestHandler):
         # Silence default stdout logs (we log ourselves)
         return
 
+    def _ws(self):
+        # Persistent, ordered drive channel; holds this handler thread until the page goes away.
+        if not wsctl.handshake(self):
+            return self._send(400, "Expected WebSocket upgrade", "text/plain")
+        client = self.client_address[0]
+        log_event("ws_open", client=client)
+        holder = f"ws:{id(self)}"
+        st = {}
+        try:
+            st = wsctl.drive_session(self, lambda ch: tx(ch, holder), set(ROUTES.values()),
+                                     keepalive=lambda: _leases.renew(holder))
+        finally:
+            # however the session ended (even an escaped socket error)
+            if _leases.holder == holder:
+                tx("S", holder)             # page gone mid-hold: don't wait for the lease
+            log_event("ws_close", client=client, **st)
+
+    def _stream(self):
+        # Server-Sent Events: /stream?topics=ultrasonic,tx (default: everything)
+        q = parse_qs(urlsplit(self.path).query)
+        topics = [t for t in ",".join(q.get("topics", [])).split(",") if t] or None
+        st = sse.serve(self, _stream, topics)
+        log_event("stream_close", client=self.client_address[0], **st)
+
+    def _telemetry(self):
+        # /telemetry?since=&until=&step=  uptime seconds (negative = relative to now), step = min spacing
+        q = parse_qs(urlsplit(self.path).query)
+        def arg(name, default=None):
+            v = q.get(name, [""])[0]
+            if v == "":
+                return default
+            x = float(v)
+            return uptime_s() + x if x < 0 and name != "step" else x
+        try:
+            since, until, step = arg("since"), arg("until"), arg("step", 0.0)
+        except ValueError:
+            return self._send(400, "since/until/step must be numbers", "text/plain")
+        body = _history.query(since, until, max(step, 0.0))
+        return self._send(200, json.dumps(body), "application/json")
+
+    def _events(self):
+        # /events?kind=ultrasonic&from=<line>&since=&until=<uptime_s>&limit=  -> seeks via index/
+        # &segment=N reads closed segment N (see segments/manifest.json); default is the live one.
+        q = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        try:
+            frm = int(q["from"]) if q.get("from") else None
+            since = float(q["since"]) if q.get("since") else None
+            until = float(q["until"]) if q.get("until") else None
+            limit = min(int(q.get("limit") or 100), 5000)
+            seg = int(q["segment"]) if q.get("segment") else None
+        except ValueError:
+            return self._send(400, "from/limit/segment must be integers, since/until numbers", "text/plain")
+        idx = _events
+        if seg is not None:
+            entry = next((e for e in _segments.manifest["segments"] if e["seq"] == seg), None)
+            if entry is None or not entry.get("index"):
+                return self._send(404, "No such segment", "text/plain")
+            idx = EventIndex(_segments.dir / entry["file"], _segments.dir / entry["index"])
+        try:
+            recs, nxt = idx.query(q.get("kind"), frm, since, until, limit)
+        except OSError as e:      # segment rotated/compressed under us; client can retry
+            return self._send(503, f"events busy: {e}", "text/plain")
+        body = {"count": len(recs), "next": nxt, "total_lines": idx.count(),
+                "segments": _segments.manifest["segments"], "events": recs}
+        return self._send(200, json.dumps(body, ensure_ascii=False), "application/json")
+
+    def _read_body(self):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.close_connection = True   # no chunked decoding here; reply and hang up
+            return None
+        length = int(self.headers.get("Content-Length","0") or 0)
+        return self.rfile.read(length) if length>0 else b""
+
     def _send(self, code, body, ctype):
         if not isinstance(body, (bytes, bytearray)):
             body = body.encode()
@@ -257,21 +623,42 @@ def _write_session_meta():
     with SESSION_META.open("w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
     log_event("session_start", **meta)
+    _catalog("session_started", meta)
+
+def _catalog(method, *args):
+    # The catalog is only an index over runlogs/; never let it stop the server.
+    try:
+        cat = Catalog(CATALOG_DB)
+        try: getattr(cat, method)(*args)
+        finally: cat.close()
+    except Exception as e:
+        print(f"catalog {method}: {e}")
 
 def _shutdown(*_):
     log_event("session_end", uptime_s=uptime_s())
     _stop_hb.set()
-    _stop_serial.set()
+    _leases.stop()
+    _safety.stop()
+    _hub.stop()
+    _ser_out.close()
     try: ser.close()
     except: pass
+    _log.close()
+    up = uptime_s()
+    _catalog("log_ended", SESSION_ID, START_TS + up, _log.kinds, _drive.snapshot(up))
     os._exit(0)
 
 if __name__=="__main__":
-    threading.Thread(target=_serial_listener, daemon=True).start()
+    _hub.start()
     _write_session_meta()
     signal.signal(signal.SIGINT, _shutdown)
     signal.signal(signal.SIGTERM, _shutdown)
     threading.Thread(target=_heartbeat, daemon=True).start()
-    print(f"Serving on :8000, talking to {SER_DEV}\nLogs in {RUN_DIR}")
-    log_event("http_start", host="0.0.0.0", port=8000)
-    HTTPServer(("0.0.0.0", 8000), H).serve_forever()
+    _leases.start()
+    _safety.start()
+    print(f"Serving on :{HTTP_PORT}, talking to {SER_DEV}\nLogs in {RUN_DIR}")
+    if HTTP_MODE != "threaded":
+        H.protocol_version = "HTTP/1.0"   # one idle keep-alive client would block everyone else
+    log_event("http_start", host="0.0.0.0", port=HTTP_PORT, mode=HTTP_MODE, protocol=H.protocol_version)
+    Server = ThreadingHTTPServer if HTTP_MODE == "threaded" else HTTPServer
+    Server(("0.0.0.0", HTTP_PORT), H).serve_forever()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Telemetry codec for the Arduino link: framed binary + the legacy text lines.
+
+Binary frame (little-endian):
+
+    0xA5 0x5A | type:u8 | len:u8 | payload[len] | crc8
+                '------- CRC-8 (poly 0x07) over these -------'
+
+    type 0x01 ultrasonic   payload <HHH  L, C, R in cm (0xFFFF = no echo)
+    type 0x02 heading      payload <h    degrees * 10
+
+Text lines are what tank_jsn.ino prints today ("L: 12 cm  C: 40 cm  R: 7 cm").
+Both can share one port: StreamDecoder looks for the sync pair and treats
+everything else as newline-terminated text, so firmware can switch over
+without a flag day. Bad CRCs are counted and the decoder resyncs on the
+next sync pair.
+"""
+import re, struct
+
+SYNC = b"\xA5\x5A"
+T_ULTRASONIC = 0x01
+T_HEADING = 0x02
+NO_ECHO = 0xFFFF
+
+_US_TEXT = re.compile(r'([LCR]):\s*(\d+)\s*cm')
+_US = struct.Struct("<HHH")
+_HDG = struct.Struct("<h")
+
+def _crc8_table(poly=0x07):
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ poly) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return bytes(table)
+
+_CRC = _crc8_table()
+
+def crc8(data, start=0, end=None):
+    c = 0
+    for b in memoryview(data)[start:end]:
+        c = _CRC[c ^ b]
+    return c
+
+# ---------- encoding (firmware reference / simulator / benchmarks) ----------
+def encode(typ, payload):
+    body = bytes((typ, len(payload))) + payload
+    return SYNC + body + bytes((crc8(body),))
+
+def encode_ultrasonic(L, C, R):
+    v = [NO_ECHO if x is None else x for x in (L, C, R)]
+    return encode(T_ULTRASONIC, _US.pack(*v))
+
+def encode_heading(deg):
+    return encode(T_HEADING, _HDG.pack(int(round(deg * 10))))
+
+def format_ultrasonic_text(L, C, R):
+    return f"L: {L} cm  C: {C} cm  R: {R} cm\r\n".encode()
+
+# ---------- decoding ----------
+def parse_text(line):
+    """One text line -> ("ultrasonic", {...}) or ("text", line)."""
+    m = _US_TEXT.findall(line)
+    if m:
+        return ("ultrasonic", {label: int(v) for label, v in m})
+    return ("text", line)
+
+def _decode_payload(typ, payload):
+    if typ == T_ULTRASONIC and len(payload) == _US.size:
+        L, C, R = _US.unpack(payload)
+        return ("ultrasonic", {"L": None if L == NO_ECHO else L,
+                               "C": None if C == NO_ECHO else C,
+                               "R": None if R == NO_ECHO else R})
+    if typ == T_HEADING and len(payload) == _HDG.size:
+        return ("heading", {"deg": _HDG.unpack(payload)[0] / 10.0})
+    return ("frame", {"type": typ, "payload": payload.hex()})
+
+
+class StreamDecoder:
+    def __init__(self, max_text=4096):
+        self.buf = bytearray()
+        self.text = bytearray()      # unfinished text line
+        self.max_text = max_text
+        self.frames = 0
+        self.text_lines = 0
+        self.crc_errors = 0
+        self.skipped = 0             # bytes thrown away while resyncing
+
+    def feed(self, data):
+        """Append raw bytes; return the list of complete (kind, data) records."""
+        buf = self.buf
+        buf += data
+        out = []
+        i, n = 0, len(buf)
+        while i < n:
+            if buf[i] == 0xA5:
+                if n - i < 4:
+                    break                                   # header not complete yet
+                if buf[i+1] != 0x5A:
+                    i += 1; self.skipped += 1; continue
+                end = i + 4 + buf[i+3]
+                if end + 1 > n:
+                    break                                   # payload/crc not complete yet
+                if crc8(buf, i + 2, end) != buf[end]:
+                    self.crc_errors += 1
+                    i += 1; self.skipped += 1; continue     # resync on the next 0xA5
+                out.append(_decode_payload(buf[i+2], bytes(buf[i+4:end])))
+                self.frames += 1
+                i = end + 1
+                continue
+            nl = buf.find(b"\n", i)
+            sy = buf.find(b"\xA5", i)
+            if sy != -1 and (nl == -1 or sy < nl):
+                self.text += buf[i:sy]; i = sy              # text cut short by a frame
+                continue
+            if nl == -1:
+                self.text += buf[i:]; i = n
+                break
+            self.text += buf[i:nl]; i = nl + 1
+            line = self.text.decode("utf-8", "ignore").strip()
+            self.text.clear()                               # keep the one buffer; no per-line allocation
+            if line:
+                self.text_lines += 1
+                out.append(parse_text(line))
+        del buf[:i]
+        if len(self.text) > self.max_text:
+            self.skipped += len(self.text); self.text.clear()
+        return out
+
+    def stats(self):
+        return {"frames": self.frames, "text_lines": self.text_lines,
+                "crc_errors": self.crc_errors, "skipped_bytes": self.skipped}
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Streaming filters for the JSN-SR04T L/C/R distances.
+
+Per channel, each reading goes through:
+  1. validity: 0 (the sketch's pulseIn timeout = no echo) and anything
+     above max_cm is dropped; readings inside the blind zone (< min_cm) mean
+     "very close" and are clamped to min_cm rather than thrown away;
+  2. gating: a reading further from the window median than gate_cm plus
+     max_speed_cmps * (time since the last accepted reading) is treated as a
+     spike - unless accept_after of them arrive in a row, which is a real
+     step (something walked in front) and re-seeds the window;
+  3. rolling median over the last `window` accepted readings (3: the sketch
+     pings each sensor only every ~360 ms, and a median trails a steady
+     approach by window // 2 readings);
+  4. optionally a 1-D constant-velocity Kalman (distance and closing speed
+     in cm/s) - measured with the gated reading itself, since the median in
+     front of it would only add lag; the median still sets the gate.
+
+Work per sample is fixed (window is a small constant; the sorted window is
+kept in a preallocated list, no containers are created per reading).
+After stale_s without a valid reading the channel reports None again.
+
+    f = UltrasonicFilter(kalman=True)
+    f.update({"L": 40, "C": 0, "R": 250}, t_mono)   # -> {"L": 40.0, "C": None, "R": 250.0}
+    f.velocity                                      # {"L": 0.0, ...} cm/s, Kalman only
+    f.stats()                                       # per-channel accepted/invalid/gated/reseeds/clamped
+"""
+from bisect import bisect_left, insort
+
+MIN_CM = 20      # JSN-SR04T blind zone is ~20-25 cm
+MAX_CM = 450     # rated range; the sketch times out at ~5 m
+
+
+class Kalman1D:
+    """Constant-velocity model; q = white-acceleration noise (cm/s^2)^2, r = measurement variance (cm^2)."""
+    __slots__ = ("q", "r", "d", "v", "p00", "p01", "p11", "t")
+
+    def __init__(self, q=10000.0, r=4.0):     # q ~ (100 cm/s^2)^2: the sketch's ramp-up is ~120 cm/s^2
+        self.q, self.r = q, r
+        self.t = None
+
+    def reset(self, z, t):
+        self.d, self.v, self.t = float(z), 0.0, t
+        self.p00, self.p01, self.p11 = self.r, 0.0, 1e4
+
+    def update(self, z, t):
+        if self.t is None:
+            self.reset(z, t)
+            return self.d
+        dt = t - self.t
+        self.t = t
+        if dt > 0:
+            # predict: x = F x, P = F P F' + Q
+            q = self.q
+            dt2 = dt * dt
+            self.d += self.v * dt
+            self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt2 * dt2 / 4
+            self.p01 += dt * self.p11 + q * dt2 * dt / 2
+            self.p11 += q * dt2
+        # update with z
+        s = self.p00 + self.r
+        k0, k1 = self.p00 / s, self.p01 / s
+        y = z - self.d
+        self.d += k0 * y
+        self.v += k1 * y
+        self.p11 -= k1 * self.p01
+        self.p01 -= k0 * self.p01
+        self.p00 -= k0 * self.p00
+        return self.d
+
+
+class ChannelFilter:
+    def __init__(self, window=3, gate_cm=40, max_speed_cmps=150, accept_after=3, min_cm=MIN_CM, max_cm=MAX_CM,
+                 stale_s=1.0, kalman=False):
+        self.window = window
+        self.gate_cm = gate_cm
+        self.max_speed_cmps = max_speed_cmps    # robot + obstacle closing speed the gate allows for
+        self.accept_after = accept_after
+        self.min_cm, self.max_cm = min_cm, max_cm
+        self.stale_s = stale_s
+        self.kf = Kalman1D() if kalman else None
+        self._ring = [0] * window       # accepted readings, oldest overwritten
+        self._sorted = []               # same values, sorted; never longer than window
+        self._i = 0
+        self._run = 0                   # consecutive gated readings
+        self.value = None               # filtered distance (cm) or None
+        self.velocity = None            # cm/s, + = opening (Kalman only)
+        self.t_valid = None
+        self.accepted = self.invalid = self.gated = self.reseeds = self.clamped = 0
+
+    def _median(self):
+        s = self._sorted
+        n = len(s)
+        return s[n // 2] if n & 1 else (s[n // 2 - 1] + s[n // 2]) / 2
+
+    def _push(self, x):
+        s = self._sorted
+        if len(s) == self.window:
+            del s[bisect_left(s, self._ring[self._i])]
+        insort(s, x)
+        self._ring[self._i] = x
+        self._i = (self._i + 1) % self.window
+
+    def update(self, x, t):
+        """Feed one raw reading (int cm, or None) at monotonic time t; returns the filtered value."""
+        if x is not None and 0 < x < self.min_cm:
+            self.clamped += 1
+            x = self.min_cm
+        if x is None or x < self.min_cm or x > self.max_cm:
+            self.invalid += 1
+            if self.t_valid is None or t - self.t_valid > self.stale_s:
+                self.value = self.velocity = None
+                if self.kf is not None:
+                    self.kf.t = None
+            return self.value
+        s = self._sorted
+        if len(s) >= 3 and abs(x - self._median()) > self.gate_cm + self.max_speed_cmps * (t - self.t_valid):
+            self._run += 1
+            if self._run < self.accept_after:
+                self.gated += 1
+                return self.value
+            # persistent: the scene changed, not a spike
+            self.reseeds += 1
+            s.clear()
+            self._i = 0
+            if self.kf is not None:
+                self.kf.t = None
+        self._run = 0
+        self.accepted += 1
+        self.t_valid = t
+        self._push(x)
+        m = self._median()
+        if self.kf is None:
+            self.value = float(m)
+        else:
+            self.value = self.kf.update(x, t)
+            self.velocity = self.kf.v
+        return self.value
+
+    def stats(self):
+        return {"accepted": self.accepted, "invalid": self.invalid, "gated": self.gated, "reseeds": self.reseeds,
+                "clamped": self.clamped}
+
+
+class UltrasonicFilter:
+    """One ChannelFilter per channel; filtered/velocity dicts are updated in place."""
+    def __init__(self, cols=("L", "C", "R"), **kw):
+        self.cols = tuple(cols)
+        self.channels = {c: ChannelFilter(**kw) for c in self.cols}
+        self.filtered = dict.fromkeys(self.cols)
+        self.velocity = dict.fromkeys(self.cols)
+
+    def update(self, values, t):
+        """values: {col: int|None} (missing cols are left alone); returns self.filtered."""
+        for c, f in self.channels.items():
+            if c in values:
+                v = f.update(values[c], t)
+                self.filtered[c] = None if v is None else round(v, 1)
+                self.velocity[c] = None if f.velocity is None else round(f.velocity, 1)
+        return self.filtered
+
+    def stats(self):
+        return {c: f.stats() for c, f in self.channels.items()}
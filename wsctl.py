@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""Minimal WebSocket drive channel (RFC 6455 subset, stdlib only).
+
+The control page opens ws://<pi>:8000/ws and sends "<seq>:<code>" text
+frames, e.g. "17:F". Over one TCP connection the frames stay in order;
+the seq number additionally drops anything stale after a reconnect.
+Whatever arrived in one recv() is coalesced: only the newest drive code
+and the newest speed digit from the batch reach tx(). Each applied batch
+is acknowledged with "ack:<seq>". A bare "k" frame is a lease keepalive
+(lease.py): nothing is sent back unless the lease is gone ("lease:0").
+"""
+import base64, hashlib, os, socket, struct
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONT, OP_TEXT, OP_BIN, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+
+def encode_frame(payload, opcode=OP_TEXT, mask=False):
+    """One FIN frame. Servers send unmasked; clients (bench.py) must mask."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+    n = len(payload)
+    b1 = 0x80 if mask else 0
+    if n < 126:
+        head = struct.pack("!BB", 0x80 | opcode, b1 | n)
+    elif n < 65536:
+        head = struct.pack("!BBH", 0x80 | opcode, b1 | 126, n)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, b1 | 127, n)
+    if not mask:
+        return head + payload
+    key = os.urandom(4)
+    return head + key + bytes(b ^ key[i & 3] for i, b in enumerate(payload))
+
+
+class FrameParser:
+    """Incremental frame splitter: feed() raw bytes, get complete messages back."""
+    def __init__(self, max_size=64 * 1024):
+        self.buf = bytearray()
+        self.max_size = max_size
+        self._frag_op = None
+        self._frag = bytearray()
+
+    def feed(self, data):
+        self.buf += data
+        out = []
+        while True:
+            f = self._one()
+            if f is None:
+                return out
+            fin, op, payload = f
+            if op >= 0x8:                       # control frames are never fragmented
+                out.append((op, payload))
+            elif op == OP_CONT:
+                if self._frag_op is None:
+                    raise ValueError("continuation without start")
+                self._frag += payload
+                if fin:
+                    out.append((self._frag_op, bytes(self._frag)))
+                    self._frag_op = None; self._frag = bytearray()
+            elif fin:
+                out.append((op, payload))
+            else:
+                self._frag_op, self._frag = op, bytearray(payload)
+
+    def _one(self):
+        b = self.buf
+        if len(b) < 2:
+            return None
+        fin, op = b[0] & 0x80, b[0] & 0x0F
+        masked, n = b[1] & 0x80, b[1] & 0x7F
+        i = 2
+        if n == 126:
+            if len(b) < 4: return None
+            n = struct.unpack_from("!H", b, 2)[0]; i = 4
+        elif n == 127:
+            if len(b) < 10: return None
+            n = struct.unpack_from("!Q", b, 2)[0]; i = 10
+        if n > self.max_size:
+            raise ValueError("frame too large")
+        if masked:
+            if len(b) < i + 4: return None
+            key = bytes(b[i:i+4]); i += 4
+        if len(b) < i + n:
+            return None
+        payload = bytes(b[i:i+n])
+        del b[:i+n]
+        if masked:
+            payload = bytes(x ^ key[j & 3] for j, x in enumerate(payload))
+        return bool(fin), op, payload
+
+
+def handshake(h):
+    """Answer the Upgrade on a BaseHTTPRequestHandler. False if not a WS request."""
+    key = h.headers.get("Sec-WebSocket-Key")
+    if not key or "websocket" not in h.headers.get("Upgrade", "").lower():
+        return False
+    h.wfile.write((
+        "HTTP/1.1 101 Switching Protocols\r\n"
+        "Upgrade: websocket\r\n"
+        "Connection: Upgrade\r\n"
+        f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+    h.wfile.flush()
+    h.close_connection = True
+    return True
+
+
+def drive_session(h, tx, codes, idle_s=15.0, keepalive=None):
+    """Run one control-page connection until it closes. Returns counters.
+
+    keepalive() is called per "k" frame and returns False once the lease is lost.
+    """
+    sock = h.connection
+    sock.settimeout(idle_s)
+    parser = FrameParser()
+    st = {"frames": 0, "applied": 0, "coalesced": 0, "stale": 0, "bad": 0, "keepalives": 0}
+    last_seq = -1
+    pinged = False
+
+    def send(payload, op=OP_TEXT):
+        sock.sendall(encode_frame(payload, op))
+
+    while True:
+        try:
+            data = sock.recv(4096)
+        except socket.timeout:
+            if pinged:                      # no pong for a whole idle period: client is gone
+                break
+            try:
+                send(b"", OP_PING); pinged = True
+            except OSError:
+                break
+            continue
+        except OSError:
+            break
+        if not data:
+            break
+        pinged = False
+        try:
+            frames = parser.feed(data)
+        except ValueError:
+            try:
+                send(struct.pack("!H", 1002), OP_CLOSE)
+            except OSError:
+                pass
+            break
+
+        drive = speed = None
+        closing = lost = gone = False
+        for op, payload in frames:
+            if op == OP_CLOSE:
+                closing = True; break
+            if op == OP_PING:
+                try:
+                    send(payload, OP_PONG)
+                except OSError:
+                    gone = True; break
+                continue
+            if op != OP_TEXT:
+                continue
+            if payload == b"k":
+                st["keepalives"] += 1
+                if keepalive is not None and not keepalive():
+                    lost = True
+                continue
+            st["frames"] += 1
+            seq, _, code = payload.decode("utf-8", "ignore").partition(":")
+            try:
+                seq = int(seq)
+            except ValueError:
+                st["bad"] += 1; continue
+            if code not in codes:
+                st["bad"] += 1; continue
+            if seq <= last_seq:
+                st["stale"] += 1; continue
+            last_seq = seq
+            if code.isdigit():
+                if speed is not None: st["coalesced"] += 1
+                speed = code
+            else:
+                if drive is not None: st["coalesced"] += 1
+                drive = code
+        if gone:
+            break
+
+        for code in (speed, drive):
+            if code is not None:
+                tx(code); st["applied"] += 1
+        try:
+            if speed or drive:
+                send(f"ack:{last_seq}")
+            elif lost:
+                send("lease:0")
+            if closing:
+                send(b"", OP_CLOSE)
+        except OSError:
+            break
+        if closing:
+            break
+    return st